@@ -9,10 +9,11 @@ import {
   MdExpandMore,
   MdOutlineAssignmentTurnedIn,
   MdOutlineRadioButtonChecked,
+  MdOutlineQuestionAnswer,
   MdPerson,
   MdSave
 } from 'react-icons/md';
-import { Question } from '../lib/store';
+import { Question, useStore } from '../lib/store';
 import SourceViewer from './SourceViewer';
 
 interface QuestionCardProps {
@@ -47,6 +48,8 @@ export default function QuestionCard({
   const [saveError, setSaveError] = useState<string | null>(null);
   const [isExpanded, setIsExpanded] = useState(false);
   const [showSourceViewer, setShowSourceViewer] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
+  const streamAnswer = useStore((state) => state.streamAnswer);
 
   // Functions to get sources and sentences from question data
   const getSources = (q: Question) => {
@@ -127,6 +130,19 @@ export default function QuestionCard({
     }
   };
 
+  const handleStreamAnswer = async () => {
+    try {
+      setIsStreaming(true);
+      setIsExpanded(true);
+      await streamAnswer(question.id);
+    } catch (err: any) {
+      console.error(err);
+      alert(`Fout bij genereren conceptantwoord: ${err.message}`);
+    } finally {
+      setIsStreaming(false);
+    }
+  };
+
   const handleDelete = async () => {
     if (confirm('Weet je zeker dat je deze vraag wilt verwijderen?')) {
       try {
@@ -300,6 +316,14 @@ export default function QuestionCard({
                 )}
               </div>
             </div>
+            {typeof question.draftAnswer === 'object' && question.draftAnswer?.cluster &&
+              question.draftAnswer.cluster.generatedFor.id !== question.id && (
+              <p className="mb-2 text-xs text-slate-500 dark:text-slate-400">
+                Gedeeld antwoord: gegenereerd voor de vergelijkbare vraag van{' '}
+                {question.draftAnswer.cluster.generatedFor.speaker}
+                {question.draftAnswer.cluster.generatedFor.party && ` (${question.draftAnswer.cluster.generatedFor.party})`}
+              </p>
+            )}
             {isEditing ? (
               <textarea
                 value={editedAnswer}
@@ -357,6 +381,14 @@ export default function QuestionCard({
               </>
             ) : (
               <>
+                <button
+                  onClick={handleStreamAnswer}
+                  disabled={isStreaming}
+                  className="bg-white/50 dark:bg-slate-700/50 px-4 py-2 rounded-full text-slate-700 dark:text-slate-300 text-sm font-medium flex items-center shadow-sm border border-slate-200 dark:border-slate-600 disabled:opacity-50"
+                >
+                  <MdOutlineQuestionAnswer className="mr-1" />
+                  {isStreaming ? 'Genereren...' : 'Genereer antwoord'}
+                </button>
                 <button
                   onClick={handleDelete}
                   className="bg-white/50 dark:bg-slate-700/50 px-4 py-2 rounded-full text-slate-700 dark:text-slate-300 text-sm font-medium flex items-center shadow-sm border border-slate-200 dark:border-slate-600"
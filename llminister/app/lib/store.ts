@@ -24,10 +24,18 @@ export interface Source {
   similarity_score: number;
 }
 
+export interface AnswerCluster {
+  id: string;
+  // The question the draft was generated for, on behalf of all members of the cluster
+  generatedFor: { id: string; speaker: string; party: string; question_text: string };
+  members: { id: string; speaker: string; party: string }[];
+}
+
 export interface AnswerData {
   answer_text: string;
   sources: Source[];
   sentences: Sentence[];
+  cluster?: AnswerCluster;
 }
 
 export interface Question {
@@ -44,6 +52,10 @@ export interface Question {
   personResponsible?: string;
   createdAt?: string;
   updatedAt?: string;
+  // Questions that are paraphrases of each other share a clusterId (the id of the first one)
+  clusterId?: string;
+  // Incremented by the backend on every write; sent back as If-Match to avoid lost updates
+  version?: number;
   // These fields may be populated separately from draftAnswer
   sources?: Source[];
   sentences?: Sentence[];
@@ -61,6 +73,8 @@ interface StoreState {
   loadQuestionsFromFile: (qs: Question[]) => void;
   updateQuestion: (questionId: string, update: Partial<Question>) => Promise<void>;
   deleteQuestion: (questionId: string) => Promise<void>;
+  streamAnswer: (questionId: string) => Promise<void>;
+  streamExtraction: (transcriptPath?: string) => Promise<number>;
   addCategory: (cat: string) => void;
   removeCategory: (cat: string) => void;
   updateSettings: (s: Partial<Settings>) => void;
@@ -85,14 +99,33 @@ export const useStore = create<StoreState>()(
         // Ensure we're sending the right structure to the backend
         // If draftAnswer is an object, ensure it's properly structured
         const formattedUpdate = { ...update };
+        delete formattedUpdate.version;
+
+        const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+        const current = get().questions.find(q => q.id === questionId);
+        if (current?.version !== undefined) {
+          headers['If-Match'] = `"${questionId}-${current.version}"`;
+        }
 
         try {
           const res = await fetch(`${process.env.NEXT_PUBLIC_PYTHON_API_URL}/questions/${questionId}`, {
             method: 'PATCH',
-            headers: { 'Content-Type': 'application/json' },
+            headers,
             body: JSON.stringify(formattedUpdate),
           });
 
+          if (res.status === 412) {
+            // Someone else changed this question first: show their version instead of overwriting it
+            const conflict = await res.json();
+            const latest = conflict.detail?.question;
+            if (latest) {
+              set((state) => ({
+                questions: state.questions.map(q => q.id === questionId ? { ...q, ...latest } : q)
+              }));
+            }
+            throw new Error('Deze vraag is intussen door iemand anders gewijzigd. De nieuwste versie is geladen.');
+          }
+
           if (!res.ok) {
             throw new Error(await res.text());
           }
@@ -120,6 +153,100 @@ export const useStore = create<StoreState>()(
         }));
       },
 
+      streamAnswer(questionId) {
+        // Render the draft answer progressively: tokens are appended to answer_text,
+        // and sentences with their citations are added as soon as they are complete.
+        const setDraft = (update: (draft: AnswerData) => AnswerData) => {
+          set((state) => ({
+            questions: state.questions.map(q => {
+              if (q.id !== questionId) return q;
+              const current = typeof q.draftAnswer === 'object' && q.draftAnswer !== null
+                ? q.draftAnswer
+                : { answer_text: '', sources: [], sentences: [] };
+              return { ...q, draftAnswer: update(current) };
+            })
+          }));
+        };
+
+        return new Promise((resolve, reject) => {
+          const source = new EventSource(
+            `${process.env.NEXT_PUBLIC_PYTHON_API_URL}/questions/${questionId}/answer-stream`
+          );
+
+          source.addEventListener('sources', (e) => {
+            const sources: Source[] = JSON.parse((e as MessageEvent).data);
+            setDraft(() => ({ answer_text: '', sources, sentences: [] }));
+          });
+          source.addEventListener('token', (e) => {
+            const { text } = JSON.parse((e as MessageEvent).data);
+            setDraft((draft) => ({ ...draft, answer_text: draft.answer_text + text }));
+          });
+          source.addEventListener('sentence', (e) => {
+            const sentence: Sentence = JSON.parse((e as MessageEvent).data);
+            setDraft((draft) => ({ ...draft, sentences: [...draft.sentences, sentence] }));
+          });
+          source.addEventListener('done', (e) => {
+            const data = JSON.parse((e as MessageEvent).data);
+            if (data.question) {
+              set((state) => ({
+                questions: state.questions.map(q => q.id === questionId ? { ...q, ...data.question } : q)
+              }));
+            } else if (data.draftAnswer) {
+              setDraft(() => data.draftAnswer);
+            }
+            source.close();
+            resolve();
+          });
+          source.addEventListener('error', (e) => {
+            source.close();
+            const data = (e as MessageEvent).data;
+            reject(new Error(data ? JSON.parse(data).detail : 'Verbinding met de server verbroken'));
+          });
+        });
+      },
+
+      streamExtraction(transcriptPath) {
+        // Questions are added to the list one by one while the backend extracts them
+        const params = new URLSearchParams();
+        if (transcriptPath) params.set('transcript_path', transcriptPath);
+        get().categories.forEach(cat => params.append('categories', cat));
+
+        return new Promise((resolve, reject) => {
+          const source = new EventSource(
+            `${process.env.NEXT_PUBLIC_PYTHON_API_URL}/extract-questions/stream?${params.toString()}`
+          );
+
+          source.addEventListener('session', () => {
+            set(() => ({ questions: [] }));
+          });
+          source.addEventListener('question', (e) => {
+            const question: Question = JSON.parse((e as MessageEvent).data);
+            set((state) => ({ questions: [...state.questions, question] }));
+          });
+          source.addEventListener('warning', (e) => {
+            console.warn(JSON.parse((e as MessageEvent).data).detail);
+          });
+          source.addEventListener('done', (e) => {
+            const { count, questions } = JSON.parse((e as MessageEvent).data);
+            source.close();
+            // Take over the stored versions (with clusterId), keeping local changes made in the meantime
+            const stored = new Map<string, Question>((questions ?? []).map((q: Question) => [q.id, q]));
+            set((state) => ({
+              questions: state.questions.map(q => {
+                const s = stored.get(q.id);
+                return s && (s.version ?? 0) >= (q.version ?? 0) ? { ...q, ...s } : q;
+              })
+            }));
+            resolve(count);
+          });
+          source.addEventListener('error', (e) => {
+            source.close();
+            const data = (e as MessageEvent).data;
+            reject(new Error(data ? JSON.parse(data).detail : 'Verbinding met de server verbroken'));
+          });
+        });
+      },
+
       addCategory: (cat) => {
         set((state) => {
           if (!state.categories.includes(cat)) {
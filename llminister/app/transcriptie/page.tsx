@@ -4,7 +4,6 @@ import Link from 'next/link';
 import { useRouter } from 'next/navigation';
 import React, { useState } from 'react';
 import { MdCheckCircle, MdInfoOutline, MdOutlineFileUpload, MdWarning } from 'react-icons/md';
-import { useStore } from '../lib/store';
 
 export default function TranscriptiePage() {
   const router = useRouter();
@@ -14,8 +13,6 @@ export default function TranscriptiePage() {
   const [processingMessage, setProcessingMessage] = useState('');
   const [processingProgress, setProcessingProgress] = useState(0);
 
-  const loadQuestionsFromFile = useStore((state) => state.loadQuestionsFromFile);
-
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     if (e.target.files && e.target.files.length > 0) {
       setFile(e.target.files[0]);
@@ -25,6 +22,32 @@ export default function TranscriptiePage() {
     }
   };
 
+  const waitForTranscriptionJob = async (jobId: string) => {
+    const progressByStatus: Record<string, number> = { queued: 5, uploading: 15, transcribing: 40 };
+    const messageByStatus: Record<string, string> = {
+      queued: 'In de wachtrij...',
+      uploading: 'Video uploaden...',
+      transcribing: 'Transcriberen...'
+    };
+    let delay = 2000;
+    while (true) {
+      const res = await fetch(`${process.env.NEXT_PUBLIC_PYTHON_API_URL}/jobs/${jobId}`);
+      if (!res.ok) throw new Error(await res.text());
+      const { job } = await res.json();
+      if (job.status === 'completed') return job;
+      if (job.status === 'error') throw new Error(job.error || 'Transcriptie mislukt');
+      setProcessingProgress(progressByStatus[job.status] ?? 0);
+      if (job.status === 'uploading' && job.upload_bytes && job.provider_upload_bytes) {
+        const percent = Math.round((100 * job.provider_upload_bytes) / job.upload_bytes);
+        setProcessingMessage(`Video uploaden... ${percent}% van ${(job.upload_bytes / 1e6).toFixed(0)} MB`);
+      } else {
+        setProcessingMessage(messageByStatus[job.status] ?? 'Verwerken...');
+      }
+      await new Promise((resolve) => setTimeout(resolve, delay));
+      delay = Math.min(delay * 1.5, 10000);
+    }
+  };
+
   const handleTranscribe = async () => {
     if (!file) return;
     try {
@@ -40,30 +63,17 @@ export default function TranscriptiePage() {
         body: formData,
       });
       if (!res.ok) throw new Error(await res.text());
-      const data = await res.json();
+      const { jobId } = await res.json();
 
-      setProcessingMessage('Transcriptie gereed. Extractie vragen...');
-      // 2. Extract questions
-      const extractRes = await fetch(`${process.env.NEXT_PUBLIC_PYTHON_API_URL}/extract-questions`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          transcript_path: data.transcriptPath,
-          categories: ['Algemeen'] // or let user set categories
-        }),
-      });
-      if (!extractRes.ok) throw new Error(await extractRes.text());
-      const extractData = await extractRes.json();
-
-      // load them into store
-      if (extractData.questions) {
-        loadQuestionsFromFile(extractData.questions);
-      }
+      // The transcription runs as a background job on the server; follow it until it is done
+      const data = await waitForTranscriptionJob(jobId);
 
+      setProcessingProgress(100);
       setProcessingStatus('success');
-      setProcessingMessage('Vragen geëxtraheerd! U wordt doorgestuurd naar /vragen...');
+      setProcessingMessage('Transcriptie gereed! De vragen verschijnen op /vragen zodra ze zijn geëxtraheerd...');
+      // 2. The questions page extracts the questions and shows them as they come in
       setTimeout(() => {
-        router.push('/vragen');
+        router.push(`/vragen?transcript=${encodeURIComponent(data.transcriptPath)}`);
       }, 2000);
     } catch (err: any) {
       console.error(err);
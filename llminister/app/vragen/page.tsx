@@ -35,6 +35,7 @@ export default function VragenPage() {
   const loadQuestionsFromFile = useStore((state) => state.loadQuestionsFromFile);
   const updateQuestion = useStore((state) => state.updateQuestion);
   const deleteQuestion = useStore((state) => state.deleteQuestion);
+  const streamExtraction = useStore((state) => state.streamExtraction);
 
   // Filtered questions
   const filteredQuestions = questions.filter(q => {
@@ -45,6 +46,13 @@ export default function VragenPage() {
   });
 
   useEffect(() => {
+    // Coming from the transcription page: extract from that transcript, otherwise load the current questions
+    const transcriptPath = new URLSearchParams(window.location.search).get('transcript');
+    if (transcriptPath) {
+      window.history.replaceState(null, '', window.location.pathname);
+      handleExtractLatestQuestions(transcriptPath);
+      return;
+    }
     // auto-load questions on page mount
     handleLoadQuestions();
     // eslint-disable-next-line react-hooks/exhaustive-deps
@@ -87,6 +95,9 @@ export default function VragenPage() {
         setShowSuccessMessage(true);
         setTimeout(() => setShowSuccessMessage(false), 3000);
       }
+      if (data.failed && data.failed.length > 0) {
+        alert(`${data.failed.length} conceptantwoord(en) konden niet worden gegenereerd. Probeer het later opnieuw.`);
+      }
     } catch (err: any) {
       console.error(err);
       alert(`Fout bij genereren conceptantwoorden: ${err.message}`);
@@ -95,22 +106,14 @@ export default function VragenPage() {
     }
   };
 
-  // Function to extract questions from the latest transcript
-  const handleExtractLatestQuestions = async () => {
+  // Function to extract questions from the latest (or a given) transcript;
+  // questions appear in the list as soon as they are extracted
+  const handleExtractLatestQuestions = async (transcriptPath?: string) => {
     try {
       setIsExtracting(true);
-      const res = await fetch(`${process.env.NEXT_PUBLIC_PYTHON_API_URL}/extract-latest-questions`, {
-        method: 'POST'
-      });
-      if (!res.ok) {
-        throw new Error(await res.text());
-      }
-      const data = await res.json();
-      if (data.questions) {
-        loadQuestionsFromFile(data.questions);
-        setShowSuccessMessage(true);
-        setTimeout(() => setShowSuccessMessage(false), 3000);
-      }
+      await streamExtraction(transcriptPath);
+      setShowSuccessMessage(true);
+      setTimeout(() => setShowSuccessMessage(false), 3000);
     } catch (err: any) {
       console.error('Error extracting questions:', err);
       alert(`Fout bij extractie: ${err.message}`);
@@ -185,7 +188,7 @@ export default function VragenPage() {
               </div>
             </button>
             <button
-              onClick={handleExtractLatestQuestions}
+              onClick={() => handleExtractLatestQuestions()}
               disabled={isExtracting}
               className="min-w-[150px] min-h-[48px] inline-flex bg-white/50 dark:bg-slate-700/50
                          backdrop-blur-sm text-slate-700 dark:text-slate-300
@@ -196,7 +199,7 @@ export default function VragenPage() {
               <div className="flex items-start px-5 py-2.5 w-full">
                 <MdHelp className="mr-2 text-xl flex-shrink-0 mt-0.5" />
                 <span className="leading-tight text-left">
-                  {isExtracting ? 'Vragen extraheren...' : 'Extract Vragen'}
+                  {isExtracting ? `Vragen extraheren... (${questions.length})` : 'Extract Vragen'}
                 </span>
               </div>
             </button>
@@ -10,26 +10,75 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
 from fastapi.responses import FileResponse, StreamingResponse
-from fastapi import HTTPException, Query
+from fastapi import HTTPException, Query, Header, Request, Response, Form
 from fastapi.middleware.cors import CORSMiddleware
 import os.path
+import shutil
 from pathlib import Path as PathLib
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import io
-
-from .services.transcription_service import transcribe_video_file
-from .services.question_extractor import extract_questions_from_transcript
-from .services.answer_generation import generate_rag_answer
+import json
+import hmac
+import uuid
+
+from .services.transcription_jobs import (
+    get_transcription_queue,
+    new_upload_path,
+    spool_upload,
+    UploadTooLargeError,
+    TRANSCRIBE_WEBHOOK_SECRET,
+    WEBHOOK_AUTH_HEADER
+)
+from .services.question_extractor import extract_questions_from_transcript, stream_questions_from_transcript
+from .services.answer_generation import (
+    generate_rag_answer,
+    retrieve_context_many,
+    retrieve_for_questions,
+    summarize_retrieval,
+    stream_rag_answer,
+    get_answer_cache_stats,
+    clear_answer_cache,
+    start_knowledge_base_warm_up,
+    knowledge_base_status
+)
+from .services.question_clustering import (
+    assign_clusters,
+    recluster_question,
+    group_by_cluster,
+    QUESTION_CLUSTER_THRESHOLD
+)
+from .services.pdf_page_cache import get_page_cache, page_etag, PageOutOfRangeError
+from .services.live_ingest import start_live_session, get_live_session, stop_live_session
+from .services.answer_engine import AnswerJob, AnswerResult, generate_answers_concurrently
+from .services.executors import run_network, run_cpu, run_io, executor_stats, shutdown_executors
+from .services.provider_clients import provider_stats
+from .services.pipeline import get_pipeline_runner
 from .services.storage_service import (
     save_transcript_file,
-    load_most_recent_questions_json,
-    save_questions_json,
+    create_question_session,
+    append_questions,
+    load_questions,
+    get_question as get_stored_question,
+    update_question,
+    question_etag,
+    VersionConflictError,
+    delete_question as delete_stored_question,
+    get_job,
+    find_transcript,
+    load_raw_transcript,
     reset_data
 )
 from .models import QuestionUpdate
 
 app = FastAPI()
 
+# Seconds a browser may reuse a PDF page before revalidating it with its ETag
+PDF_PAGE_MAX_AGE = int(os.environ.get("PDF_PAGE_MAX_AGE", "300"))
+# Retry-After (seconds) sent with 503s while the knowledge base is still loading
+KB_RETRY_AFTER_SECONDS = int(os.environ.get("KB_RETRY_AFTER_SECONDS", "5"))
+# Token the /admin endpoints require in the X-Admin-Token header; they are disabled while it is unset
+ADMIN_TOKEN = os.environ.get("LLMINISTER_ADMIN_TOKEN", "")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Update with your frontend URL in production
@@ -43,8 +92,20 @@ class ExtractRequest(BaseModel):
     transcript_path: Optional[str] = None
     categories: List[str] = []
 
+class LiveSessionRequest(BaseModel):
+    categories: List[str] = []
+    replay_transcript_path: Optional[str] = None  # replay a transcript file instead of pushed segments
+    speed: float = 1.0  # replay speed, 1.0 is real time
+
+class LiveSegmentRequest(BaseModel):
+    text: str  # one or more "[HH:MM:SS] Speaker: text" utterances
+    flush: bool = False  # extract right away instead of waiting for more text
+
 class BulkGenerateAnswersRequest(BaseModel):
     question_ids: List[str]
+    force: bool = False  # regenerate even when a cached answer exists
+    overwrite_edits: bool = False  # also replace drafts that were edited while generation ran
+    cluster: bool = True  # answer paraphrased questions (same clusterId) with one model call
 
 class UpdateQuestionRequest(BaseModel):
     question_text: Optional[str] = None
@@ -53,21 +114,223 @@ class UpdateQuestionRequest(BaseModel):
     nextAction: Optional[str] = None
     personResponsible: Optional[str] = None
 
+@app.on_event("startup")
+async def start_background_jobs():
+    # The knowledge base index loads in the background; see /readyz
+    start_knowledge_base_warm_up()
+    # Also resumes transcription jobs and pipeline runs that were interrupted by a restart
+    await get_transcription_queue().start()
+    await get_pipeline_runner().start()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await get_pipeline_runner().stop()
+    await get_transcription_queue().stop()
+    shutdown_executors()
+
+def _require_knowledge_base():
+    """
+    Answer 503 (with Retry-After) while the knowledge base index is not loaded yet.
+    """
+    status = knowledge_base_status()
+    if not status["ready"]:
+        detail = "The knowledge base is still loading." if status["loading"] else \
+            f"The knowledge base is not available: {status['error'] or 'not loaded'}"
+        raise HTTPException(status_code=503, detail=detail,
+                            headers={"Retry-After": str(KB_RETRY_AFTER_SECONDS)})
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness: the process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz(response: Response):
+    """
+    Readiness: 200 once the knowledge base index is loaded (with its size and load time), 503 before that.
+    """
+    status = knowledge_base_status()
+    if not status["ready"]:
+        response.status_code = 503
+        response.headers["Retry-After"] = str(KB_RETRY_AFTER_SECONDS)
+    state = "ready" if status["ready"] else "loading" if status["loading"] else "unavailable"
+    return {"status": state, "knowledgeBase": status}
+
+async def _attach_retrieval(questions: List[Dict]):
+    """
+    Store the retrieved knowledge base pages on newly extracted questions (one batched search),
+    so staff can check the sources first and drafting the answer later doesn't search again.
+    Skipped while the knowledge base is loading; the answer step searches for those questions.
+    """
+    if not questions or not knowledge_base_status()["ready"]:
+        return
+    try:
+        retrieved = await run_cpu(retrieve_context_many,
+                                  [q.get("question_text") or q.get("text", "") for q in questions])
+        for question, top_docs in zip(questions, retrieved):
+            question["retrieval"] = summarize_retrieval(top_docs)
+    except Exception as e:
+        print(f"Retrieval for extracted questions failed: {e}")
+
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _read_indexed_transcript(entry: Dict) -> Dict:
+    with open(entry["transcript_path"], "r", encoding="utf-8") as f:
+        transcript_text = f.read()
+    return {
+        "sha256": entry["sha256"],
+        "transcript": transcript_text,
+        "transcriptPath": entry["transcript_path"],
+        "raw": load_raw_transcript(entry)
+    }
+
+async def _queue_transcription(file: UploadFile, force: bool) -> Tuple[Dict, Optional[Dict]]:
+    """
+    Save an uploaded video and queue its transcription job. A video that was transcribed before
+    (same SHA-256) gets a completed job and its transcript index entry instead, unless force is set.
+    """
+    original_name = file.filename or "uploaded_video.mp4"
+    job_id, upload_path = new_upload_path(original_name)
+    spool_stats = await spool_upload(file, upload_path)
+
+    entry = None if force else await run_io(find_transcript, spool_stats["sha256"])
+    if entry is not None:
+        upload_path.unlink(missing_ok=True)
+        return get_transcription_queue().complete_from_index(job_id, original_name, entry, **spool_stats), entry
+    return get_transcription_queue().submit(job_id, upload_path, original_name, **spool_stats), None
+
 @app.post("/transcribe")
-async def transcribe(file: UploadFile = File(...)):
+async def transcribe(file: UploadFile = File(...), force: bool = False):
+    """
+    Queue a video for transcription. Returns a job id right away;
+    follow the job with GET /jobs/{job_id}.
+    A video that was transcribed before (same SHA-256) is answered from the transcript index
+    without calling AssemblyAI, unless force=true.
+    """
     try:
-        file_bytes = await file.read()
-        original_name = file.filename or "uploaded_video.mp4"
-        transcript_text = transcribe_video_file(file_bytes, original_name)
-        transcript_path = save_transcript_file(transcript_text, original_name)
-        return {
-            "status": "success",
-            "transcript": transcript_text,
-            "transcriptPath": transcript_path
-        }
+        job, entry = await _queue_transcription(file, force)
+        if entry is not None:
+            transcript = await run_io(_read_indexed_transcript, entry)
+            return {"status": "completed", "jobId": job["id"], "job": job, **transcript}
+        return {"status": "queued", "jobId": job["id"], "job": job}
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/pipeline/runs")
+async def start_pipeline_run(file: Optional[UploadFile] = File(None), transcript_path: Optional[str] = Form(None),
+                             categories: List[str] = Form([]), force: bool = False):
+    """
+    Start a server-side run of the whole pipeline for an uploaded video (or an existing transcript):
+    transcribe, extract the questions, retrieve their knowledge base pages and draft the answers.
+    The stages overlap, so the first drafts are written while extraction is still running.
+    Follow the run with GET /pipeline/runs/{run_id}; its questions are in the session `sessionId`.
+    """
+    try:
+        runner = get_pipeline_runner()
+        if file is not None:
+            job, entry = await _queue_transcription(file, force)
+            if entry is not None:
+                run = runner.submit(categories, transcript_path=entry["transcript_path"], filename=job["filename"])
+            else:
+                run = runner.submit(categories, transcription_job_id=job["id"], filename=job["filename"])
+        elif transcript_path:
+            if not os.path.isfile(transcript_path):
+                raise HTTPException(status_code=404, detail="Transcript not found.")
+            run = runner.submit(categories, transcript_path=transcript_path, filename=os.path.basename(transcript_path))
+        else:
+            raise HTTPException(status_code=400, detail="Upload a video or give a transcript_path.")
+        return {"status": "success", "runId": run["id"], "run": run}
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/pipeline/runs/{run_id}")
+async def get_pipeline_run(run_id: str):
+    """
+    Status of a pipeline run, with the progress of each stage (transcribe, extract, retrieve, generate).
+    """
+    try:
+        run = await run_io(get_job, run_id)
+        if run is None or run["kind"] != "pipeline":
+            raise HTTPException(status_code=404, detail="Pipeline run not found.")
+        return {"status": "success", "run": {**run, "active": get_pipeline_runner().is_active(run_id)}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/pipeline/runs/{run_id}/resume")
+async def resume_pipeline_run(run_id: str):
+    """
+    Continue a failed run where it stopped: finished stages and questions that already have a draft are skipped.
+    """
+    try:
+        run = get_pipeline_runner().resume(run_id)
+        if run is None:
+            raise HTTPException(status_code=404, detail="Pipeline run not found.")
+        return {"status": "success", "run": {**run, "active": get_pipeline_runner().is_active(run_id)}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Status of a background job: queued, uploading, transcribing, completed or error.
+    A completed transcription job includes the transcript and its path.
+    """
+    try:
+        job = await run_io(get_job, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        if job["status"] == "completed" and job.get("transcriptPath") and os.path.exists(job["transcriptPath"]):
+            job["transcript"] = await run_io(_read_text, job["transcriptPath"])
+        job.pop("upload_path", None)
+        return {"status": "success", "job": job}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/transcripts/{sha256}")
+async def get_indexed_transcript(sha256: str):
+    """
+    Stored transcript and raw utterance JSON of a previously transcribed video.
+    """
+    try:
+        entry = await run_io(find_transcript, sha256)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Transcript not found.")
+        return {"status": "success", **(await run_io(_read_indexed_transcript, entry))}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/webhooks/assemblyai")
+async def assemblyai_webhook(payload: Dict[str, Any], request: Request):
+    """
+    Completion callback from AssemblyAI (only used when TRANSCRIBE_WEBHOOK_BASE_URL is set).
+    It wakes the worker waiting on the transcript, which then fetches the result.
+    """
+    if TRANSCRIBE_WEBHOOK_SECRET and not hmac.compare_digest(
+            request.headers.get(WEBHOOK_AUTH_HEADER, ""), TRANSCRIBE_WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret.")
+    transcript_id = payload.get("transcript_id")
+    if not transcript_id:
+        raise HTTPException(status_code=400, detail="No transcript_id in payload.")
+    return {"status": "success", "notified": get_transcription_queue().notify(transcript_id)}
+
 @app.post("/extract-questions")
 async def extract_questions(req: ExtractRequest):
     try:
@@ -76,165 +339,415 @@ async def extract_questions(req: ExtractRequest):
                 status_code=400,
                 detail="No transcript path provided."
             )
-        with open(req.transcript_path, "r", encoding="utf-8") as f:
-            transcript_text = f.read()
+        transcript_text = await run_io(_read_text, req.transcript_path)
 
         # Try to load the list of speakers
         list_of_speakers = ""
         speakers_path = os.path.join(os.path.dirname(os.path.dirname(__file__)),
                                     "data", "list_of_speakers", "list_of_speakers.csv")
         if os.path.exists(speakers_path):
-            with open(speakers_path, 'r', encoding='utf-8') as f:
-                list_of_speakers = f.read()
+            list_of_speakers = await run_io(_read_text, speakers_path)
 
-        questions_list = extract_questions_from_transcript(
+        questions_list = await run_network(
+            extract_questions_from_transcript,
             transcript_text,
             req.categories,
             list_of_speakers
         )
-        output_path = save_questions_json(questions_list)
+        await _attach_retrieval(questions_list)
+        session_id = await run_io(create_question_session, questions_list, source=req.transcript_path)
+        await run_cpu(assign_clusters, session_id)
         return {
             "status": "success",
-            "questions": questions_list,
-            "outputPath": output_path
+            "questions": await run_io(load_questions, session_id),
+            "sessionId": session_id
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _if_match_version(if_match: Optional[str], question_id: str) -> Optional[int]:
+    """
+    Parse an If-Match header carrying a question ETag ("<id>-<version>") into the expected version.
+    Returns None when no precondition was sent (or "*").
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    prefix = f"{question_id}-"
+    if not tag.startswith(prefix) or not tag[len(prefix):].isdigit():
+        raise HTTPException(status_code=412, detail="If-Match does not match this question.")
+    return int(tag[len(prefix):])
+
 @app.patch("/questions/{question_id}")
-async def patch_question(question_id: str, req: UpdateQuestionRequest):
+async def patch_question(question_id: str, req: UpdateQuestionRequest, response: Response,
+                         if_match: Optional[str] = Header(None)):
+    """
+    Update a question. Send the ETag from a previous read as If-Match to make the update
+    conditional; a 412 with the current question is returned if it was changed in the meantime.
+    """
     try:
-        questions = load_most_recent_questions_json()
-        if not questions:
-            raise HTTPException(status_code=404, detail="No questions found.")
-
-        updated_question = None
-        for q in questions:
-            if q["id"] == question_id:
-                # Update text fields
-                if req.question_text is not None:
-                    q["question_text"] = req.question_text
-                    q["text"] = req.question_text
-
-                # Update draft answer (handle both string and object formats)
-                if req.draftAnswer is not None:
-                    # If the incoming draftAnswer is a string but the existing one is an object,
-                    # we need to update just the answer_text
-                    if isinstance(req.draftAnswer, str) and isinstance(q.get("draftAnswer"), dict):
-                        q["draftAnswer"]["answer_text"] = req.draftAnswer
-                    else:
-                        # Otherwise, just replace the whole draftAnswer
-                        q["draftAnswer"] = req.draftAnswer
-
-                # Update other fields
-                if req.status is not None:
-                    q["status"] = req.status
-                if req.nextAction is not None:
-                    q["nextAction"] = req.nextAction
-                if req.personResponsible is not None:
-                    q["personResponsible"] = req.personResponsible
-
-                from datetime import datetime
-                q["updatedAt"] = datetime.now().isoformat()
-                updated_question = q
-                break
-
+        expected_version = _if_match_version(if_match, question_id)
+        text_changed = False
+
+        def apply(q):
+            nonlocal text_changed
+            # Update text fields
+            if req.question_text is not None:
+                # Pages retrieved for, and the cluster of, the old wording no longer apply
+                if req.question_text != q.get("question_text"):
+                    q.pop("retrieval", None)
+                    q.pop("clusterId", None)
+                    text_changed = True
+                q["question_text"] = req.question_text
+                q["text"] = req.question_text
+
+            # Update draft answer (handle both string and object formats)
+            if req.draftAnswer is not None:
+                # If the incoming draftAnswer is a string but the existing one is an object,
+                # we need to update just the answer_text
+                if isinstance(req.draftAnswer, str) and isinstance(q.get("draftAnswer"), dict):
+                    q["draftAnswer"]["answer_text"] = req.draftAnswer
+                else:
+                    # Otherwise, just replace the whole draftAnswer
+                    q["draftAnswer"] = req.draftAnswer
+
+            # Update other fields
+            if req.status is not None:
+                q["status"] = req.status
+            if req.nextAction is not None:
+                q["nextAction"] = req.nextAction
+            if req.personResponsible is not None:
+                q["personResponsible"] = req.personResponsible
+
+            from datetime import datetime
+            q["updatedAt"] = datetime.now().isoformat()
+
+        try:
+            updated_question = await run_io(update_question, question_id, apply, expected_version=expected_version)
+        except VersionConflictError as conflict:
+            raise HTTPException(
+                status_code=412,
+                detail={"message": str(conflict), "question": conflict.question},
+                headers={"ETag": question_etag(conflict.question)}
+            )
         if not updated_question:
             raise HTTPException(status_code=404, detail="Question not found.")
+        if text_changed:
+            # Find the question's cluster for its new wording (this keeps its ETag)
+            await run_cpu(recluster_question, question_id)
+            updated_question = await run_io(get_stored_question, question_id) or updated_question
 
-        save_questions_json(questions, override=True)
+        response.headers["ETag"] = question_etag(updated_question)
         return {"status": "success", "question": updated_question}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/questions/{question_id}")
 async def delete_question(question_id: str):
     try:
-        questions = load_most_recent_questions_json()
-        if not questions:
-            raise HTTPException(status_code=404, detail="No questions file found.")
-        new_list = [q for q in questions if q["id"] != question_id]
-        if len(new_list) == len(questions):
+        if not await run_io(delete_stored_question, question_id):
             raise HTTPException(status_code=404, detail="Question ID not found.")
-        save_questions_json(new_list, override=True)
         return {"status": "success", "message": "Question deleted successfully."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/generate-answers")
 async def generate_answers(req: BulkGenerateAnswersRequest):
+    """
+    Generate draft answers for the given questions. Questions in the same cluster (paraphrases,
+    see /questions/cluster) are answered with one model call, and the draft is copied to every member
+    with a `cluster` note saying which question it was generated for. Set cluster=false to answer each one.
+    A draft edited while generation runs is kept (listed under `kept`) unless overwrite_edits=true.
+    """
+    _require_knowledge_base()
     try:
-        questions = load_most_recent_questions_json()
-        if not questions:
+        stored = await run_io(lambda: [get_stored_question(qid) for qid in req.question_ids])
+        selected = [q for q in stored if q is not None]
+        if not selected:
             raise HTTPException(status_code=404, detail="No questions available.")
-        for qid in req.question_ids:
-            for q in questions:
-                if q["id"] == qid:
-                    draft = generate_rag_answer(
-                        q["question_text"],
-                        speaker=q.get("speaker", "Unknown"),
-                        party=q.get("party", "Unknown"),
-                        category=q.get("category", "Algemeen")
-                    )
-                    q["draftAnswer"] = draft
-                    from datetime import datetime
-                    q["updatedAt"] = datetime.now().isoformat()
-                    break
-        save_questions_json(questions, override=True)
+
+        # One job per cluster, for the first selected member of that cluster
+        groups = group_by_cluster(selected, req.cluster)
+        leaders = {group[0]["id"]: group for group in groups}
+        leader_questions = [group[0] for group in groups]
+
+        # Context per cluster: the retrieval stored at extraction, otherwise one vectorized pass for the rest
+        question_texts = [q.get("question_text") or q.get("text", "") for q in leader_questions]
+        retrieved = await run_cpu(retrieve_for_questions, leader_questions)
+
+        jobs = [
+            AnswerJob(
+                question_id=q["id"],
+                question_text=question_text,
+                speaker=q.get("speaker", "Unknown"),
+                party=q.get("party", "Unknown"),
+                category=q.get("category", "Algemeen"),
+                retrieved_docs=top_docs,
+                use_cache=not req.force
+            )
+            for q, question_text, top_docs in zip(leader_questions, question_texts, retrieved)
+        ]
+
+        # Drafts as they were when generation started; a draft edited since then is kept
+        drafts_at_start = {q["id"]: q.get("draftAnswer") for q in selected}
+        kept = []
+
+        def member_draft(draft: Dict, leader: Dict, group: List[Dict]) -> Dict:
+            if len(group) == 1:
+                return draft
+            return {
+                **draft,
+                "cluster": {
+                    "id": leader.get("clusterId") or leader["id"],
+                    "generatedFor": {
+                        "id": leader["id"],
+                        "speaker": leader.get("speaker", ""),
+                        "party": leader.get("party", ""),
+                        "question_text": leader.get("question_text") or leader.get("text", "")
+                    },
+                    "members": [{"id": m["id"], "speaker": m.get("speaker", ""), "party": m.get("party", "")}
+                                for m in group]
+                }
+            }
+
+        async def on_result(result: AnswerResult):
+            # Each finished draft is merged into the current rows of its cluster right away
+            if result.draft is not None:
+                from datetime import datetime
+
+                group = leaders[result.question_id]
+                for member in group:
+                    draft = member_draft(result.draft, group[0], group)
+
+                    def apply(q, member_id=member["id"], draft=draft):
+                        if not req.overwrite_edits and q.get("draftAnswer") != drafts_at_start[member_id]:
+                            kept.append(member_id)
+                            return False
+                        q["draftAnswer"] = draft
+                        q["updatedAt"] = datetime.now().isoformat()
+
+                    await run_io(update_question, member["id"], apply)
+
+        results = await generate_answers_concurrently(jobs, on_result=on_result)
+        questions = await run_io(load_questions)
+
+        failed = [{"id": m["id"], "error": r.error} for r in results if r.draft is None for m in leaders[r.question_id]]
         return {
-            "status": "success",
-            "message": "Draft answers generated successfully.",
-            "questions": questions
+            "status": "success" if not failed else "partial",
+            "message": f"Draft answers generated for {len(selected) - len(failed)} of {len(selected)} questions "
+                       f"({len(jobs)} distinct).",
+            "questions": questions,
+            "failed": failed,
+            "cached": [m["id"] for r in results if r.cached for m in leaders[r.question_id]],
+            "kept": kept
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/questions/cluster")
+async def cluster_session_questions(session_id: Optional[str] = None, threshold: Optional[float] = None):
+    """
+    (Re)compute the clusters of paraphrased questions in a session (default: the current one).
+    """
+    try:
+        summary = await run_cpu(
+            assign_clusters, session_id, threshold if threshold is not None else QUESTION_CLUSTER_THRESHOLD
+        )
+        return {"status": "success", **summary, "questions": await run_io(load_questions, session_id)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/questions/{question_id}/answer-stream")
+async def stream_answer(question_id: str, force: bool = False):
+    """
+    Generate the draft answer for one question as a server-sent event stream.
+    Emits `sources`, then `token` and `sentence` events while the model writes,
+    and finally `done` with the saved question (or `error`).
+    With force=true a cached answer is ignored and the model is called again.
+    """
+    _require_knowledge_base()
+    question = await run_io(get_stored_question, question_id)
+    if question is None:
+        raise HTTPException(status_code=404, detail="Question not found.")
+
+    async def event_stream():
+        try:
+            draft = None
+            async for item in stream_rag_answer(
+                question.get("question_text") or question.get("text", ""),
+                speaker=question.get("speaker", "Unknown"),
+                party=question.get("party", "Unknown"),
+                category=question.get("category", "Algemeen"),
+                use_cache=not force,
+                retrieval=question.get("retrieval")
+            ):
+                if item["event"] == "answer":
+                    draft = item["data"]
+                else:
+                    yield _sse(item["event"], item["data"])
+
+            # Only the draft is written, so edits made while streaming are kept
+            from datetime import datetime
+
+            def apply(q):
+                q["draftAnswer"] = draft
+                q["updatedAt"] = datetime.now().isoformat()
+
+            saved = await run_io(update_question, question_id, apply)
+            yield _sse("done", {"question": saved, "draftAnswer": draft})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/reset")
 async def reset_all_data():
     """
     Remove all transcripts, questions, answers from disk (like the old reset logic).
     """
     try:
-        reset_data()
+        await run_io(reset_data)
+        await run_io(clear_answer_cache)
         return {"status": "success", "message": "All data reset successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/answer-cache/stats")
+async def answer_cache_stats():
+    """
+    Hit/miss counters of the draft answer cache.
+    """
+    return {"status": "success", "stats": get_answer_cache_stats()}
+
 @app.get("/questions")
-async def get_questions():
+async def get_questions(session_id: Optional[str] = None, status: Optional[str] = None,
+                        category: Optional[str] = None):
     """
-    Retrieve all questions from the most recent questions JSON file.
+    Retrieve the questions of the most recent session (or of session_id),
+    optionally filtered on status and category.
     """
     try:
-        questions = load_most_recent_questions_json()
-        if not questions:
-            # Return empty list instead of 404 if no questions are found
-            return {"status": "success", "questions": []}
+        questions = await run_io(load_questions, session_id, status=status, category=category)
         return {"status": "success", "questions": questions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/questions/{question_id}")
-async def get_question(question_id: str):
+async def get_question(question_id: str, response: Response):
     """
-    Retrieve a specific question by ID.
+    Retrieve a specific question by ID. The ETag header can be sent back as If-Match on PATCH.
     """
     try:
-        questions = load_most_recent_questions_json()
-        if not questions:
-            raise HTTPException(status_code=404, detail="No questions found.")
-
-        for q in questions:
-            if q["id"] == question_id:
-                return {"status": "success", "question": q}
-
-        raise HTTPException(status_code=404, detail="Question not found.")
+        q = await run_io(get_stored_question, question_id)
+        if q is None:
+            raise HTTPException(status_code=404, detail="Question not found.")
+        response.headers["ETag"] = question_etag(q)
+        return {"status": "success", "question": q}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
     uvicorn.run("src.main:app", host="0.0.0.0", port=8000, reload=True)
 
+@app.post("/live/sessions")
+async def create_live_session(req: LiveSessionRequest):
+    """
+    Start live extraction into a new question session. Push transcript segments to
+    /live/sessions/{session_id}/segments, or let the backend replay a transcript file in real time.
+    Questions appear in GET /questions?session_id=... as soon as they are extracted.
+    """
+    try:
+        session = start_live_session(req.categories, replay_path=req.replay_transcript_path, speed=req.speed)
+        return {"status": "success", "session": session.status()}
+    except FileNotFoundError as fnf_err:
+        raise HTTPException(status_code=404, detail=str(fnf_err))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/live/sessions/{session_id}/segments")
+async def push_live_segment(session_id: str, req: LiveSegmentRequest):
+    session = get_live_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Live session not found.")
+    added = session.ingest(req.text, flush=req.flush)
+    return {"status": "success", "added": added, "session": session.status()}
+
+@app.get("/live/sessions/{session_id}")
+async def get_live_session_status(session_id: str):
+    session = get_live_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Live session not found.")
+    return {"status": "success", "session": session.status()}
+
+@app.delete("/live/sessions/{session_id}")
+async def end_live_session(session_id: str):
+    """
+    Stop a live session after extracting the segments that are still pending.
+    """
+    session = await stop_live_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Live session not found.")
+    return {"status": "success", "session": session.status(), "questions": await run_io(load_questions, session_id)}
+
+@app.get("/extract-questions/stream")
+async def stream_extract_questions(transcript_path: Optional[str] = None, categories: List[str] = Query([])):
+    """
+    Extract questions as a server-sent event stream (default: from the most recent transcript).
+    Emits `session` with the new session id, then `question` for every question as soon as the model
+    has written it (each is saved before it is sent), `warning` when part of the transcript failed,
+    and finally `done` with the stored questions, including their clusters (or `error`).
+    """
+    from .services.storage_service import load_most_recent_transcript_file
+
+    try:
+        transcript_path = transcript_path or await run_io(load_most_recent_transcript_file)
+        transcript_text = await run_io(_read_text, transcript_path)
+    except FileNotFoundError as fnf_err:
+        raise HTTPException(status_code=404, detail=str(fnf_err))
+
+    async def event_stream():
+        try:
+            session_id = await run_io(create_question_session, [], source=transcript_path)
+            yield _sse("session", {"sessionId": session_id, "transcriptPath": transcript_path})
+            count = 0
+            async for item in stream_questions_from_transcript(transcript_text, list(categories)):
+                if item["event"] == "question":
+                    await _attach_retrieval([item["data"]])
+                    await run_io(append_questions, session_id, [item["data"]])
+                    count += 1
+                yield _sse(item["event"], item["data"])
+            clusters = await run_cpu(assign_clusters, session_id)
+            # The questions as stored, with their clusterId and current version
+            questions = await run_io(load_questions, session_id)
+            yield _sse("done", {"sessionId": session_id, "count": count, "clusters": clusters["clusters"],
+                                "questions": questions})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/extract-latest-questions")
 async def extract_latest_questions():
     """
@@ -242,39 +755,42 @@ async def extract_latest_questions():
     calls the existing extract_questions_from_transcript() logic,
     saves the resulting questions, and returns them.
     """
-    from .services.storage_service import load_most_recent_transcript_file, save_questions_json
+    from .services.storage_service import load_most_recent_transcript_file
     from .services.question_extractor import extract_questions_from_transcript
 
     try:
         # 1) find the most recent transcript file
-        latest_transcript_path = load_most_recent_transcript_file()
+        latest_transcript_path = await run_io(load_most_recent_transcript_file)
 
         # 2) read the transcript text
-        with open(latest_transcript_path, "r", encoding="utf-8") as f:
-            transcript_text = f.read()
+        transcript_text = await run_io(_read_text, latest_transcript_path)
 
         # 3) Try to load the list of speakers from the CSV file
         list_of_speakers = ""
         speakers_path = os.path.join(os.path.dirname(os.path.dirname(__file__)),
                                      "data", "list_of_speakers", "list_of_speakers.csv")
         if os.path.exists(speakers_path):
-            with open(speakers_path, 'r', encoding='utf-8') as f:
-                list_of_speakers = f.read()
+            list_of_speakers = await run_io(_read_text, speakers_path)
 
         # 4) call the existing question extraction logic
-        questions_list = extract_questions_from_transcript(
+        questions_list = await run_network(
+            extract_questions_from_transcript,
             transcript_text,
             categories=["Algemeen", "Regeldruk", "Toezicht", "Wetgeving"],
             list_of_speakers=list_of_speakers
         )
 
-        # 5) save the resulting questions to data/questions/
-        output_path = save_questions_json(questions_list)
+        # 5) retrieve the knowledge base pages for all questions in one pass
+        await _attach_retrieval(questions_list)
+
+        # 6) save the resulting questions as a new session
+        session_id = await run_io(create_question_session, questions_list, source=latest_transcript_path)
+        await run_cpu(assign_clusters, session_id)
 
         return {
             "status": "success",
-            "questions": questions_list,
-            "outputPath": output_path,
+            "questions": await run_io(load_questions, session_id),
+            "sessionId": session_id,
             "message": f"Questions extracted from {latest_transcript_path}"
         }
     except FileNotFoundError as fnf_err:
@@ -283,6 +799,81 @@ async def extract_latest_questions():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _require_admin(token: Optional[str]):
+    """
+    Reject requests to the /admin endpoints without the configured admin token.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled: LLMINISTER_ADMIN_TOKEN is not set.")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+@app.post("/admin/knowledge")
+def add_knowledge_document(file: UploadFile = File(...), x_admin_token: Optional[str] = Header(None)):
+    """
+    Add a PDF to the knowledge base (or replace the PDF with the same name)
+    and index its pages without rebuilding the whole index.
+    Defined without async so indexing runs in the threadpool while searches continue.
+    """
+    _require_admin(x_admin_token)
+    _require_knowledge_base()
+    try:
+        from .services.answer_generation import get_knowledge_base
+
+        filename = os.path.basename(file.filename or "")
+        if not filename.lower().endswith(".pdf"):
+            raise HTTPException(status_code=400, detail="Only PDF files can be added.")
+
+        kb = get_knowledge_base()
+        kb.pdf_dir.mkdir(parents=True, exist_ok=True)
+        target = kb.pdf_dir / filename
+        # Written under a name the watcher ignores (not *.pdf) and moved into place when complete,
+        # so a half-written PDF is never indexed
+        tmp_path = kb.pdf_dir / f".{filename}.{uuid.uuid4().hex}.upload"
+        try:
+            with open(tmp_path, "wb") as f:
+                shutil.copyfileobj(file.file, f)
+            os.replace(tmp_path, target)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        result = kb.add_pdf(str(target))
+        return {"status": "success", **result}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/admin/knowledge/{source}")
+def remove_knowledge_document(source: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Remove a PDF and its pages from the knowledge base.
+    """
+    _require_admin(x_admin_token)
+    _require_knowledge_base()
+    try:
+        from .services.answer_generation import get_knowledge_base
+        result = get_knowledge_base().remove_source(os.path.basename(source), delete_file=True)
+        return {"status": "success", **result}
+    except FileNotFoundError as fnf_err:
+        raise HTTPException(status_code=404, detail=str(fnf_err))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/admin/knowledge/sync")
+def sync_knowledge_base(x_admin_token: Optional[str] = Header(None)):
+    """
+    Re-scan the knowledge directory: index new or changed PDFs and drop removed ones.
+    """
+    _require_admin(x_admin_token)
+    _require_knowledge_base()
+    try:
+        from .services.answer_generation import get_knowledge_base
+        result = get_knowledge_base().sync()
+        return {"status": "success", **result}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/pdf")
 async def get_pdf(path: str = Query(..., description="Path to the PDF file")):
     """
@@ -312,14 +903,12 @@ async def get_pdf(path: str = Query(..., description="Path to the PDF file")):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/pdf-page")
-async def get_pdf_page(source: str, page: int):
+async def get_pdf_page(source: str, page: int, request: Request):
     """
     Extract a specific page from a PDF and return it as a standalone PDF.
+    Pages are cached on disk; responses carry a strong ETag, and a matching If-None-Match gets a 304.
     """
     try:
-        from PyPDF2 import PdfReader, PdfWriter
-        import io
-
         # Security check - only allow PDFs from the data/available_knowledge directory
         base_dir = PathLib(__file__).parent.parent.parent.parent / "data" / "available_knowledge"
         full_path = os.path.join(base_dir, source)
@@ -334,78 +923,59 @@ async def get_pdf_page(source: str, page: int):
         if not os.path.isfile(full_path):
             raise HTTPException(status_code=404, detail="File not found")
 
-        # Extract the specific page
-        reader = PdfReader(full_path)
-        writer = PdfWriter()
-
-        # Adjust to 0-based indexing
-        page_idx = page - 1
+        etag = await run_io(page_etag, full_path, page)
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={PDF_PAGE_MAX_AGE}, must-revalidate"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
 
-        if page_idx < 0 or page_idx >= len(reader.pages):
-            raise HTTPException(status_code=404, detail="Page number out of range")
-
-        writer.add_page(reader.pages[page_idx])
-
-        # Write to bytes buffer
-        output_buffer = io.BytesIO()
-        writer.write(output_buffer)
-        output_buffer.seek(0)
+        try:
+            page_path = await get_page_cache().get(full_path, page)
+        except PageOutOfRangeError as e:
+            raise HTTPException(status_code=404, detail=str(e))
 
         # Return the PDF file
-        return StreamingResponse(
-            output_buffer,
+        return FileResponse(
+            page_path,
             media_type="application/pdf",
             headers={
+                **headers,
                 "Content-Disposition": f"inline; filename={source.replace('.pdf', '')}_page_{page}.pdf"
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/pdf-page-cache/stats")
+async def pdf_page_cache_stats():
+    return {"status": "success", "stats": get_page_cache().stats()}
+
+@app.get("/executors/stats")
+async def executors_stats():
+    """
+    Per pool (network, cpu, io): size, calls waiting for a thread, running calls and recent wait times.
+    """
+    return {"status": "success", "pools": executor_stats()}
+
+@app.get("/providers/stats")
+async def providers_stats():
+    """
+    Base URLs and circuit breaker state of the Anthropic and AssemblyAI clients.
+    """
+    return {"status": "success", "providers": provider_stats()}
+
 # Add a new endpoint to get page content as text
 @app.get("/api/pdf-text")
 async def get_pdf_text(source: str, page: int):
     """
     Get the text content of a specific PDF page.
     """
+    _require_knowledge_base()
     try:
         from .services.answer_generation import get_pdf_page_data
-        page_data = get_pdf_page_data(source, page)
+        page_data = await run_io(get_pdf_page_data, source, page)
         return {"status": "success", "data": page_data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-
-@app.post("/generate-answers")
-async def generate_answers(req: BulkGenerateAnswersRequest):
-    try:
-        questions = load_most_recent_questions_json()
-        if not questions:
-            raise HTTPException(status_code=404, detail="No questions available.")
-
-        for qid in req.question_ids:
-            for q in questions:
-                if q["id"] == qid:
-                    # Call the enhanced answer generation function
-                    result = generate_rag_answer(
-                        q["text"],  # Use text or question_text based on your data structure
-                        speaker=q.get("speaker", "Unknown"),
-                        party=q.get("party", "Unknown"),
-                        category=q.get("category", "Algemeen")
-                    )
-
-                    # Store the complete structured data for frontend use
-                    q["draftAnswer"] = result
-
-                    from datetime import datetime
-                    q["updatedAt"] = datetime.now().isoformat()
-                    break
-
-        save_questions_json(questions, override=True)
-        return {
-            "status": "success",
-            "message": "Draft answers generated successfully.",
-            "questions": questions
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
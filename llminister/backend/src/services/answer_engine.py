@@ -0,0 +1,208 @@
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Callable, Awaitable
+
+import anthropic
+
+from .answer_generation import generate_rag_answer, estimate_answer_tokens, get_cached_answer, ANSWER_MAX_TOKENS
+from .executors import run_network, run_cpu, run_io
+from .provider_clients import CircuitOpenError
+
+# Concurrency and rate limits for bulk answer generation (0 disables a limit)
+ANSWER_CONCURRENCY = int(os.environ.get("ANSWER_CONCURRENCY", "4"))
+ANTHROPIC_REQUESTS_PER_MINUTE = int(os.environ.get("ANTHROPIC_REQUESTS_PER_MINUTE", "50"))
+ANTHROPIC_TOKENS_PER_MINUTE = int(os.environ.get("ANTHROPIC_TOKENS_PER_MINUTE", "40000"))
+
+# Retries for rate-limited (429), overloaded (529) and failed requests; the only retry layer
+# for bulk answers (the SDK client is called with max_retries=0)
+ANSWER_MAX_RETRIES = int(os.environ.get("ANSWER_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504, 529}
+
+
+@dataclass
+class AnswerJob:
+    """
+    One question to draft an answer for
+    """
+    question_id: str
+    question_text: str
+    speaker: str = "Unknown"
+    party: str = "Unknown"
+    category: str = "Algemeen"
+    retrieved_docs: Optional[List[Dict]] = None
+    use_cache: bool = True  # False forces a new model call
+
+
+@dataclass
+class AnswerResult:
+    """
+    Outcome of an AnswerJob: either a draft answer or an error message
+    """
+    question_id: str
+    draft: Optional[Dict] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    seconds: float = 0.0
+    cached: bool = False
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window on both requests and (estimated) input tokens.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, window_seconds: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window_seconds = window_seconds
+        self._events = deque()  # (timestamp, tokens)
+        self._tokens_in_window = 0
+        self._lock = asyncio.Lock()
+
+    def _expire(self, now: float):
+        while self._events and now - self._events[0][0] >= self.window_seconds:
+            _, tokens = self._events.popleft()
+            self._tokens_in_window -= tokens
+
+    def _has_room(self, tokens: int) -> bool:
+        if self.requests_per_minute and len(self._events) >= self.requests_per_minute:
+            return False
+        if self.tokens_per_minute and self._events and self._tokens_in_window + tokens > self.tokens_per_minute:
+            return False
+        return True
+
+    async def acquire(self, tokens: int = 0):
+        """
+        Wait until one more request of `tokens` tokens fits in the window, then claim it.
+        Waiters are served in arrival order.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                if self._has_room(tokens):
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+                wait = self.window_seconds - (now - self._events[0][0])
+                await asyncio.sleep(max(wait, 0.05))
+
+
+_rate_limiter = None
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    The process-wide limiter, shared by all concurrent bulk requests.
+    Created lazily so it binds to the running event loop.
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(ANTHROPIC_REQUESTS_PER_MINUTE, ANTHROPIC_TOKENS_PER_MINUTE)
+    return _rate_limiter
+
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying after `error`, or None when it should not be retried.
+    Honours the Retry-After header when the API sends one. An open circuit is not retried:
+    the provider already failed repeatedly, so the job fails right away.
+    """
+    if isinstance(error, CircuitOpenError):
+        return None
+    status = getattr(error, "status_code", None)
+    connection_error = isinstance(error, anthropic.APIConnectionError)
+    if status not in RETRYABLE_STATUS_CODES and not connection_error:
+        return None
+
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+
+    # Exponential backoff with jitter, so parallel workers don't retry in lockstep
+    return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+async def _run_job(job: AnswerJob, semaphore: asyncio.Semaphore, limiter: RateLimiter,
+                   max_retries: int) -> AnswerResult:
+    result = AnswerResult(question_id=job.question_id)
+    started = time.perf_counter()
+
+    # Cache hits skip the concurrency and rate limits entirely
+    if job.use_cache and job.retrieved_docs is not None:
+        result.draft = await run_io(get_cached_answer, job.question_text, job.retrieved_docs)
+        if result.draft is not None:
+            result.cached = True
+            result.seconds = time.perf_counter() - started
+            return result
+
+    async with semaphore:
+        tokens = (await run_cpu(estimate_answer_tokens, job.question_text, job.retrieved_docs)
+                  if job.retrieved_docs is not None else ANSWER_MAX_TOKENS)
+        for attempt in range(max_retries + 1):
+            result.attempts = attempt + 1
+            await limiter.acquire(tokens)
+            try:
+                # The Anthropic client is blocking: run it on the network pool to keep the event loop free
+                result.draft = await run_network(
+                    generate_rag_answer,
+                    job.question_text,
+                    speaker=job.speaker,
+                    party=job.party,
+                    category=job.category,
+                    retrieved_docs=job.retrieved_docs,
+                    # Already looked up above when the context was known
+                    use_cache=job.use_cache and job.retrieved_docs is None,
+                    # This loop is the only retry layer, so every attempt passes the rate limiter
+                    max_retries=0
+                )
+                result.error = None
+                break
+            except Exception as e:
+                result.error = str(e)
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt == max_retries:
+                    print(f"Answer generation failed for {job.question_id}: {e}")
+                    break
+                print(f"Retrying {job.question_id} in {delay:.1f}s after: {e}")
+                await asyncio.sleep(delay)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+async def generate_answers_concurrently(
+    jobs: List[AnswerJob],
+    on_result: Optional[Callable[[AnswerResult], Awaitable[None]]] = None,
+    concurrency: int = ANSWER_CONCURRENCY,
+    max_retries: int = ANSWER_MAX_RETRIES,
+) -> List[AnswerResult]:
+    """
+    Draft answers for all jobs with at most `concurrency` model calls in flight,
+    within the shared request/token rate limits.
+
+    A failing question does not affect the others: its AnswerResult carries the error.
+    `on_result` is awaited as soon as each question finishes (in completion order),
+    e.g. to save progress. Results are returned in job order.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    limiter = get_rate_limiter()
+
+    async def run(job: AnswerJob) -> AnswerResult:
+        result = await _run_job(job, semaphore, limiter, max_retries)
+        if on_result is not None:
+            try:
+                await on_result(result)
+            except Exception as e:
+                print(f"Error handling answer result for {job.question_id}: {e}")
+        return result
+
+    return await asyncio.gather(*(run(job) for job in jobs))
@@ -1,59 +1,44 @@
 import os
 import re
+import copy
 import json
-from typing import Dict, List, Tuple, Optional, Any
-import anthropic
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Tuple, Optional, Any
 
-from .knowledgebase import KnowledgeBase
+from .knowledgebase import KnowledgeBase, PASSAGE_MAX_CHARS, PASSAGE_SEPARATOR, text_units
+from .storage_service import ANSWERS_DIR, atomic_write_text
+from .provider_clients import anthropic_call, get_anthropic_client, get_async_anthropic_client
+from .executors import run_cpu, run_io
 
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 
-# Create a single global knowledge base instance (for performance)
-_kb = KnowledgeBase(pdf_dir="data/available_knowledge")
+# Create a single global knowledge base instance (for performance).
+# It starts empty; start_knowledge_base_warm_up() loads the index in the background.
+_kb = KnowledgeBase(pdf_dir="data/available_knowledge", load=False)
+_kb_warm_up: Optional[threading.Thread] = None
 
-def generate_rag_answer(question_text: str, speaker: str = "Unknown", party: str = "Unknown", category: str = "Algemeen") -> Dict:
-    """
-    1. Use TF-IDF knowledge base to get top 5 relevant pages
-    2. Construct prompt with sources
-    3. Call Anthropic with special instructions to include sentence-level citations
-    4. Process the response to extract citations and structure data
-    5. Return the final draft answer with structured citations and source metadata
-
-    Returns a dict with:
-    - answer_text: The formatted answer with citations
-    - sources: List of source documents with metadata
-    - sentences: List of {text, citations} mappings for frontend highlighting
-    """
-    if not ANTHROPIC_API_KEY:
-        raise Exception("No ANTHROPIC_API_KEY in environment variables.")
-
-    # 1. retrieve top k pages
-    top_docs = _kb.search(question_text, top_k=5)
+# Optionally pick up PDFs dropped into the knowledge directory while running (seconds, 0 = off)
+KB_WATCH_INTERVAL = float(os.environ.get("KB_WATCH_INTERVAL", "0"))
 
-    # Create a unique ID for each source doc
-    sources = []
-    doc_id_map = {}  # Maps source+page to an ID
 
-    for i, doc in enumerate(top_docs):
-        source_id = f"source-{i+1}"
-        doc_id_map[f"{doc['source']}|{doc['page']}"] = source_id
+class KnowledgeBaseNotReady(Exception):
+    """
+    Raised by retrieval while the knowledge base index is still loading.
+    """
 
-        sources.append({
-            "id": source_id,
-            "title": doc['source'],
-            "page": doc['page'],
-            "file_path": doc['file_path'],
-            "similarity_score": doc.get('similarity_score', 0)
-        })
+# Number of knowledge base passages used as context for one answer (passages of one page are merged)
+TOP_K = 5
 
-    # 2. build context with citations and source IDs
-    context_str = ""
-    for i, doc in enumerate(top_docs):
-        source_id = f"source-{i+1}"
-        context_str += f"[{source_id}] Bron: {doc['source']} p.{doc['page']}\n{doc['content']}\n\n"
+ANSWER_MODEL = "claude-3-7-sonnet-20250219"
+ANSWER_MAX_TOKENS = 3000
+ANSWER_TEMPERATURE = 0
 
-    # 3. build system and user messages with enhanced citation instructions
-    system_message = """\
+# System prompt with the citation instructions for draft answers
+SYSTEM_MESSAGE = """\
 - Je bent een ambtenaar (public official) die werkt voor het Nederlandse Ministerie van Economische Zaken.
 - Je taak is het voorbereiden van antwoorden op parlementaire vragen over het Adviescollege Toetsing Regeldruk (ATR).
 - Deze antwoorden zullen worden gebruikt door de Minister van Economische Zaken om vragen in de Tweede Kamer te beantwoorden.
@@ -82,6 +67,309 @@ BELANGRIJK:
 - Elke zin MOET eindigen met minstens één bronvermelding
 """
 
+# Token budget for the knowledge base excerpts in one answer prompt (estimated locally, see pack_context)
+ANSWER_CONTEXT_TOKENS = int(os.environ.get("ANSWER_CONTEXT_TOKENS", "3000"))
+
+# Bump when the user prompt template changes, so cached answers from the old prompt are not reused
+ANSWER_PROMPT_VERSION = 2
+
+# Number of draft answers kept in memory; older ones are still found on disk
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "256"))
+
+
+class AnswerCache:
+    """
+    Two-tier cache of generated draft answers: an in-memory LRU in front of
+    one JSON file per key on disk. Keys are content hashes (see answer_cache_key).
+    """
+
+    def __init__(self, directory: Path, max_entries: int):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"answer_{key}.json"
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return copy.deepcopy(self._memory[key])
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, value)
+        return copy.deepcopy(value)
+
+    def put(self, key: str, value: Dict):
+        with self._lock:
+            self._remember(key, copy.deepcopy(value))
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Unique temporary file per writer, so concurrent puts of one key don't clobber each other
+            atomic_write_text(self._path(key), json.dumps(value, ensure_ascii=False))
+        except Exception as e:
+            print(f"Failed to write answer cache entry: {e}")
+
+    def _remember(self, key: str, value: Dict):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """
+        Forget the in-memory entries (files on disk are removed by storage_service.reset_data).
+        """
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+_answer_cache = AnswerCache(ANSWERS_DIR, ANSWER_CACHE_SIZE)
+
+def _normalize_question(question_text: str) -> str:
+    text = unicodedata.normalize("NFKC", question_text).lower()
+    return " ".join(text.split())
+
+def answer_cache_key(question_text: str, top_docs: List[Dict]) -> str:
+    """
+    Content-addressed key of a draft answer: the normalized question, the retrieved pages
+    (by source, page and content hash), the model settings, the context budget and the prompt version.
+    Speaker and party are left out on purpose, so the same question asked by
+    different members (or extracted twice) shares one draft.
+    """
+    digest = hashlib.sha256()
+    digest.update(_normalize_question(question_text).encode("utf-8"))
+    for doc in top_docs:
+        content_hash = hashlib.sha256(doc["content"].encode("utf-8")).hexdigest()
+        digest.update(f"\n{doc['source']}|{doc['page']}|{content_hash}".encode("utf-8"))
+    digest.update(f"\n{ANSWER_MODEL}|{ANSWER_TEMPERATURE}|{ANSWER_MAX_TOKENS}|{ANSWER_CONTEXT_TOKENS}|"
+                  f"{ANSWER_PROMPT_VERSION}".encode("utf-8"))
+    digest.update(hashlib.sha256(SYSTEM_MESSAGE.encode("utf-8")).hexdigest().encode("utf-8"))
+    return digest.hexdigest()
+
+def get_cached_answer(question_text: str, top_docs: List[Dict]) -> Optional[Dict]:
+    """
+    The cached draft answer for this question and context, or None.
+    """
+    return _answer_cache.get(answer_cache_key(question_text, top_docs))
+
+def get_answer_cache_stats() -> Dict:
+    return _answer_cache.stats()
+
+def clear_answer_cache():
+    _answer_cache.clear()
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough local token estimate (about 4 characters per token for Dutch prose),
+    good enough for rate limiting and budgeting without calling the API.
+    """
+    return len(text) // 4 + 1
+
+def retrieve_context_many(question_texts: List[str], top_k: int = TOP_K) -> List[List[Dict]]:
+    """
+    Retrieve the top_k passages for several questions in one vectorized pass.
+    The result for question i can be passed to generate_rag_answer(retrieved_docs=...).
+    """
+    return _ready_kb().search_passages_many(question_texts, top_k=top_k)
+
+def _excerpt_digest(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+def summarize_retrieval(top_docs: List[Dict]) -> List[Dict]:
+    """
+    Compact form of retrieved pages (source, page, score, passage offsets) to store with a question.
+    restore_retrieval() turns it back into the documents, without searching again.
+    """
+    summary = []
+    for doc in top_docs:
+        entry = {"source": doc["source"], "page": doc["page"],
+                 "similarity_score": round(float(doc.get("similarity_score", 0)), 4)}
+        if "passages" in doc:
+            entry["passages"] = [list(span) for span in doc["passages"]]
+            entry["digest"] = _excerpt_digest(doc["content"])
+        summary.append(entry)
+    return summary
+
+def restore_retrieval(retrieval: List[Dict]) -> Optional[List[Dict]]:
+    """
+    Documents of a stored retrieval (see summarize_retrieval), with the same excerpts as when it was made.
+    Returns None when it is stale: a page is gone, or its text changed since the retrieval was stored.
+    """
+    kb = _ready_kb()
+    top_docs = []
+    for entry in retrieval:
+        doc = kb.get_pdf_page(entry["source"], entry["page"])
+        if doc is None or "passages" not in entry:
+            return None
+        text = doc["content"]
+        if any(start < 0 or end > len(text) or start >= end for start, end in entry["passages"]):
+            return None
+        doc["content"] = PASSAGE_SEPARATOR.join(text[start:end] for start, end in entry["passages"])
+        if _excerpt_digest(doc["content"]) != entry.get("digest"):
+            return None
+        doc["passages"] = [list(span) for span in entry["passages"]]
+        doc["similarity_score"] = entry["similarity_score"]
+        top_docs.append(doc)
+    return top_docs
+
+def retrieve_for_questions(questions: List[Dict], top_k: int = TOP_K) -> List[List[Dict]]:
+    """
+    Context documents for each question: its stored `retrieval` when that is still valid,
+    otherwise from one batched search over the questions that need it.
+    """
+    results: List[Optional[List[Dict]]] = [
+        restore_retrieval(q["retrieval"]) if q.get("retrieval") else None for q in questions
+    ]
+    missing = [i for i, docs in enumerate(results) if docs is None]
+    if missing:
+        texts = [questions[i].get("question_text") or questions[i].get("text", "") for i in missing]
+        for i, top_docs in zip(missing, retrieve_context_many(texts, top_k=top_k)):
+            results[i] = top_docs
+    return results
+
+def _text_key(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def _score_texts(question_text: str, texts: List[str]) -> List[float]:
+    """
+    Relevance of each text to the question: TF-IDF cosine similarity in the knowledge base's
+    term space, or the number of shared words while the index is empty.
+    """
+    vectors = _kb.vectorize([question_text] + texts)
+    if vectors is not None:
+        return (vectors[1:] @ vectors[0].T).toarray().ravel().tolist()
+    terms = set(re.findall(r"\w{3,}", question_text.lower()))
+    return [len(terms & set(re.findall(r"\w{3,}", text.lower()))) for text in texts]
+
+def _join_units(content: str, units: List[Tuple[int, int, int]], chosen: List[int]) -> str:
+    """
+    The chosen units of `content`, consecutive ones as one stretch of the original text,
+    with PASSAGE_SEPARATOR wherever something was left out.
+    """
+    parts = []
+    run_start = None
+    for n, i in enumerate(chosen):
+        if run_start is None:
+            run_start = units[i][0]
+        next_i = chosen[n + 1] if n + 1 < len(chosen) else None
+        if next_i != i + 1 or units[next_i][2] != units[i][2]:
+            parts.append(content[run_start:units[i][1]])
+            run_start = None
+    return PASSAGE_SEPARATOR.join(parts)
+
+def pack_context(question_text: str, top_docs: List[Dict], budget: int = ANSWER_CONTEXT_TOKENS) -> List[Dict]:
+    """
+    Fit the retrieved pages into a token budget for the answer prompt. Pages are taken best first:
+    sentences that already appeared (in a better page or earlier on the same one) are dropped,
+    a page that still fits is kept as it is, and one that does not is trimmed to the sentences
+    most relevant to the question, until the budget is used up.
+    Returns copies of the pages that kept any content, each with its estimated 'tokens'.
+    """
+    packed = []
+    seen = set()
+    remaining = budget
+    for doc in sorted(top_docs, key=lambda d: -d.get("similarity_score", 0)):
+        header_tokens = estimate_tokens(f"[source-{len(packed) + 1}] Bron: {doc['source']} p.{doc['page']}\n\n")
+        if remaining - header_tokens <= 0:
+            break
+
+        # Sentences/paragraphs as (start, end, excerpt) spans in the content; excerpts are split by PASSAGE_SEPARATOR
+        content = doc["content"]
+        units = []
+        keys = []
+        offset = 0
+        for excerpt_index, excerpt in enumerate(content.split(PASSAGE_SEPARATOR)):
+            for start, end in text_units(excerpt, PASSAGE_MAX_CHARS):
+                key = _text_key(excerpt[start:end])
+                if key in seen or key in keys:
+                    continue
+                units.append((offset + start, offset + end, excerpt_index))
+                keys.append(key)
+            offset += len(excerpt) + len(PASSAGE_SEPARATOR)
+        if not units:
+            continue
+
+        # Each unit also pays for the separator it may need
+        costs = [estimate_tokens(content[start:end]) + estimate_tokens(PASSAGE_SEPARATOR) for start, end, _ in units]
+        available = remaining - header_tokens
+        if sum(costs) <= available:
+            chosen = list(range(len(units)))
+        else:
+            scores = _score_texts(question_text, [content[start:end] for start, end, _ in units])
+            chosen = []
+            for i in sorted(range(len(units)), key=lambda i: (-scores[i], i)):
+                if costs[i] <= available:
+                    chosen.append(i)
+                    available -= costs[i]
+            chosen.sort()
+        if not chosen:
+            continue
+
+        packed_doc = dict(doc)
+        packed_doc["content"] = _join_units(content, units, chosen)
+        packed_doc["tokens"] = header_tokens + estimate_tokens(packed_doc["content"])
+        packed.append(packed_doc)
+        seen.update(keys[i] for i in chosen)
+        remaining -= packed_doc["tokens"]
+    return packed
+
+def build_answer_prompt(question_text: str, speaker: str, party: str, category: str,
+                        top_docs: List[Dict]) -> Tuple[str, List[Dict]]:
+    """
+    Build the user message for a draft answer from the retrieved pages (as packed by pack_context).
+    Returns (user_message, sources), where sources carry the [source-N] ids used in the prompt.
+    """
+    # Create a unique ID for each source doc
+    sources = []
+    doc_id_map = {}  # Maps source+page to an ID
+
+    for i, doc in enumerate(top_docs):
+        source_id = f"source-{i+1}"
+        doc_id_map[f"{doc['source']}|{doc['page']}"] = source_id
+
+        sources.append({
+            "id": source_id,
+            "title": doc['source'],
+            "page": doc['page'],
+            "file_path": doc['file_path'],
+            "similarity_score": doc.get('similarity_score', 0),
+            "passages": doc.get('passages')
+        })
+
+    # build context with citations and source IDs
+    context_str = ""
+    for i, doc in enumerate(top_docs):
+        source_id = f"source-{i+1}"
+        context_str += f"[{source_id}] Bron: {doc['source']} p.{doc['page']}\n{doc['content']}\n\n"
+
     user_message = f"""Vraag uit het parlement:
 {question_text}
 Gesteld door: {speaker} ({party})
@@ -90,64 +378,230 @@ Beschikbare kennisbasis (meest relevante documenten):
 {context_str}
 Geef een conceptantwoord op deze parlementaire vraag, volgens de vereisten in de systeemprompt."""
 
-    # 4. Call Anthropic using Messages API
-    client = anthropic.Client(api_key=ANTHROPIC_API_KEY)
-    response = client.messages.create(
-        model="claude-3-7-sonnet-20250219",
-        max_tokens=3000,
-        system=system_message,
-        messages=[
-            {"role": "user", "content": user_message}
-        ],
-        temperature=0,
-    )
-
-    # 5. Extract the answer text from the response
-    answer_text = response.content[0].text.strip()
+    return user_message, sources
 
-    # 6. Process the answer to extract sentence-level citations
+def estimate_answer_tokens(question_text: str, top_docs: List[Dict]) -> int:
+    """
+    Estimated input tokens of the answer prompt for a question and its retrieved pages.
+    """
+    user_message, _ = build_answer_prompt(question_text, "", "", "", pack_context(question_text, top_docs))
+    return estimate_tokens(SYSTEM_MESSAGE) + estimate_tokens(user_message)
+
+# A sentence followed by one or more [source-N] citations
+SENTENCE_PATTERN = re.compile(r'(.+?[.!?])\s*(\[source-\d+\](?:\[source-\d+\])*)')
+
+def parse_answer(answer_text: str, sources: List[Dict]) -> Dict:
+    """
+    Split the model answer into sentences with their [source-N] citations
+    resolved against `sources`, and return the structured draft answer.
+    """
     sentences = []
-    # Split answer into sentences with their citations
-    pattern = r'(.*?)(\[source-\d+\])+'
 
     # Find all sentences and their citations using regex
-    for match in re.finditer(r'(.+?[.!?])\s*(\[source-\d+\](?:\[source-\d+\])*)', answer_text):
+    for match in SENTENCE_PATTERN.finditer(answer_text):
         sentence_text = match.group(1).strip()
         citations_text = match.group(2)
-
-        # Extract all source IDs from the citations
-        source_ids = re.findall(r'\[source-(\d+)\]', citations_text)
-
-        # Map source IDs to the actual sources
-        citations = []
-        for source_id in source_ids:
-            source_index = int(source_id) - 1
-            if 0 <= source_index < len(sources):
-                citations.append({
-                    "source_id": f"source-{source_id}",
-                    "title": sources[source_index]["title"],
-                    "page": sources[source_index]["page"]
-                })
-
         sentences.append({
             "text": sentence_text,
-            "citations": citations
+            "citations": resolve_citations(citations_text, sources)
         })
 
     # Create the final structured result
-    result = {
+    return {
         "answer_text": answer_text,
         "sources": sources,
         "sentences": sentences
     }
 
+def resolve_citations(citations_text: str, sources: List[Dict]) -> List[Dict]:
+    """
+    Map the [source-N] markers in citations_text to the actual sources.
+    """
+    # Extract all source IDs from the citations
+    source_ids = re.findall(r'\[source-(\d+)\]', citations_text)
+
+    citations = []
+    for source_id in source_ids:
+        source_index = int(source_id) - 1
+        if 0 <= source_index < len(sources):
+            citations.append({
+                "source_id": f"source-{source_id}",
+                "title": sources[source_index]["title"],
+                "page": sources[source_index]["page"]
+            })
+    return citations
+
+class CitationStreamParser:
+    """
+    Incremental version of parse_answer for streamed answers: feed() text chunks as they
+    arrive and get back each sentence (with resolved citations) as soon as it is closed,
+    i.e. once the text after its citations can no longer be another citation.
+    """
+
+    def __init__(self, sources: List[Dict]):
+        self.sources = sources
+        self._buffer = ""
+
+    @staticmethod
+    def _may_continue(rest: str) -> bool:
+        # True when `rest` could still grow into another "[source-N]" citation
+        return "[source-".startswith(rest) or re.fullmatch(r'\[source-\d+', rest) is not None
+
+    def _drain(self, final: bool) -> List[Dict]:
+        sentences = []
+        while True:
+            match = SENTENCE_PATTERN.search(self._buffer)
+            if not match:
+                break
+            if not final and self._may_continue(self._buffer[match.end():]):
+                break
+            sentences.append({
+                "text": match.group(1).strip(),
+                "citations": resolve_citations(match.group(2), self.sources)
+            })
+            self._buffer = self._buffer[match.end():]
+        return sentences
+
+    def feed(self, chunk: str) -> List[Dict]:
+        self._buffer += chunk
+        return self._drain(final=False)
+
+    def close(self) -> List[Dict]:
+        return self._drain(final=True)
+
+def _context_docs(question_text: str, retrieved_docs: Optional[List[Dict]],
+                  retrieval: Optional[List[Dict]]) -> List[Dict]:
+    if retrieved_docs is not None:
+        return retrieved_docs
+    if retrieval:
+        restored = restore_retrieval(retrieval)
+        if restored is not None:
+            return restored
+    return _ready_kb().search_passages(question_text, top_k=TOP_K)
+
+async def stream_rag_answer(question_text: str, speaker: str = "Unknown", party: str = "Unknown",
+                            category: str = "Algemeen",
+                            retrieved_docs: Optional[List[Dict]] = None,
+                            use_cache: bool = True,
+                            retrieval: Optional[List[Dict]] = None) -> AsyncIterator[Dict]:
+    """
+    Streaming variant of generate_rag_answer. Yields events as dicts { 'event', 'data' }:
+    - sources:  the retrieved sources, before the model is called
+    - token:    { 'text' } for every text delta from the model
+    - sentence: { 'text', 'citations' } as soon as a cited sentence is complete
+    - answer:   the final structured draft answer (same shape as generate_rag_answer)
+    A cached answer is replayed as sources, sentence and answer events without tokens.
+    """
+    # Retrieval, context packing and the cache files run off the event loop
+    top_docs = await run_cpu(_context_docs, question_text, retrieved_docs, retrieval)
+    cache_key = answer_cache_key(question_text, top_docs)
+    if use_cache:
+        cached = await run_io(_answer_cache.get, cache_key)
+        if cached is not None:
+            yield {"event": "sources", "data": cached["sources"]}
+            for sentence in cached["sentences"]:
+                yield {"event": "sentence", "data": sentence}
+            yield {"event": "answer", "data": cached}
+            return
+
+    if not ANTHROPIC_API_KEY:
+        raise Exception("No ANTHROPIC_API_KEY in environment variables.")
+
+    context_docs = await run_cpu(pack_context, question_text, top_docs)
+    user_message, sources = build_answer_prompt(question_text, speaker, party, category, context_docs)
+    yield {"event": "sources", "data": sources}
+
+    parser = CitationStreamParser(sources)
+    chunks = []
+    client = get_async_anthropic_client()
+    with anthropic_call():
+        async with client.messages.stream(
+            model=ANSWER_MODEL,
+            max_tokens=ANSWER_MAX_TOKENS,
+            system=SYSTEM_MESSAGE,
+            messages=[
+                {"role": "user", "content": user_message}
+            ],
+            temperature=ANSWER_TEMPERATURE,
+        ) as stream:
+            async for text in stream.text_stream:
+                chunks.append(text)
+                yield {"event": "token", "data": {"text": text}}
+                for sentence in parser.feed(text):
+                    yield {"event": "sentence", "data": sentence}
+
+    for sentence in parser.close():
+        yield {"event": "sentence", "data": sentence}
+
+    result = parse_answer("".join(chunks).strip(), sources)
+    result["context_tokens"] = sum(doc["tokens"] for doc in context_docs)
+    await run_io(_answer_cache.put, cache_key, result)
+    yield {"event": "answer", "data": result}
+
+def generate_rag_answer(question_text: str, speaker: str = "Unknown", party: str = "Unknown", category: str = "Algemeen",
+                        retrieved_docs: Optional[List[Dict]] = None, use_cache: bool = True,
+                        retrieval: Optional[List[Dict]] = None, max_retries: Optional[int] = None) -> Dict:
+    """
+    1. Use TF-IDF knowledge base to get the top 5 relevant passages, grouped per page
+       (skipped when retrieved_docs is given, e.g. from retrieve_context_many, or when the
+       question's stored `retrieval` is passed and still valid)
+       and return the cached answer for the same question and pages, unless use_cache is False
+    2. Pack the pages into the context budget (pack_context) and construct the prompt with sources
+    3. Call Anthropic with special instructions to include sentence-level citations
+    4. Process the response to extract citations and structure data
+    5. Return the final draft answer with structured citations and source metadata
+
+    Returns a dict with:
+    - answer_text: The formatted answer with citations
+    - sources: List of source documents with metadata
+    - sentences: List of {text, citations} mappings for frontend highlighting
+    - context_tokens: Estimated tokens of the knowledge base excerpts in the prompt
+
+    max_retries overrides the client's retries of the model call (0 for callers that retry themselves).
+    """
+    # 1. retrieve top k passages (grouped per page)
+    top_docs = _context_docs(question_text, retrieved_docs, retrieval)
+
+    cache_key = answer_cache_key(question_text, top_docs)
+    if use_cache:
+        cached = _answer_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if not ANTHROPIC_API_KEY:
+        raise Exception("No ANTHROPIC_API_KEY in environment variables.")
+
+    # 2. fit the pages into the context budget and build the prompt with citations and source IDs
+    context_docs = pack_context(question_text, top_docs)
+    user_message, sources = build_answer_prompt(question_text, speaker, party, category, context_docs)
+
+    # 3. Call Anthropic using Messages API (shared, pooled client)
+    client = get_anthropic_client(max_retries)
+    with anthropic_call():
+        response = client.messages.create(
+            model=ANSWER_MODEL,
+            max_tokens=ANSWER_MAX_TOKENS,
+            system=SYSTEM_MESSAGE,
+            messages=[
+                {"role": "user", "content": user_message}
+            ],
+            temperature=ANSWER_TEMPERATURE,
+        )
+
+    # 4. Extract the answer text from the response
+    answer_text = response.content[0].text.strip()
+
+    # 5. Process the answer to extract sentence-level citations
+    result = parse_answer(answer_text, sources)
+    result["context_tokens"] = sum(doc["tokens"] for doc in context_docs)
+    _answer_cache.put(cache_key, result)
     return result
 
 def get_pdf_page_data(source: str, page: int) -> Dict:
     """
     Retrieve the specific PDF page data for displaying in the UI.
     """
-    page_data = _kb.get_pdf_page(source, page)
+    page_data = _ready_kb().get_pdf_page(source, page)
     if not page_data:
         return {"error": "Page not found"}
 
@@ -156,4 +610,40 @@ def get_pdf_page_data(source: str, page: int) -> Dict:
         "page": page_data["page"],
         "content": page_data["content"],
         "file_path": page_data["file_path"]
-    }
\ No newline at end of file
+    }
+
+def get_knowledge_base() -> KnowledgeBase:
+    """
+    The shared knowledge base instance, e.g. for admin endpoints that add or remove documents.
+    """
+    return _kb
+
+def _ready_kb() -> KnowledgeBase:
+    if not _kb.is_ready:
+        raise KnowledgeBaseNotReady("The knowledge base is still loading.")
+    return _kb
+
+def warm_up_knowledge_base():
+    """
+    Load the knowledge base index (from the cache, or by extracting the PDFs) and start the watcher.
+    """
+    try:
+        _kb.load()
+    except Exception as e:
+        print(f"Loading the knowledge base failed: {e}")
+        return
+    print(f"Knowledge base ready in {_kb.load_seconds:.1f}s.")
+    if KB_WATCH_INTERVAL > 0:
+        _kb.start_watcher(KB_WATCH_INTERVAL)
+
+def start_knowledge_base_warm_up():
+    """
+    Run warm_up_knowledge_base() in a background thread, so startup doesn't wait for indexing.
+    """
+    global _kb_warm_up
+    if _kb_warm_up is None:
+        _kb_warm_up = threading.Thread(target=warm_up_knowledge_base, name="kb-warm-up", daemon=True)
+        _kb_warm_up.start()
+
+def knowledge_base_status() -> Dict:
+    return {**_kb.status(), "loading": _kb_warm_up is not None and _kb_warm_up.is_alive()}
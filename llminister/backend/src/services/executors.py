@@ -0,0 +1,180 @@
+import os
+import time
+import asyncio
+import functools
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+# Threads per pool. Network calls (Anthropic, AssemblyAI) mostly wait, so that pool is the largest;
+# CPU work (retrieval, clustering) gets one thread per core; disk I/O a few.
+NETWORK_POOL_WORKERS = int(os.environ.get("NETWORK_POOL_WORKERS", "32"))
+CPU_POOL_WORKERS = int(os.environ.get("CPU_POOL_WORKERS", str(os.cpu_count() or 4)))
+IO_POOL_WORKERS = int(os.environ.get("IO_POOL_WORKERS", "8"))
+# Worker processes for pure-Python CPU work (PDF splitting), which would hold the GIL in a thread
+PROCESS_POOL_WORKERS = int(os.environ.get("PROCESS_POOL_WORKERS", str(os.cpu_count() or 4)))
+
+# Number of recent calls the wait time statistics are computed over
+WAIT_SAMPLES = 512
+
+
+def _timed_call(fn: Callable[..., T], args: tuple, kwargs: dict):
+    """
+    Runs in a worker process; also returns when the call started, for the wait statistics.
+    """
+    return time.time(), fn(*args, **kwargs)
+
+
+class InstrumentedPool:
+    """
+    Thread (or process) pool for one kind of blocking work, awaited from async code with run().
+    Tracks how many calls are waiting for a worker and how long they waited,
+    so a saturated pool shows up in stats() instead of as slow requests elsewhere.
+    """
+
+    def __init__(self, name: str, max_workers: int, processes: bool = False):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.processes = processes
+        if processes:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Run fn(*args, **kwargs) on this pool. Context variables are carried over, like asyncio.to_thread.
+        On a process pool fn and its arguments are pickled, so fn has to be a module-level function,
+        and context variables are not carried over.
+        """
+        if self.processes:
+            return await self._run_in_process(fn, args, kwargs)
+
+        submitted = time.monotonic()
+        with self._lock:
+            self.queued += 1
+
+        def call():
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self._waits.append(time.monotonic() - submitted)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+            return result
+
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(context.run, call))
+
+    async def _run_in_process(self, fn: Callable[..., T], args: tuple, kwargs: dict) -> T:
+        # A worker process can't update the counters, so calls in flight beyond the number of workers count as queued
+        def count_in_flight(delta: int):
+            self._in_flight += delta
+            self.active = min(self._in_flight, self.max_workers)
+            self.queued = self._in_flight - self.active
+
+        submitted = time.time()
+        with self._lock:
+            count_in_flight(1)
+        loop = asyncio.get_running_loop()
+        try:
+            started, result = await loop.run_in_executor(self._executor, _timed_call, fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                count_in_flight(-1)
+                self.completed += 1
+        with self._lock:
+            self._waits.append(max(0.0, started - submitted))
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "workers": self.max_workers,
+                "processes": self.processes,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "wait_avg_ms": round(1000 * sum(waits) / len(waits), 2) if waits else 0.0,
+                "wait_p95_ms": round(1000 * waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+                "wait_max_ms": round(1000 * waits[-1], 2) if waits else 0.0
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pools: Dict[str, InstrumentedPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(name: str) -> InstrumentedPool:
+    """
+    The shared pool `network`, `cpu`, `io` or `process`, created on first use.
+    """
+    sizes = {"network": NETWORK_POOL_WORKERS, "cpu": CPU_POOL_WORKERS, "io": IO_POOL_WORKERS,
+             "process": PROCESS_POOL_WORKERS}
+    if name not in sizes:
+        raise ValueError(f"Unknown pool: {name}")
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = InstrumentedPool(name, sizes[name], processes=name == "process")
+        return _pools[name]
+
+async def run_network(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Blocking calls to external services (LLM, transcription).
+    """
+    return await get_pool("network").run(fn, *args, **kwargs)
+
+async def run_cpu(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    CPU-bound work on in-memory state (retrieval, clustering). numpy releases the GIL, so threads suffice.
+    """
+    return await get_pool("cpu").run(fn, *args, **kwargs)
+
+async def run_process(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Pure-Python CPU-bound work (PDF splitting) in a worker process. fn must be a module-level function.
+    """
+    return await get_pool("process").run(fn, *args, **kwargs)
+
+async def run_io(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Disk and database access.
+    """
+    return await get_pool("io").run(fn, *args, **kwargs)
+
+def executor_stats() -> Dict[str, Dict]:
+    return {name: get_pool(name).stats() for name in ("network", "cpu", "io", "process")}
+
+def shutdown_executors():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
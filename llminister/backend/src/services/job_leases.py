@@ -0,0 +1,44 @@
+import os
+import uuid
+import socket
+import asyncio
+from contextlib import asynccontextmanager
+
+from .storage_service import claim_job, release_job
+from .executors import run_io
+
+# Seconds a claimed job stays with this process without a renewal; it is renewed every third of that.
+# After a crash another process can take the job over once the lease has run out.
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "120"))
+
+# Identifies this process as the owner of the jobs it runs
+PROCESS_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def claim(job_id: str) -> bool:
+    """
+    Claim a job for this process. False when another process is running it.
+    """
+    return await run_io(claim_job, job_id, PROCESS_OWNER, JOB_LEASE_SECONDS)
+
+@asynccontextmanager
+async def hold_lease(job_id: str):
+    """
+    Keep renewing the lease on a claimed job while the block runs, and release it afterwards
+    (also when the block is cancelled at shutdown, so another process can resume the job at once).
+    """
+    async def renew():
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            if not await claim(job_id):
+                print(f"Lost the lease on job {job_id} to another process.")
+
+    renewer = asyncio.create_task(renew())
+    try:
+        yield
+    finally:
+        renewer.cancel()
+        try:
+            await run_io(release_job, job_id, PROCESS_OWNER)
+        except Exception as e:
+            print(f"Could not release job {job_id}: {e}")
@@ -1,122 +1,1218 @@
 import os
+import json
+import mmap
+import time
+import shutil
+import hashlib
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
 import PyPDF2
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Set, Tuple
 import re
 
-import nltk
-from nltk.tokenize import word_tokenize
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 import numpy as np
+import scipy.sparse as sp
+
+# Bump this whenever the layout of the on-disk index cache changes
+INDEX_CACHE_VERSION = 4
+
+# Number of pages handed to a single worker when extracting in parallel
+PAGES_PER_TASK = 20
+
+# Passages (the retrieval unit below a page): windows of whole sentences/paragraphs of at most
+# this many characters, each one starting with the last unit of the previous window
+PASSAGE_MAX_CHARS = int(os.environ.get("KB_PASSAGE_MAX_CHARS", "1000"))
+PASSAGE_OVERLAP_UNITS = 1
+# Put between excerpts of one page that are not adjacent
+PASSAGE_SEPARATOR = "\n[...]\n"
+
+# Dutch stop words (NLTK's Dutch list), left out of the TF-IDF vocabulary
+DUTCH_STOP_WORDS = [
+    "de", "en", "van", "ik", "te", "dat", "die", "in", "een", "hij", "het", "niet", "zijn", "is", "was",
+    "op", "aan", "met", "als", "voor", "had", "er", "maar", "om", "hem", "dan", "zou", "of", "wat", "mijn",
+    "men", "dit", "zo", "door", "over", "ze", "zich", "bij", "ook", "tot", "je", "mij", "uit", "der", "daar",
+    "haar", "naar", "heb", "hoe", "heeft", "hebben", "deze", "u", "want", "nog", "zal", "me", "zij", "nu",
+    "ge", "geen", "omdat", "iets", "worden", "toch", "al", "waren", "veel", "meer", "doen", "toen", "moet",
+    "ben", "zonder", "kan", "hun", "dus", "alles", "onder", "ja", "eens", "hier", "wie", "werd", "altijd",
+    "doch", "wordt", "wezen", "kunnen", "ons", "zelf", "tegen", "na", "reeds", "wil", "kon", "niets", "uw",
+    "iemand", "geweest", "andere"
+]
+
+# Ends of sentences and paragraphs; passages are only cut at these positions (or at whitespace)
+_UNIT_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+
+
+def _new_vectorizer() -> TfidfVectorizer:
+    # scikit-learn only ships an English stop list, so the Dutch one is passed explicitly
+    return TfidfVectorizer(stop_words=DUTCH_STOP_WORDS)
+
+
+def _restore_vectorizer(vocabulary: Dict[str, int], idf: np.ndarray) -> TfidfVectorizer:
+    """
+    Rebuild a fitted vectorizer from a persisted vocabulary and IDF vector,
+    so queries can be transformed without refitting on the whole corpus.
+    """
+    vectorizer = _new_vectorizer()
+    vectorizer.vocabulary_ = vocabulary
+    vectorizer.idf_ = idf
+    return vectorizer
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Content hash of a file, read in chunks so large PDFs are never fully in memory.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _extract_text(reader: PyPDF2.PdfReader, start: int, end: int) -> List[Tuple[int, str]]:
+    pages = []
+    for page_idx in range(start, end):
+        text = reader.pages[page_idx].extract_text()
+        if not text:
+            continue
+        pages.append((page_idx + 1, text.strip()))
+    return pages
+
+
+def extract_pdf_pages(pdf_path: str) -> Tuple[int, List[Tuple[int, str]]]:
+    """
+    Extract the text of every page of a PDF.
+    Returns (num_pages, [(page_number, text), ...]) with 1-based page numbers;
+    pages without any text are skipped.
+    """
+    with open(pdf_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        num_pages = len(reader.pages)
+        return num_pages, _extract_text(reader, 0, num_pages)
+
+
+def _count_pages(pdf_path: str) -> int:
+    with open(pdf_path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> Tuple[List[Tuple[int, str]], float]:
+    """
+    Process-pool task: extract pages [start, end) of one PDF.
+    Returns the pages and the time spent on them.
+    """
+    started = time.perf_counter()
+    with open(pdf_path, 'rb') as f:
+        pages = _extract_text(PyPDF2.PdfReader(f), start, end)
+    return pages, time.perf_counter() - started
+
+
+@dataclass
+class PdfExtractionReport:
+    """
+    Outcome of extracting a single PDF
+    """
+    source: str
+    num_pages: int = 0
+    pages_with_text: int = 0
+    seconds: float = 0.0  # extraction time, summed over all workers that handled the file
+    cached: bool = False
+    error: Optional[str] = None
+
+
+def extract_pdfs(pdf_paths: List[str], max_workers: int = 1,
+                 pages_per_task: int = PAGES_PER_TASK) -> Tuple[Dict[str, Tuple[int, List[Tuple[int, str]]]], List[PdfExtractionReport]]:
+    """
+    Extract the pages of several PDFs.
+
+    With max_workers > 1 the work is spread over a process pool: every PDF is split
+    into ranges of `pages_per_task` pages, so one long document (e.g. the Regeerprogramma)
+    is handled by several workers at once. Ranges are reassembled in page order, so the
+    result does not depend on which worker finishes first.
+
+    Returns ({pdf_path: (num_pages, pages)}, reports) with one report per input path,
+    in input order. Files that fail are reported and left out of the result.
+    """
+    results = {}
+    reports = {path: PdfExtractionReport(source=Path(path).name) for path in pdf_paths}
+
+    if max_workers <= 1:
+        for path in pdf_paths:
+            report = reports[path]
+            started = time.perf_counter()
+            try:
+                results[path] = extract_pdf_pages(path)
+            except Exception as e:
+                report.error = str(e)
+            report.seconds = time.perf_counter() - started
+    else:
+        num_pages = {}
+        tasks = []  # (pdf_path, start, end)
+        for path in pdf_paths:
+            try:
+                num_pages[path] = _count_pages(path)
+            except Exception as e:
+                reports[path].error = str(e)
+                continue
+            for start in range(0, num_pages[path], pages_per_task):
+                tasks.append((path, start, min(start + pages_per_task, num_pages[path])))
+
+        chunks = {path: {} for path in num_pages}  # pdf_path -> { start: pages }
+        if tasks:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+                futures = {pool.submit(_extract_page_range, *task): task for task in tasks}
+                for future in as_completed(futures):
+                    path, start, end = futures[future]
+                    try:
+                        pages, seconds = future.result()
+                    except Exception as e:
+                        reports[path].error = reports[path].error or f"pages {start + 1}-{end}: {e}"
+                        continue
+                    chunks[path][start] = pages
+                    reports[path].seconds += seconds
+
+        for path in num_pages:
+            if reports[path].error:
+                continue
+            pages = [page for start in sorted(chunks[path]) for page in chunks[path][start]]
+            results[path] = (num_pages[path], pages)
+
+    for path, (count, pages) in results.items():
+        reports[path].num_pages = count
+        reports[path].pages_with_text = len(pages)
+
+    return results, [reports[path] for path in pdf_paths]
+
+
+def text_units(text: str, max_chars: int) -> List[Tuple[int, int]]:
+    """
+    (start, end) spans of the sentences and paragraphs of `text`, without surrounding whitespace.
+    A unit longer than max_chars is cut at the last whitespace that still fits.
+    """
+    units = []
+    start = 0
+    for end in [m.start() for m in _UNIT_BOUNDARY.finditer(text)] + [len(text)]:
+        while start < end and text[start].isspace():
+            start += 1
+        while start < end:
+            cut = end
+            if cut - start > max_chars:
+                cut = text.rfind(" ", start + 1, start + max_chars)
+                if cut <= start:
+                    cut = start + max_chars
+            unit_end = cut
+            while unit_end > start and text[unit_end - 1].isspace():
+                unit_end -= 1
+            if unit_end > start:
+                units.append((start, unit_end))
+            start = cut
+            while start < end and text[start].isspace():
+                start += 1
+        start = max(start, end)
+    return units
+
+
+def split_passages(text: str, max_chars: int = PASSAGE_MAX_CHARS,
+                   overlap_units: int = PASSAGE_OVERLAP_UNITS) -> List[Tuple[int, int]]:
+    """
+    Split a page into overlapping passages of whole sentences/paragraphs.
+    Returns (start, end) character offsets into `text`, in page order.
+    """
+    units = text_units(text, max_chars)
+    passages = []
+    first = 0
+    previous_last = -1
+    while first < len(units):
+        last = first
+        while last + 1 < len(units) and units[last + 1][1] - units[first][0] <= max_chars:
+            last += 1
+        if last <= previous_last:
+            # The overlap leaves no room for a new unit: start the next passage fresh
+            first = previous_last + 1
+            continue
+        passages.append((units[first][0], units[last][1]))
+        if last + 1 >= len(units):
+            break
+        previous_last = last
+        first = max(first + 1, last + 1 - overlap_units)
+    return passages
+
+
+def merge_spans(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Sorted spans with overlapping or touching ones merged.
+    """
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _top_indices(sim_scores: np.ndarray, top_k: int) -> List[np.ndarray]:
+    """
+    Column indices of the top_k scores of every row, best first.
+    Candidates are selected with argpartition, so only those k are sorted.
+    """
+    k = min(top_k, sim_scores.shape[1])
+    if k <= 0:
+        return [np.zeros(0, dtype=np.int64) for _ in range(sim_scores.shape[0])]
+    candidates = np.argpartition(-sim_scores, k - 1, axis=1)[:, :k]
+    return [
+        row_candidates[np.argsort(-sim_scores[row, row_candidates], kind="stable")]
+        for row, row_candidates in enumerate(candidates)
+    ]
+
+
+def _write_atomic(path: Path, write_fn):
+    """
+    Write to a temporary file next to `path` and rename it into place,
+    so a crash never leaves a half-written cache file behind.
+    """
+    tmp_path = path.with_name(path.name + ".tmp")
+    write_fn(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _count_terms(analyzer, texts: List[str], vocabulary: Dict[str, int], add_terms: bool = True) -> sp.csr_matrix:
+    """
+    Raw term counts for `texts`, one row per text.
+    Terms missing from `vocabulary` are appended to it (the dict is modified in place),
+    or skipped when add_terms is False.
+    """
+    indptr = [0]
+    indices = []
+    counts = []
+    for text in texts:
+        row = Counter()
+        for term in analyzer(text):
+            idx = vocabulary.setdefault(term, len(vocabulary)) if add_terms else vocabulary.get(term)
+            if idx is not None:
+                row[idx] += 1
+        indices.extend(row.keys())
+        counts.extend(row.values())
+        indptr.append(len(indices))
+    return sp.csr_matrix(
+        (np.asarray(counts, dtype=np.int64), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(texts), len(vocabulary))
+    )
+
+
+def _count_passages(texts: List[str], vocabulary: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray, sp.csr_matrix]:
+    """
+    Split `texts` (pages) into passages. Returns the index of the page of every passage,
+    its (start, end) character span in that page, and its raw term counts over `vocabulary`.
+    """
+    owners = []
+    spans = []
+    passage_texts = []
+    for i, text in enumerate(texts):
+        for start, end in split_passages(text):
+            owners.append(i)
+            spans.append((start, end))
+            passage_texts.append(text[start:end])
+    counts = _count_terms(_new_vectorizer().build_analyzer(), passage_texts, vocabulary, add_terms=False)
+    return np.asarray(owners, dtype=np.int32), np.asarray(spans, dtype=np.int32).reshape(-1, 2), counts
+
+
+def _with_columns(matrix: sp.csr_matrix, n_columns: int) -> sp.csr_matrix:
+    """
+    The same matrix widened to n_columns (new columns are empty).
+    """
+    return sp.csr_matrix((matrix.data, matrix.indices, matrix.indptr), shape=(matrix.shape[0], n_columns))
+
+
+class DocumentStore:
+    """
+    Compact, read-only storage of the indexed pages. All page texts live in one UTF-8 blob
+    with an offsets array, sources are interned (one id per PDF) and page numbers are a NumPy array.
+    A store saved with save() is opened memory-mapped, so every worker process on the machine
+    shares the same pages in the OS page cache instead of holding its own copy.
+
+    Rows are returned as fresh dicts:
+    { 'source', 'page', 'content', 'page_number', 'file_path' }
+    """
+
+    def __init__(self, blob, offsets: np.ndarray, source_ids: np.ndarray, pages: np.ndarray,
+                 sources: List[str], file_paths: List[str]):
+        self._blob = blob
+        self._offsets = offsets
+        self._source_ids = source_ids
+        self._pages = pages
+        self.sources = sources
+        self.file_paths = file_paths
+        # (source, page) -> row, so single pages are found without a scan
+        self._rows = {
+            (sources[source_id], page): row
+            for row, (source_id, page) in enumerate(zip(source_ids.tolist(), pages.tolist()))
+        }
+
+    @classmethod
+    def from_documents(cls, documents: List[Dict]) -> "DocumentStore":
+        source_index = {}
+        file_paths = []
+        encoded = []
+        source_ids = np.empty(len(documents), dtype=np.int32)
+        pages = np.empty(len(documents), dtype=np.int32)
+        for row, doc in enumerate(documents):
+            source_id = source_index.get(doc["source"])
+            if source_id is None:
+                source_id = source_index[doc["source"]] = len(file_paths)
+                file_paths.append(doc["file_path"])
+            source_ids[row] = source_id
+            pages[row] = doc["page"]
+            encoded.append(doc["content"].encode("utf-8"))
+        offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.fromiter((len(text) for text in encoded), dtype=np.int64, count=len(encoded)))
+        return cls(b"".join(encoded), offsets, source_ids, pages, list(source_index), file_paths)
+
+    @classmethod
+    def empty(cls) -> "DocumentStore":
+        return cls.from_documents([])
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def __getitem__(self, row: int) -> Dict:
+        return self.document(row)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (self.document(row) for row in range(len(self)))
+
+    def text(self, row: int) -> str:
+        return bytes(self._blob[self._offsets[row]:self._offsets[row + 1]]).decode("utf-8")
+
+    def texts(self) -> Iterator[str]:
+        return (self.text(row) for row in range(len(self)))
+
+    def source(self, row: int) -> str:
+        return self.sources[self._source_ids[row]]
+
+    def page(self, row: int) -> int:
+        return int(self._pages[row])
+
+    def document(self, row: int) -> Dict:
+        source_id = self._source_ids[row]
+        page = int(self._pages[row])
+        return {
+            "source": self.sources[source_id],
+            "page": page,  # pages are 1-based for display
+            "content": self.text(row),
+            "page_number": page,
+            "file_path": self.file_paths[source_id]
+        }
+
+    def find(self, source: str, page: int) -> Optional[int]:
+        return self._rows.get((source, page))
+
+    def rows_of(self, sources: Set[str]) -> np.ndarray:
+        """
+        Boolean mask of the rows that belong to any of `sources`.
+        """
+        ids = [i for i, source in enumerate(self.sources) if source in sources]
+        return np.isin(self._source_ids, ids)
+
+    def save(self, directory: Path):
+        """
+        Write the store to `directory`. sources.json is written last and marks the store as complete.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+
+        def write_blob(tmp_path):
+            with open(tmp_path, "wb") as f:
+                f.write(self._blob)
+
+        def write_array(array):
+            def write(tmp_path):
+                with open(tmp_path, "wb") as f:
+                    np.save(f, np.asarray(array))
+            return write
+
+        def write_sources(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.sources, f, ensure_ascii=False)
+
+        _write_atomic(directory / "texts.bin", write_blob)
+        _write_atomic(directory / "offsets.npy", write_array(self._offsets))
+        _write_atomic(directory / "source_ids.npy", write_array(self._source_ids))
+        _write_atomic(directory / "pages.npy", write_array(self._pages))
+        _write_atomic(directory / "sources.json", write_sources)
+
+    @classmethod
+    def open(cls, directory: Path, pdf_dir: Path) -> "DocumentStore":
+        """
+        Open a saved store memory-mapped. File paths are resolved against the current pdf_dir.
+        """
+        with open(directory / "sources.json", "r", encoding="utf-8") as f:
+            sources = json.load(f)
+        offsets = np.load(directory / "offsets.npy", mmap_mode="r")
+        source_ids = np.load(directory / "source_ids.npy", mmap_mode="r")
+        pages = np.load(directory / "pages.npy", mmap_mode="r")
+        with open(directory / "texts.bin", "rb") as f:
+            # mmap cannot map an empty file
+            blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        if len(offsets) != len(pages) + 1 or len(source_ids) != len(pages) or int(offsets[-1]) != len(blob):
+            raise ValueError(f"Document store in {directory} is inconsistent")
+        return cls(blob, offsets, source_ids, pages, sources, [str(pdf_dir / source) for source in sources])
+
+
+class _IndexSnapshot:
+    """
+    Immutable view of the indexed corpus. Every corpus change builds a new snapshot
+    and swaps it in with a single assignment, so readers never see a half-updated index.
+
+    TF-IDF weights follow TfidfVectorizer's defaults (smooth idf, l2-normalised rows),
+    but are derived from raw term counts and document frequencies that are kept around,
+    so adding or removing pages only needs the new pages to be tokenized.
+    """
+
+    def __init__(self, documents: DocumentStore, vocabulary: Dict[str, int], counts: Optional[sp.csr_matrix],
+                 df: Optional[np.ndarray], idf: Optional[np.ndarray] = None,
+                 tfidf_matrix: Optional[sp.csr_matrix] = None,
+                 passages: Optional[Tuple[np.ndarray, np.ndarray, sp.csr_matrix]] = None):
+        self.documents = documents
+        self.counts = counts
+        self.df = df
+        # Passage index: page row and (start, end) span of every passage, with its term counts and TF-IDF rows.
+        # Passages are weighted with the page-level IDF, so page and passage scores share one term space.
+        self.passage_pages = np.zeros(0, dtype=np.int32)
+        self.passage_spans = np.zeros((0, 2), dtype=np.int32)
+        self.passage_counts = None
+        self.passage_matrix = None
+
+        if not len(documents) or not vocabulary:
+            self.vectorizer = _new_vectorizer()
+            self.tfidf_matrix = None
+            return
+
+        if idf is None:
+            idf = np.log((1 + len(documents)) / (1 + df)) + 1
+        if tfidf_matrix is None:
+            tfidf_matrix = normalize(counts.astype(np.float64) @ sp.diags(idf), norm='l2', copy=False).tocsr()
+
+        self.vectorizer = _restore_vectorizer(vocabulary, idf)
+        self.tfidf_matrix = tfidf_matrix
+
+        if passages is None:
+            passages = _count_passages(list(documents.texts()), vocabulary)
+        self.passage_pages, self.passage_spans, self.passage_counts = passages
+        self.passage_matrix = normalize(self.passage_counts.astype(np.float64) @ sp.diags(idf),
+                                        norm='l2', copy=False).tocsr()
+
+    @classmethod
+    def empty(cls) -> "_IndexSnapshot":
+        return cls(DocumentStore.empty(), {}, None, None)
+
+    @classmethod
+    def build(cls, documents: List[Dict]) -> "_IndexSnapshot":
+        vocabulary = {}
+        counts = _count_terms(_new_vectorizer().build_analyzer(), [doc["content"] for doc in documents], vocabulary)
+        df = np.bincount(counts.indices, minlength=len(vocabulary))
+        return cls(DocumentStore.from_documents(documents), vocabulary, counts, df)
+
+    def update(self, remove_sources: Set[str], new_documents: List[Dict]) -> "_IndexSnapshot":
+        """
+        New snapshot without the pages of `remove_sources` and with `new_documents` added.
+        Only the new pages are tokenized; document frequencies are adjusted in place of a refit.
+        """
+        vocabulary = dict(self.vectorizer.vocabulary_) if self.tfidf_matrix is not None else {}
+        counts = self.counts if self.counts is not None else sp.csr_matrix((0, 0), dtype=np.int64)
+        df = self.df if self.df is not None else np.zeros(0, dtype=np.int64)
+
+        removed = self.documents.rows_of(remove_sources)
+        keep = np.flatnonzero(~removed)
+        drop = np.flatnonzero(removed)
+        if len(drop):
+            df = df - np.bincount(counts[drop].indices, minlength=len(df))
+        kept_counts = counts[keep]
+
+        new_counts = _count_terms(_new_vectorizer().build_analyzer(),
+                                  [doc["content"] for doc in new_documents], vocabulary)
+        df = np.concatenate([df, np.zeros(len(vocabulary) - len(df), dtype=df.dtype)])
+        df = df + np.bincount(new_counts.indices, minlength=len(vocabulary))
+
+        documents = [self.documents[i] for i in keep] + new_documents
+        counts = sp.vstack([_with_columns(kept_counts, len(vocabulary)), new_counts], format="csr")
+
+        # Passages of kept pages are reused as they are; only the new pages are split and counted
+        kept_passages = np.flatnonzero(np.isin(self.passage_pages, keep))
+        old_passage_counts = (self.passage_counts if self.passage_counts is not None
+                              else sp.csr_matrix((0, 0), dtype=np.int64))
+        new_owners, new_spans, new_passage_counts = _count_passages(
+            [doc["content"] for doc in new_documents], vocabulary
+        )
+        passage_pages = np.concatenate([np.searchsorted(keep, self.passage_pages[kept_passages]),
+                                        new_owners + len(keep)])
+        passage_spans = np.concatenate([self.passage_spans[kept_passages], new_spans])
+        passage_counts = sp.vstack([_with_columns(old_passage_counts[kept_passages], len(vocabulary)),
+                                    new_passage_counts], format="csr")
+
+        # Keep rows grouped and ordered by source, exactly like a full build would
+        order = sorted(range(len(documents)), key=lambda i: documents[i]["source"])
+        documents = [documents[i] for i in order]
+        counts = counts[order]
+
+        new_rows = np.empty(len(order), dtype=np.int32)
+        new_rows[order] = np.arange(len(order), dtype=np.int32)
+        passage_pages = new_rows[passage_pages] if len(passage_pages) else passage_pages.astype(np.int32)
+        passage_order = np.lexsort((passage_spans[:, 0], passage_pages))
+        passages = (passage_pages[passage_order], passage_spans[passage_order], passage_counts[passage_order])
+
+        return _IndexSnapshot(DocumentStore.from_documents(documents), vocabulary, counts, df, passages=passages)
+
 
 class KnowledgeBase:
-    def __init__(self, pdf_dir: str):
+    def __init__(self, pdf_dir: str, cache_dir: Optional[str] = None, use_cache: bool = True,
+                 extraction_workers: Optional[int] = None, load: bool = True):
         self.pdf_dir = Path(pdf_dir)
-        self.documents = []  # List[Dict], each has { 'source', 'page', 'content', 'page_number', 'file_path' }
-        self._text_list = []  # just the raw chunk texts
-        self._vectorizer = TfidfVectorizer(stop_words='dutch')  # Use Dutch stopwords as we're dealing with Dutch text
-        self._tfidf_matrix = None
+        # documents, _vectorizer and _tfidf_matrix are read from the current snapshot
+        self._snapshot = _IndexSnapshot.empty()
 
         # Store PDF metadata for quicker reference
         self.pdf_metadata = {}  # Dict with filename as key
 
-        # Make sure NLTK punkt is available
+        # On-disk index cache: extracted pages per PDF content hash, plus the fitted index
+        self.cache_dir = Path(cache_dir) if cache_dir else self.pdf_dir.parent / "index_cache"
+        self.use_cache = use_cache
+        self._file_state = {}  # filename -> { 'sha256', 'size', 'mtime_ns' }
+        self._failed_files = {}  # filename -> file state of a version that could not be extracted
+
+        # PDF extraction: 1 = in-process, > 1 = process pool with that many workers
+        if extraction_workers is None:
+            extraction_workers = int(os.environ.get("KB_EXTRACTION_WORKERS", "1"))
+        self.extraction_workers = extraction_workers
+        self.extraction_report = []  # List[Dict] of PdfExtractionReport, one per PDF of the last load
+
+        # Serialises corpus changes; search() never takes it
+        self._write_lock = threading.RLock()
+        self._watcher_stop = None
+
+        # Set by load(); until then searches see an empty knowledge base
+        self._ready = threading.Event()
+        self.load_seconds = None
+        self.loaded_from_cache = False
+        self.load_error = None
+
+        if load:
+            self.load()
+
+    def load(self):
+        """
+        Load the index from the cache, or extract the PDFs and build it.
+        With load=False in the constructor this can run in a background thread; is_ready tells when it is done.
+        """
+        started = time.monotonic()
+        try:
+            with self._write_lock:
+                self.loaded_from_cache = self.use_cache and self._load_index_cache()
+                if not self.loaded_from_cache:
+                    self._build_index(self._load_pdfs())
+                    if self.use_cache:
+                        self._save_index_cache()
+        except Exception as e:
+            self.load_error = str(e)
+            raise
+        self.load_seconds = time.monotonic() - started
+        self.load_error = None
+        self._ready.set()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def status(self) -> Dict:
+        """
+        Whether the index is loaded, its size, and how long loading took.
+        """
+        snapshot = self._snapshot
+        return {
+            "ready": self.is_ready,
+            "documents": len(snapshot.documents.sources),
+            "pages": len(snapshot.documents),
+            "passages": len(snapshot.passage_pages),
+            "terms": len(snapshot.vectorizer.vocabulary_) if snapshot.tfidf_matrix is not None else 0,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "from_cache": self.loaded_from_cache,
+            "error": self.load_error
+        }
+
+    @property
+    def documents(self) -> DocumentStore:
+        # Sequence of page dicts, each has { 'source', 'page', 'content', 'page_number', 'file_path' }
+        return self._snapshot.documents
+
+    @property
+    def _vectorizer(self) -> TfidfVectorizer:
+        return self._snapshot.vectorizer
+
+    @property
+    def _tfidf_matrix(self) -> Optional[sp.csr_matrix]:
+        return self._snapshot.tfidf_matrix
+
+    # ------------------------------------------------------------------
+    # Index cache
+    # ------------------------------------------------------------------
+
+    @property
+    def _manifest_path(self) -> Path:
+        return self.cache_dir / "manifest.json"
+
+    def _pages_cache_path(self, sha256: str) -> Path:
+        return self.cache_dir / "pages" / f"{sha256}.json"
+
+    def _read_manifest(self) -> Optional[Dict]:
+        if not self._manifest_path.exists():
+            return None
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable index manifest: {e}")
+            return None
+        if manifest.get("version") != INDEX_CACHE_VERSION:
+            return None
+        return manifest
+
+    def _list_pdf_files(self) -> List[Path]:
+        # Sorted so document indices are stable between runs
+        return sorted(self.pdf_dir.glob("*.pdf"), key=lambda p: p.name)
+
+    def _scan_file_state(self, pdf_files: List[Path], known: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        Return the current { filename: { 'sha256', 'size', 'mtime_ns' } } for all PDFs.
+        A file is only re-hashed when its size or mtime differs from `known`.
+        """
+        state = {}
+        for pdf_file in pdf_files:
+            stat = pdf_file.stat()
+            previous = known.get(pdf_file.name)
+            if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+                sha256 = previous["sha256"]
+            else:
+                sha256 = file_sha256(pdf_file)
+            state[pdf_file.name] = {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        return state
+
+    @staticmethod
+    def _fingerprint(file_state: Dict[str, Dict]) -> str:
+        digest = hashlib.sha256()
+        for name in sorted(file_state):
+            digest.update(f"{name}:{file_state[name]['sha256']}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _read_pages_cache(self, sha256: str) -> Optional[Dict]:
+        path = self._pages_cache_path(sha256)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable page cache {path.name}: {e}")
+            return None
+
+    def _write_pages_cache(self, sha256: str, num_pages: int, pages: List[Tuple[int, str]]):
+        path = self._pages_cache_path(sha256)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"num_pages": num_pages, "pages": pages}, f, ensure_ascii=False)
+
+        _write_atomic(path, write)
+
+    def _load_index_cache(self) -> bool:
+        """
+        Open the document store (memory-mapped) and load the fitted TF-IDF index from the cache directory.
+        Returns False (and loads nothing) when the cache is missing or stale.
+        """
+        manifest = self._read_manifest()
+        if not manifest or not self.pdf_dir.exists():
+            return False
+
+        pdf_files = self._list_pdf_files()
+        file_state = self._scan_file_state(pdf_files, manifest.get("files", {}))
+        if self._fingerprint(file_state) != manifest.get("fingerprint"):
+            print("KnowledgeBase index cache is stale, rebuilding.")
+            self._file_state = file_state
+            return False
+
+        num_pages = manifest.get("num_pages", {})
+        if any(pdf_file.name not in num_pages for pdf_file in pdf_files):
+            self._file_state = file_state
+            return False
+        pdf_metadata = {
+            pdf_file.name: {
+                'path': str(pdf_file),
+                'num_pages': num_pages[pdf_file.name],
+                'title': pdf_file.stem
+            }
+            for pdf_file in pdf_files
+        }
+
+        try:
+            documents = DocumentStore.open(self.cache_dir / manifest["store"], self.pdf_dir)
+            counts = sp.load_npz(self.cache_dir / "counts.npz").tocsr()
+            tfidf_matrix = sp.load_npz(self.cache_dir / "tfidf.npz").tocsr()
+            idf = np.load(self.cache_dir / "idf.npy")
+            passages = (
+                np.load(self.cache_dir / "passage_pages.npy"),
+                np.load(self.cache_dir / "passage_spans.npy"),
+                sp.load_npz(self.cache_dir / "passage_counts.npz").tocsr()
+            )
+        except Exception as e:
+            print(f"Failed to load KnowledgeBase index cache: {e}")
+            self._file_state = file_state
+            return False
+
+        passage_pages, passage_spans, passage_counts = passages
+        if (tfidf_matrix.shape[0] != len(documents) or counts.shape != tfidf_matrix.shape
+                or passage_counts.shape != (len(passage_pages), counts.shape[1])
+                or len(passage_spans) != len(passage_pages)):
+            print("KnowledgeBase index cache does not match its documents, rebuilding.")
+            self._file_state = file_state
+            return False
+
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+        self._snapshot = _IndexSnapshot(documents, manifest["vocabulary"], counts, df,
+                                        idf=idf, tfidf_matrix=tfidf_matrix, passages=passages)
+        self.pdf_metadata = pdf_metadata
+        self._file_state = file_state
+        print(f"KnowledgeBase loaded {len(self.documents)} pages from index cache.")
+        return True
+
+    def _save_index_cache(self):
+        """
+        Persist the document store, vocabulary, term counts, IDF vector, TF-IDF matrix and passage index
+        next to the page caches.
+        The store goes into a directory named after the corpus fingerprint, so processes that still have
+        the previous one mapped keep reading a consistent copy. Afterwards this process maps the saved
+        store too, and drops its in-memory copy.
+        """
+        snapshot = self._snapshot
+        if snapshot.tfidf_matrix is None:
+            return
         try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt')
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fingerprint = self._fingerprint(self._file_state)
+            store_name = f"store-{fingerprint[:16]}"
+            store_dir = self.cache_dir / store_name
+            if not (store_dir / "sources.json").exists():
+                snapshot.documents.save(store_dir)
+
+            def write_matrix(matrix):
+                def write(tmp_path):
+                    with open(tmp_path, "wb") as f:
+                        sp.save_npz(f, matrix)
+                return write
+
+            def write_array(array):
+                def write(tmp_path):
+                    with open(tmp_path, "wb") as f:
+                        np.save(f, array)
+                return write
+
+            _write_atomic(self.cache_dir / "counts.npz", write_matrix(snapshot.counts))
+            _write_atomic(self.cache_dir / "tfidf.npz", write_matrix(snapshot.tfidf_matrix))
+            _write_atomic(self.cache_dir / "idf.npy", write_array(snapshot.vectorizer.idf_))
+            _write_atomic(self.cache_dir / "passage_pages.npy", write_array(snapshot.passage_pages))
+            _write_atomic(self.cache_dir / "passage_spans.npy", write_array(snapshot.passage_spans))
+            _write_atomic(self.cache_dir / "passage_counts.npz", write_matrix(snapshot.passage_counts))
+
+            manifest = {
+                "version": INDEX_CACHE_VERSION,
+                "fingerprint": fingerprint,
+                "files": self._file_state,
+                "num_pages": {name: meta["num_pages"] for name, meta in self.pdf_metadata.items()},
+                "store": store_name,
+                "num_documents": len(snapshot.documents),
+                "vocabulary": {term: int(idx) for term, idx in snapshot.vectorizer.vocabulary_.items()},
+            }
+
+            def write(tmp_path):
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(manifest, f, ensure_ascii=False)
+
+            # The manifest goes last: it is what marks the cache as complete
+            _write_atomic(self._manifest_path, write)
+
+            for old_store in self.cache_dir.glob("store-*"):
+                if old_store.name != store_name:
+                    shutil.rmtree(old_store, ignore_errors=True)
+            documents = DocumentStore.open(store_dir, self.pdf_dir)
+            if len(documents) == len(snapshot.documents):
+                snapshot.documents = documents
+        except Exception as e:
+            print(f"Failed to write KnowledgeBase index cache: {e}")
+
+    # ------------------------------------------------------------------
+    # Loading & indexing
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _page_docs(pdf_file: Path, pages: List[Tuple[int, str]]) -> List[Dict]:
+        file_path = str(pdf_file)
+        return [
+            {
+                "source": pdf_file.name,
+                "page": page_number,  # pages are 1-based for display
+                "content": text,
+                "page_number": page_number,
+                "file_path": file_path
+            }
+            for page_number, text in pages
+        ]
 
-        self._load_pdfs()
-        self._build_index()
+    def _load_files(self, pdf_files: List[Path]) -> Dict[str, Tuple[int, List[Tuple[int, str]]]]:
+        """
+        Return { filename: (num_pages, pages) } for the given PDFs.
+        PDFs whose content hash is already in the page cache are not parsed again;
+        the rest is extracted (in parallel when extraction_workers > 1).
+        Files that fail are reported and left out.
+        """
+        loaded = {}
+        cached_names = set()
+        to_extract = []
+        for pdf_file in pdf_files:
+            sha256 = self._file_state.get(pdf_file.name, {}).get("sha256")
+            cached = self._read_pages_cache(sha256) if (self.use_cache and sha256) else None
+            if cached is not None:
+                loaded[pdf_file.name] = (cached["num_pages"], cached["pages"])
+                cached_names.add(pdf_file.name)
+            else:
+                to_extract.append(pdf_file)
+
+        extracted, reports = extract_pdfs([str(p) for p in to_extract], max_workers=self.extraction_workers)
+        reports_by_name = {report.source: report for report in reports}
+        for pdf_file in to_extract:
+            report = reports_by_name[pdf_file.name]
+            sha256 = self._file_state.get(pdf_file.name, {}).get("sha256")
+            if report.error:
+                print(f"Error reading {pdf_file.name}: {report.error}")
+                # Leave it out of the fingerprint so the next start retries it
+                self._failed_files[pdf_file.name] = self._file_state.pop(pdf_file.name, {})
+                continue
+            print(f"Extracted {pdf_file.name}: {report.pages_with_text}/{report.num_pages} pages in {report.seconds:.2f}s")
+            loaded[pdf_file.name] = extracted[str(pdf_file)]
+            self._failed_files.pop(pdf_file.name, None)
+            if self.use_cache and sha256:
+                self._write_pages_cache(sha256, *loaded[pdf_file.name])
+
+        self.extraction_report = []
+        for pdf_file in pdf_files:
+            if pdf_file.name in cached_names:
+                num_pages, pages = loaded[pdf_file.name]
+                report = PdfExtractionReport(source=pdf_file.name, num_pages=num_pages,
+                                             pages_with_text=len(pages), cached=True)
+            else:
+                report = reports_by_name[pdf_file.name]
+            self.extraction_report.append(asdict(report))
+
+        return loaded
 
-    def _load_pdfs(self):
+    def _load_pdfs(self) -> List[Dict]:
         """
-        Load each PDF in pdf_dir, parse each page, and store content by page.
+        Load each PDF in pdf_dir, parse each page, and return the pages as documents.
         Each page is a separate chunk with its own metadata.
         """
         if not self.pdf_dir.exists():
             print(f"Knowledge base directory {self.pdf_dir} does not exist.")
-            return
+            return []
 
-        pdf_files = list(self.pdf_dir.glob("*.pdf"))
+        pdf_files = self._list_pdf_files()
         if not pdf_files:
             print("No PDF files found in knowledgebase.")
-            return
+            return []
 
+        if self.use_cache and not self._file_state:
+            manifest = self._read_manifest() or {}
+            self._file_state = self._scan_file_state(pdf_files, manifest.get("files", {}))
+        elif not self._file_state:
+            self._file_state = self._scan_file_state(pdf_files, {})
+
+        loaded = self._load_files(pdf_files)
+
+        documents = []
+        pdf_metadata = {}
         for pdf_file in pdf_files:
-            try:
-                file_path = str(pdf_file)
-                with open(pdf_file, 'rb') as f:
-                    reader = PyPDF2.PdfReader(f)
-                    num_pages = len(reader.pages)
-
-                    # Store metadata about this PDF
-                    self.pdf_metadata[pdf_file.name] = {
-                        'path': file_path,
-                        'num_pages': num_pages,
-                        'title': pdf_file.stem  # Use filename without extension as title
-                    }
-
-                    for page_idx in range(num_pages):
-                        page = reader.pages[page_idx]
-                        text = page.extract_text()
-                        if not text:
-                            continue
-
-                        # Store entire page as one chunk
-                        doc = {
-                            "source": pdf_file.name,
-                            "page": page_idx + 1,  # pages are 1-based for display
-                            "content": text.strip(),
-                            "page_number": page_idx + 1,
-                            "file_path": file_path
-                        }
-                        self.documents.append(doc)
-            except Exception as e:
-                print(f"Error reading {pdf_file.name}: {e}")
+            if pdf_file.name not in loaded:
+                continue
+            num_pages, pages = loaded[pdf_file.name]
+
+            # Store metadata about this PDF
+            pdf_metadata[pdf_file.name] = {
+                'path': str(pdf_file),
+                'num_pages': num_pages,
+                'title': pdf_file.stem  # Use filename without extension as title
+            }
+
+            # Store entire page as one chunk
+            documents.extend(self._page_docs(pdf_file, pages))
+
+        self.pdf_metadata = pdf_metadata
+        return documents
 
-    def _build_index(self):
+    def _build_index(self, documents: List[Dict]):
         """
-        Build TF-IDF index from self.documents.
+        Build TF-IDF index from the given documents.
         """
-        if not self.documents:
+        if not documents:
             print("No documents to index.")
             return
 
-        # build self._text_list
-        self._text_list = [doc["content"] for doc in self.documents]
-        self._tfidf_matrix = self._vectorizer.fit_transform(self._text_list)
+        self._snapshot = _IndexSnapshot.build(documents)
         print(f"KnowledgeBase loaded {len(self.documents)} pages from PDFs.")
 
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def _apply_update(self, remove_sources: Set[str], add_files: List[Path]) -> Dict:
+        """
+        Swap in a snapshot without `remove_sources` and with the pages of `add_files`.
+        Must be called with the write lock held.
+        """
+        if add_files:
+            self._file_state.update(self._scan_file_state(add_files, self._file_state))
+        loaded = self._load_files(add_files)
+
+        new_documents = []
+        pdf_metadata = {name: meta for name, meta in self.pdf_metadata.items() if name not in remove_sources}
+        for pdf_file in add_files:
+            if pdf_file.name not in loaded:
+                continue
+            num_pages, pages = loaded[pdf_file.name]
+            pdf_metadata[pdf_file.name] = {
+                'path': str(pdf_file),
+                'num_pages': num_pages,
+                'title': pdf_file.stem
+            }
+            new_documents.extend(self._page_docs(pdf_file, pages))
+
+        started = time.perf_counter()
+        self._snapshot = self._snapshot.update(remove_sources, new_documents)
+        self.pdf_metadata = pdf_metadata
+        for name in remove_sources:
+            if name not in loaded:
+                self._file_state.pop(name, None)
+        if self.use_cache:
+            self._save_index_cache()
+
+        added = [p.name for p in add_files if p.name in loaded]
+        removed = sorted(name for name in remove_sources if name not in loaded)
+        print(f"KnowledgeBase updated (+{added}, -{removed}) in {time.perf_counter() - started:.2f}s, "
+              f"{len(self.documents)} pages indexed.")
+        return {
+            "added": added,
+            "removed": removed,
+            "failed": [p.name for p in add_files if p.name not in loaded],
+            "num_documents": len(self.documents),
+            "extraction_report": self.extraction_report,
+        }
+
+    def add_pdf(self, pdf_path: str) -> Dict:
+        """
+        Add a PDF to the knowledge base, replacing the pages of an existing PDF with the same name.
+        A PDF outside pdf_dir is copied into it, so it is still there after a restart.
+        """
+        source_file = Path(pdf_path)
+        if not source_file.is_file():
+            raise FileNotFoundError(f"{pdf_path} does not exist.")
+
+        target = self.pdf_dir / source_file.name
+        self.pdf_dir.mkdir(parents=True, exist_ok=True)
+        if source_file.resolve() != target.resolve():
+            shutil.copyfile(source_file, target)
+
+        with self._write_lock:
+            return self._apply_update({target.name}, [target])
+
+    def remove_source(self, source: str, delete_file: bool = False) -> Dict:
+        """
+        Remove all pages of `source` from the index.
+        With delete_file the PDF is deleted from pdf_dir too, so it does not come back on restart.
+        """
+        with self._write_lock:
+            if source not in self.pdf_metadata:
+                raise FileNotFoundError(f"{source} is not in the knowledge base.")
+            if delete_file:
+                (self.pdf_dir / Path(source).name).unlink(missing_ok=True)
+            return self._apply_update({source}, [])
+
+    def sync(self) -> Dict:
+        """
+        Bring the index in line with pdf_dir: index new and changed PDFs, drop removed ones.
+        A PDF that failed to extract is only retried once its contents change.
+        """
+        with self._write_lock:
+            pdf_files = self._list_pdf_files() if self.pdf_dir.exists() else []
+            state = self._scan_file_state(pdf_files, {**self._failed_files, **self._file_state})
+
+            changed = []
+            for pdf_file in pdf_files:
+                sha256 = state[pdf_file.name]["sha256"]
+                if self._file_state.get(pdf_file.name, {}).get("sha256") == sha256:
+                    continue
+                if self._failed_files.get(pdf_file.name, {}).get("sha256") == sha256:
+                    continue
+                changed.append(pdf_file)
+            removed = {name for name in self.pdf_metadata if name not in state}
+
+            if not changed and not removed:
+                return {"added": [], "removed": [], "failed": [], "num_documents": len(self.documents)}
+            return self._apply_update(removed | {p.name for p in changed}, changed)
+
+    def start_watcher(self, interval: float = 10.0):
+        """
+        Poll pdf_dir in a background thread and sync() whenever PDFs are added, changed or removed.
+        """
+        if self._watcher_stop is not None:
+            return
+        stop = threading.Event()
+
+        def watch():
+            while not stop.wait(interval):
+                try:
+                    self.sync()
+                except Exception as e:
+                    print(f"KnowledgeBase watcher error: {e}")
+
+        self._watcher_stop = stop
+        threading.Thread(target=watch, name="knowledgebase-watcher", daemon=True).start()
+
+    def stop_watcher(self):
+        if self._watcher_stop is not None:
+            self._watcher_stop.set()
+            self._watcher_stop = None
+
+    # ------------------------------------------------------------------
+    # Retrieval
+    # ------------------------------------------------------------------
+
     def search(self, query: str, top_k: int = 5) -> List[Dict]:
         """
         Return top_k relevant pages in the form:
         { 'source': ..., 'page': ..., 'content': ..., 'page_number': ..., 'file_path': ... }
         """
-        if not self.documents or not self._tfidf_matrix:
+        return self.search_many([query], top_k=top_k)[0]
+
+    def search_many(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """
+        Batched search: one result list (as returned by search()) per query, in query order.
+        All queries are vectorized together and scored with a single sparse matrix product;
+        the top_k per query is selected with argpartition instead of a full sort.
+        """
+        snapshot = self._snapshot
+        if not queries:
             return []
+        if not len(snapshot.documents) or snapshot.tfidf_matrix is None:
+            return [[] for _ in queries]
 
-        query_vec = self._vectorizer.transform([query])
-        sim_scores = cosine_similarity(query_vec, self._tfidf_matrix).flatten()
+        # Rows of both matrices are l2-normalised, so the dot product is the cosine similarity
+        query_matrix = snapshot.vectorizer.transform(queries)
+        sim_scores = (query_matrix @ snapshot.tfidf_matrix.T).toarray()
 
-        # Get best indices sorted by similarity score
-        best_indices = sim_scores.argsort()[-top_k:][::-1]
+        results = []
+        for row, best_indices in enumerate(_top_indices(sim_scores, top_k)):
+            # Create results with similarity scores for better context awareness
+            row_results = []
+            for idx in best_indices:
+                doc = snapshot.documents.document(idx)  # A fresh dict, built from the store
+                doc['similarity_score'] = float(sim_scores[row, idx])
+                row_results.append(doc)
+            results.append(row_results)
+
+        return results
+
+    def search_passages(self, query: str, top_k: int = 5) -> List[Dict]:
+        """
+        Return the pages of the top_k most relevant passages, with only those passages as content.
+        """
+        return self.search_passages_many([query], top_k=top_k)[0]
+
+    def search_passages_many(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """
+        Batched passage search. The top_k passages of a query are grouped by page, best page first;
+        overlapping or adjacent passages are merged and the rest of the page is left out.
+        Each result has the fields of a page (so citations still point at source and page),
+        with 'content' holding the excerpts, 'passages' their [start, end] character offsets
+        in the page text, and 'similarity_score' the score of the best passage.
+        """
+        snapshot = self._snapshot
+        if not queries:
+            return []
+        if snapshot.passage_matrix is None or not len(snapshot.passage_pages):
+            return [[] for _ in queries]
+
+        query_matrix = snapshot.vectorizer.transform(queries)
+        sim_scores = (query_matrix @ snapshot.passage_matrix.T).toarray()
 
-        # Create results with similarity scores for better context awareness
         results = []
-        for idx in best_indices:
-            doc = self.documents[idx].copy()  # Make a copy to avoid modifying original
-            doc['similarity_score'] = float(sim_scores[idx])
-            results.append(doc)
+        for row, best_indices in enumerate(_top_indices(sim_scores, top_k)):
+            pages = {}  # page row -> [best score, spans], in order of the best passage
+            for idx in best_indices:
+                page_row = int(snapshot.passage_pages[idx])
+                entry = pages.setdefault(page_row, [float(sim_scores[row, idx]), []])
+                entry[1].append(tuple(int(x) for x in snapshot.passage_spans[idx]))
+
+            row_results = []
+            for page_row, (score, spans) in pages.items():
+                doc = snapshot.documents.document(page_row)
+                spans = merge_spans(spans)
+                doc['content'] = PASSAGE_SEPARATOR.join(doc['content'][start:end] for start, end in spans)
+                doc['passages'] = [list(span) for span in spans]
+                doc['similarity_score'] = score
+                row_results.append(doc)
+            results.append(row_results)
 
         return results
 
+    def vectorize(self, texts: List[str]) -> Optional[sp.csr_matrix]:
+        """
+        TF-IDF vectors (l2-normalised rows) of arbitrary texts in the index's term space,
+        or None while the index is empty.
+        """
+        snapshot = self._snapshot
+        if snapshot.tfidf_matrix is None:
+            return None
+        return snapshot.vectorizer.transform(texts)
+
     def get_pdf_page(self, source: str, page: int) -> Optional[Dict]:
         """
         Return a specific page from a specific source.
         """
-        for doc in self.documents:
-            if doc["source"] == source and doc["page"] == page:
-                return doc
-        return None
\ No newline at end of file
+        documents = self.documents
+        row = documents.find(source, page)
+        return documents.document(row) if row is not None else None
+
+
+if __name__ == "__main__":
+    # Prebuild the index cache at deploy time:
+    #   python -m src.services.knowledgebase --pdf-dir ../../data/available_knowledge
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prebuild the KnowledgeBase index cache.")
+    parser.add_argument("--pdf-dir", default="data/available_knowledge", help="Directory with the knowledge PDFs")
+    parser.add_argument("--cache-dir", default=None, help="Cache directory (default: <pdf-dir>/../index_cache)")
+    parser.add_argument("--force", action="store_true", help="Discard the existing cache and re-extract every PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of processes used to extract PDFs (default: number of CPUs)")
+    args = parser.parse_args()
+
+    kb_cache_dir = Path(args.cache_dir) if args.cache_dir else Path(args.pdf_dir).parent / "index_cache"
+    if args.force and kb_cache_dir.exists():
+        shutil.rmtree(kb_cache_dir)
+
+    started = time.perf_counter()
+    kb = KnowledgeBase(pdf_dir=args.pdf_dir, cache_dir=str(kb_cache_dir), extraction_workers=args.workers)
+    failed = [report for report in kb.extraction_report if report["error"]]
+    for report in failed:
+        print(f"FAILED {report['source']}: {report['error']}")
+    print(f"Index ready in {kb_cache_dir} ({len(kb.documents)} pages, {time.perf_counter() - started:.2f}s)")
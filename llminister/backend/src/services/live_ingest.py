@@ -0,0 +1,192 @@
+import os
+import time
+import asyncio
+from typing import Dict, List, Optional
+
+from .question_extractor import (
+    ANTHROPIC_API_KEY,
+    split_utterances,
+    timestamp_seconds,
+    is_duplicate_question,
+    extract_questions_from_window,
+    to_question_record,
+    load_default_speakers
+)
+from .answer_generation import retrieve_context_many, summarize_retrieval
+from .storage_service import create_question_session, append_questions, load_questions
+from .question_clustering import assign_clusters
+from .provider_clients import get_anthropic_client, retry_delay
+from .executors import run_network, run_cpu, run_io
+
+# Utterances of already processed transcript that are sent along as context with new ones
+LIVE_CONTEXT_UTTERANCES = int(os.environ.get("LIVE_CONTEXT_UTTERANCES", "3"))
+# New text (in characters) to collect before an extraction call is made, unless a segment is flushed
+LIVE_MIN_NEW_CHARS = int(os.environ.get("LIVE_MIN_NEW_CHARS", "400"))
+# Extraction attempts for the same utterances before they are given up (and listed in the status)
+LIVE_MAX_ATTEMPTS = int(os.environ.get("LIVE_MAX_ATTEMPTS", "3"))
+
+
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class LiveSession:
+    """
+    Incremental question extraction for a debate that is still running.
+    Transcript segments are added with ingest(); extraction runs in the background over the
+    utterances that are new since the previous run, plus a short context tail, and new questions
+    are appended to the question session together with their retrieved knowledge base pages.
+    """
+
+    def __init__(self, session_id: str, categories: List[str], list_of_speakers: str = ""):
+        if "Algemeen" not in categories:
+            categories = categories + ["Algemeen"]
+        self.session_id = session_id
+        self.categories_str = ", ".join(categories)
+        self.list_of_speakers = list_of_speakers or load_default_speakers()
+        self.client = get_anthropic_client()
+        self.utterances: List[str] = []
+        self.processed = 0
+        self.questions_found = 0
+        self.extraction_runs = 0
+        self.errors: List[str] = []
+        # Failed attempts for the utterances from `processed` on, and the [start, end) ranges given up
+        self.failed_attempts = 0
+        self.failed_ranges: List[List[int]] = []
+        self.replay_task: Optional[asyncio.Task] = None
+        self.started_at = time.time()
+        self._extraction: Optional[asyncio.Task] = None
+
+    def status(self) -> Dict:
+        return {
+            "sessionId": self.session_id,
+            "utterances": len(self.utterances),
+            "processedUtterances": self.processed,
+            "questionsFound": self.questions_found,
+            "extractionRuns": self.extraction_runs,
+            "extracting": self._extraction is not None and not self._extraction.done(),
+            "replaying": self.replay_task is not None and not self.replay_task.done(),
+            "failedAttempts": self.failed_attempts,
+            "failedRanges": self.failed_ranges,
+            "errors": self.errors[-5:],
+            "startedAt": self.started_at
+        }
+
+    def ingest(self, text: str, flush: bool = False) -> int:
+        """
+        Add one or more "[HH:MM:SS] Speaker: text" utterances. Extraction starts once enough new text
+        has arrived, or right away with flush. Returns the number of utterances added.
+        """
+        utterances = split_utterances(text)
+        self.utterances.extend(utterances)
+        pending = sum(len(u) for u in self.utterances[self.processed:])
+        if pending and (flush or pending >= LIVE_MIN_NEW_CHARS):
+            if self._extraction is None or self._extraction.done():
+                self._extraction = asyncio.create_task(self._extract_pending())
+        return len(utterances)
+
+    async def finish(self):
+        """
+        Stop a running replay and extract whatever is still pending.
+        """
+        if self.replay_task is not None:
+            self.replay_task.cancel()
+            await asyncio.gather(self.replay_task, return_exceptions=True)
+        self.ingest("", flush=True)
+        if self._extraction is not None:
+            await self._extraction
+
+    async def _extract_pending(self):
+        # Segments that arrive during a model call are picked up by the next iteration
+        while self.processed < len(self.utterances):
+            end = len(self.utterances)
+            context = "\n\n".join(self.utterances[max(0, self.processed - LIVE_CONTEXT_UTTERANCES):self.processed])
+            new_text = "\n\n".join(self.utterances[self.processed:end])
+            self.extraction_runs += 1
+            try:
+                items = await run_network(
+                    extract_questions_from_window, self.client, new_text,
+                    self.categories_str, self.list_of_speakers, context
+                )
+                await self._append(items)
+            except Exception as e:
+                print(f"Live extraction failed for session {self.session_id}: {e}")
+                self.errors.append(str(e))
+                self.failed_attempts += 1
+                if self.failed_attempts < LIVE_MAX_ATTEMPTS:
+                    # The same utterances (plus any that arrived meanwhile) are tried again
+                    await asyncio.sleep(retry_delay(self.failed_attempts - 1))
+                    continue
+                self.failed_ranges.append([self.processed, end])
+            self.processed = end
+            self.failed_attempts = 0
+
+    async def _append(self, items: List[Dict]):
+        existing = await run_io(load_questions, self.session_id)
+        questions = []
+        for question in (to_question_record(item) for item in items):
+            if question["question_text"] and not any(is_duplicate_question(q, question) for q in existing + questions):
+                questions.append(question)
+        if not questions:
+            return
+
+        # Retrieval runs right away, so answers can be drafted as soon as someone opens the question
+        try:
+            retrieved = await run_cpu(retrieve_context_many, [q["question_text"] for q in questions])
+            for question, top_docs in zip(questions, retrieved):
+                question["retrieval"] = summarize_retrieval(top_docs)
+        except Exception as e:
+            print(f"Retrieval for live questions failed: {e}")
+
+        await run_io(append_questions, self.session_id, questions)
+        await run_cpu(assign_clusters, self.session_id)
+        self.questions_found += len(questions)
+
+    async def replay(self, transcript_path: str, speed: float = 1.0):
+        """
+        Local stand-in for a live feed: ingest a transcript file utterance by utterance,
+        paced by its timestamps (speed 2.0 plays twice as fast).
+        """
+        utterances = split_utterances(await run_io(_read_text, transcript_path))
+        started = time.monotonic()
+        first_seconds = None
+        for utterance in utterances:
+            seconds = timestamp_seconds(utterance[:12])
+            if seconds is not None:
+                if first_seconds is None:
+                    first_seconds = seconds
+                delay = (seconds - first_seconds) / max(speed, 1e-6) - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self.ingest(utterance)
+        self.ingest("", flush=True)
+
+
+_live_sessions: Dict[str, LiveSession] = {}
+
+def start_live_session(categories: List[str], source: str = "live",
+                       replay_path: Optional[str] = None, speed: float = 1.0) -> LiveSession:
+    """
+    Create a new (empty) question session and a live session feeding it;
+    with replay_path the transcript file is replayed into it.
+    """
+    if not ANTHROPIC_API_KEY:
+        raise Exception("No ANTHROPIC_API_KEY found in environment variables.")
+    if replay_path and not os.path.exists(replay_path):
+        raise FileNotFoundError(f"Transcript not found: {replay_path}")
+    session_id = create_question_session([], source=source if not replay_path else f"replay:{replay_path}")
+    session = LiveSession(session_id, categories)
+    if replay_path:
+        session.replay_task = asyncio.create_task(session.replay(replay_path, speed))
+    _live_sessions[session_id] = session
+    return session
+
+def get_live_session(session_id: str) -> Optional[LiveSession]:
+    return _live_sessions.get(session_id)
+
+async def stop_live_session(session_id: str) -> Optional[LiveSession]:
+    session = _live_sessions.pop(session_id, None)
+    if session is not None:
+        await session.finish()
+    return session
@@ -0,0 +1,140 @@
+import os
+import io
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict
+
+from .storage_service import DATA_DIR
+from .executors import run_process, run_io
+
+PDF_PAGE_CACHE_DIR = Path(os.environ.get("PDF_PAGE_CACHE_DIR", DATA_DIR / "page_cache"))
+# Upper bound for the cached single-page PDFs on disk; least recently used pages are evicted first
+PDF_PAGE_CACHE_MAX_BYTES = int(os.environ.get("PDF_PAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+class PageOutOfRangeError(Exception):
+    """
+    Raised when a page number does not exist in the PDF.
+    """
+
+
+def page_etag(pdf_path: str, page: int) -> str:
+    """
+    Strong ETag of a page of a PDF. It is derived from the file's size and modification time,
+    so it changes when the PDF is replaced, and can be checked without generating the page.
+    """
+    stat = os.stat(pdf_path)
+    key = f"{os.path.basename(pdf_path)}|{stat.st_size}|{stat.st_mtime_ns}|{page}"
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+def _split_page(pdf_path: str, page: int, out_path: Path):
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(pdf_path)
+    # Adjust to 0-based indexing
+    page_idx = page - 1
+    if page_idx < 0 or page_idx >= len(reader.pages):
+        raise PageOutOfRangeError("Page number out of range")
+    writer = PdfWriter()
+    writer.add_page(reader.pages[page_idx])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+
+    tmp_path = out_path.with_name(out_path.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, out_path)
+
+def _touch(path: Path) -> bool:
+    # Marks a cached page as recently used for the LRU eviction; False when it is not cached
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class PdfPageCache:
+    """
+    Single-page PDFs cut from the knowledge base documents, generated on first request and kept
+    on disk under an LRU size bound (file mtimes record the last use, so the order survives restarts).
+    Concurrent requests for a page that is not cached yet share one computation.
+    """
+
+    def __init__(self, cache_dir: Path = PDF_PAGE_CACHE_DIR, max_bytes: int = PDF_PAGE_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._total_bytes = sum(f.stat().st_size for f in self.cache_dir.glob("*.pdf"))
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, pdf_path: str, page: int) -> Path:
+        """
+        Path of the cached single-page PDF (generating it if needed).
+        Raises PageOutOfRangeError for a page the PDF does not have.
+        """
+        etag = await run_io(page_etag, pdf_path, page)
+        out_path = self.cache_dir / (etag.strip('"') + ".pdf")
+        if await run_io(_touch, out_path):
+            self.hits += 1
+            return out_path
+
+        # Generation runs as a task of its own, so a requester that disconnects does not cancel it
+        # for the others. Registered under the lock that eviction holds, so it is never evicted.
+        with self._lock:
+            task = self._in_flight.get(etag)
+            if task is None:
+                self.misses += 1
+                task = asyncio.get_running_loop().create_task(self._generate(etag, pdf_path, page, out_path))
+                # Retrieve the exception when every requester has gone, so it is not reported as unhandled
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                self._in_flight[etag] = task
+        return await asyncio.shield(task)
+
+    async def _generate(self, etag: str, pdf_path: str, page: int, out_path: Path) -> Path:
+        try:
+            await run_process(_split_page, pdf_path, page, out_path)
+            await run_io(self._account, out_path)
+        finally:
+            with self._lock:
+                self._in_flight.pop(etag, None)
+        return out_path
+
+    def _account(self, new_file: Path):
+        with self._lock:
+            self._total_bytes += new_file.stat().st_size
+            if self._total_bytes <= self.max_bytes:
+                return
+            in_flight = {etag.strip('"') + ".pdf" for etag in self._in_flight}
+            files = sorted(self.cache_dir.glob("*.pdf"), key=lambda f: f.stat().st_mtime)
+            for f in files:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                if f == new_file or f.name in in_flight:
+                    continue
+                size = f.stat().st_size
+                f.unlink(missing_ok=True)
+                self._total_bytes -= size
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "in_flight": len(self._in_flight)
+        }
+
+
+_page_cache = None
+
+def get_page_cache() -> PdfPageCache:
+    global _page_cache
+    if _page_cache is None:
+        _page_cache = PdfPageCache()
+    return _page_cache
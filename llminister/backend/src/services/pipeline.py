@@ -0,0 +1,310 @@
+import os
+import copy
+import uuid
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .storage_service import (
+    create_job,
+    get_job,
+    update_job,
+    list_unfinished_jobs,
+    claim_job,
+    create_question_session,
+    append_questions,
+    load_questions,
+    update_question
+)
+from .question_extractor import stream_questions_from_transcript, is_duplicate_question
+from .answer_generation import retrieve_for_questions, summarize_retrieval, knowledge_base_status
+from .answer_engine import AnswerJob, AnswerResult, generate_answers_concurrently, ANSWER_CONCURRENCY
+from .question_clustering import assign_clusters
+from .executors import run_cpu, run_io
+from .job_leases import JOB_LEASE_SECONDS, PROCESS_OWNER, claim, hold_lease
+
+JOB_KIND = "pipeline"
+STAGES = ("transcribe", "extract", "retrieve", "generate")
+
+# Questions waiting between two stages; when a queue is full the stage before it waits
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "16"))
+# Most questions retrieved in one vectorized batch (a batch never waits for more questions)
+PIPELINE_RETRIEVE_BATCH = int(os.environ.get("PIPELINE_RETRIEVE_BATCH", "8"))
+# Answers drafted at the same time by one run (within the shared Anthropic rate limits)
+PIPELINE_ANSWER_WORKERS = int(os.environ.get("PIPELINE_ANSWER_WORKERS", str(ANSWER_CONCURRENCY)))
+# Seconds between checks of the transcription job and the knowledge base a run waits for
+PIPELINE_POLL_SECONDS = 2.0
+
+
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class PipelineRun:
+    """
+    One run of transcribe → extract → retrieve → generate, persisted as a job of kind "pipeline".
+    The stages after transcription run at the same time, connected by bounded queues, so the first
+    question is retrieved and answered while later parts of the transcript are still being extracted.
+    Every artifact is stored as soon as it exists (transcript file, questions in the run's session,
+    `retrieval` and `draftAnswer` on each question), so a resumed run only does the work that is left.
+    """
+
+    def __init__(self, job: Dict):
+        self.id = job["id"]
+        self.job = job
+        self.stages = copy.deepcopy(job["stages"])
+        self._save_lock = asyncio.Lock()
+
+    async def _save(self, status: Optional[str] = None, **fields):
+        # Saves are serialised, and each one writes the latest stage progress
+        async with self._save_lock:
+            self.job = await run_io(update_job, self.id, status, stages=copy.deepcopy(self.stages), **fields)
+
+    async def _stage(self, name: str, **fields):
+        self.stages[name].update(fields)
+        await self._save()
+
+    async def run(self):
+        try:
+            await self._save("running", error=None)
+            transcript_path = await self._transcribe()
+
+            session_id = self.job.get("sessionId")
+            if not session_id:
+                session_id = await run_io(create_question_session, [], source=transcript_path)
+                await self._save(sessionId=session_id)
+
+            to_retrieve: asyncio.Queue = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+            to_generate: asyncio.Queue = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+            tasks = [
+                asyncio.create_task(self._extract(session_id, transcript_path, to_retrieve)),
+                asyncio.create_task(self._retrieve(to_retrieve, to_generate)),
+                asyncio.create_task(self._generate(to_generate))
+            ]
+            try:
+                # A failing stage stops the others, which would otherwise wait on its queue forever
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    task.result()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            await self._save("completed")
+        except asyncio.CancelledError:
+            # Shutdown: the run stays "running" and is resumed on the next start
+            raise
+        except Exception as e:
+            print(f"Pipeline run {self.id} failed: {e}")
+            for stage in self.stages.values():
+                if stage["status"] == "running":
+                    stage["status"] = "error"
+            await self._save("error", error=str(e))
+
+    async def _transcribe(self) -> str:
+        """
+        Wait for the run's transcription job (which the transcription queue runs and resumes by itself).
+        """
+        if self.job.get("transcriptPath"):
+            if self.stages["transcribe"]["status"] != "completed":
+                await self._stage("transcribe", status="skipped")
+            return self.job["transcriptPath"]
+
+        await self._stage("transcribe", status="running")
+        job_id = self.job["transcriptionJobId"]
+        while True:
+            job = await run_io(get_job, job_id)
+            if job is None:
+                raise Exception(f"Transcription job {job_id} not found.")
+            if job["status"] == "error":
+                raise Exception(f"Transcription failed: {job.get('error')}")
+            if job["status"] == "completed":
+                self.stages["transcribe"].update(status="completed", job=job["status"])
+                await self._save(transcriptPath=job["transcriptPath"])
+                return job["transcriptPath"]
+            if self.stages["transcribe"].get("job") != job["status"]:
+                await self._stage("transcribe", job=job["status"])
+            await asyncio.sleep(PIPELINE_POLL_SECONDS)
+
+    async def _extract(self, session_id: str, transcript_path: str, out: asyncio.Queue):
+        # Questions saved before an interruption go through the later stages again; those skip finished work
+        existing = await run_io(load_questions, session_id)
+        for question in existing:
+            await out.put(question)
+
+        if self.stages["extract"]["status"] != "completed":
+            await self._stage("extract", status="running", questions=len(existing), warnings=0)
+            transcript_text = await run_io(_read_text, transcript_path)
+            async for item in stream_questions_from_transcript(transcript_text, list(self.job.get("categories", []))):
+                if item["event"] == "warning":
+                    await self._stage("extract", warnings=self.stages["extract"]["warnings"] + 1)
+                elif item["event"] == "question":
+                    question = item["data"]
+                    # A resumed extraction finds the questions of the interrupted one again
+                    if any(is_duplicate_question(q, question) for q in existing):
+                        continue
+                    existing.append(question)
+                    await run_io(append_questions, session_id, [question])
+                    await self._stage("extract", questions=len(existing))
+                    await out.put(question)
+            clusters = await run_cpu(assign_clusters, session_id)
+            await self._stage("extract", status="completed", clusters=clusters["clusters"])
+        await out.put(None)
+
+    async def _wait_for_knowledge_base(self):
+        # Retrieval raises KnowledgeBaseNotReady when it is neither loaded nor loading
+        while True:
+            status = knowledge_base_status()
+            if status["ready"] or not status["loading"]:
+                return
+            await asyncio.sleep(PIPELINE_POLL_SECONDS)
+
+    async def _retrieve(self, inp: asyncio.Queue, out: asyncio.Queue):
+        await self._stage("retrieve", status="running", done=self.stages["retrieve"].get("done", 0))
+        await self._wait_for_knowledge_base()
+        finished = False
+        while not finished:
+            batch = [await inp.get()]
+            while len(batch) < PIPELINE_RETRIEVE_BATCH and batch[-1] is not None and not inp.empty():
+                batch.append(inp.get_nowait())
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+
+            todo = [q for q in batch if not q.get("draftAnswer")]
+            if not todo:
+                continue
+            # A question that already has a valid stored retrieval (e.g. before a resume) is not searched again
+            retrieved = await run_cpu(retrieve_for_questions, todo)
+            for question, top_docs in zip(todo, retrieved):
+                summary = summarize_retrieval(top_docs)
+                if summary != question.get("retrieval"):
+                    def apply(q, summary=summary):
+                        q["retrieval"] = summary
+
+                    await run_io(update_question, question["id"], apply)
+                await out.put((question, top_docs))
+            await self._stage("retrieve", done=self.stages["retrieve"]["done"] + len(todo))
+        await self._stage("retrieve", status="completed")
+        await out.put(None)
+
+    async def _generate(self, inp: asyncio.Queue):
+        progress = self.stages["generate"]
+        await self._stage("generate", status="running", done=progress.get("done", 0),
+                          failed=0, cached=progress.get("cached", 0))
+
+        async def on_result(result: AnswerResult):
+            if result.draft is not None:
+                def apply(q, draft=result.draft):
+                    # A draft written in the meantime (e.g. edited by hand) is kept
+                    if q.get("draftAnswer"):
+                        return False
+                    q["draftAnswer"] = draft
+                    q["updatedAt"] = datetime.now().isoformat()
+
+                await run_io(update_question, result.question_id, apply)
+            await self._stage("generate", done=progress["done"] + (result.draft is not None),
+                              failed=progress["failed"] + (result.draft is None),
+                              cached=progress["cached"] + result.cached)
+
+        async def worker():
+            while True:
+                item = await inp.get()
+                if item is None:
+                    # Pass the end on to the other workers
+                    await inp.put(None)
+                    return
+                question, top_docs = item
+                job = AnswerJob(
+                    question_id=question["id"],
+                    question_text=question.get("question_text") or question.get("text", ""),
+                    speaker=question.get("speaker", "Unknown"),
+                    party=question.get("party", "Unknown"),
+                    category=question.get("category", "Algemeen"),
+                    retrieved_docs=top_docs
+                )
+                await generate_answers_concurrently([job], on_result=on_result, concurrency=1)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, PIPELINE_ANSWER_WORKERS))))
+        await self._stage("generate", status="completed")
+
+
+class PipelineRunner:
+    """
+    Starts pipeline runs as background tasks, and on start() resumes the runs a restart interrupted.
+    Like transcription jobs, a run is only run by the process that holds its lease.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def start(self):
+        for job in await run_io(list_unfinished_jobs, JOB_KIND):
+            if not await claim(job["id"]):
+                continue  # another process is running it
+            print(f"Resuming pipeline run {job['id']}.")
+            self._launch(job)
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def submit(self, categories: List[str], transcript_path: Optional[str] = None,
+               transcription_job_id: Optional[str] = None, filename: str = "") -> Dict:
+        """
+        Persist and start a run, either for a transcript file or for a queued transcription job.
+        """
+        if not transcript_path and not transcription_job_id:
+            raise ValueError("A pipeline run needs a transcript path or a transcription job.")
+        job = create_job(uuid.uuid4().hex, JOB_KIND, {
+            "filename": filename,
+            "categories": categories,
+            "transcriptPath": transcript_path,
+            "transcriptionJobId": transcription_job_id,
+            "sessionId": None,
+            "stages": {stage: {"status": "pending"} for stage in STAGES}
+        })
+        claim_job(job["id"], PROCESS_OWNER, JOB_LEASE_SECONDS)
+        self._launch(job)
+        return job
+
+    def resume(self, run_id: str) -> Optional[Dict]:
+        """
+        Start a failed (or interrupted) run again from where it stopped. Returns None for an unknown run.
+        A run that another process is running is left to that process.
+        """
+        job = get_job(run_id)
+        if job is None or job["kind"] != JOB_KIND:
+            return None
+        if run_id not in self._tasks and job["status"] != "completed":
+            if job["status"] == "error":
+                # A finished job can't be claimed
+                job = update_job(run_id, "queued")
+            if claim_job(run_id, PROCESS_OWNER, JOB_LEASE_SECONDS):
+                self._launch(job)
+        return job
+
+    def is_active(self, run_id: str) -> bool:
+        return run_id in self._tasks
+
+    def _launch(self, job: Dict):
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job["id"]] = task
+        task.add_done_callback(lambda _, run_id=job["id"]: self._tasks.pop(run_id, None))
+
+    async def _run(self, job: Dict):
+        async with hold_lease(job["id"]):
+            await PipelineRun(job).run()
+
+
+_runner = None
+
+def get_pipeline_runner() -> PipelineRunner:
+    global _runner
+    if _runner is None:
+        _runner = PipelineRunner()
+    return _runner
@@ -0,0 +1,266 @@
+import os
+import time
+import random
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import anthropic
+import requests
+from requests.adapters import HTTPAdapter
+
+# Base URLs of the providers; point them at a local fake server to run without the real APIs
+ANTHROPIC_BASE_URL = os.environ.get("ANTHROPIC_BASE_URL") or None  # None = the SDK default
+ASSEMBLYAI_BASE_URL = os.environ.get("ASSEMBLYAI_BASE_URL", "https://api.assemblyai.com/v2").rstrip("/")
+
+# Timeouts in seconds: connecting, and waiting for (the next part of) a response
+PROVIDER_CONNECT_TIMEOUT = float(os.environ.get("PROVIDER_CONNECT_TIMEOUT", "10"))
+PROVIDER_READ_TIMEOUT = float(os.environ.get("PROVIDER_READ_TIMEOUT", "120"))
+
+# Connections kept open per provider
+PROVIDER_MAX_CONNECTIONS = int(os.environ.get("PROVIDER_MAX_CONNECTIONS", "32"))
+
+# Retries of failed requests, with jittered exponential backoff
+PROVIDER_MAX_RETRIES = int(os.environ.get("PROVIDER_MAX_RETRIES", "3"))
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 30.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504, 529}
+# Statuses after which a request that is not a GET is sent again: the provider refused it without
+# processing it. After a 500/502/504 it may already have been processed (e.g. a transcription submitted).
+RETRYABLE_UNPROCESSED_STATUS_CODES = {429, 503}
+
+# Circuit breaker: consecutive failures that open it, and seconds before a trial request is let through
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("CIRCUIT_RESET_SECONDS", "30"))
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a provider that failed repeatedly and is still cooling down.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a provider after CIRCUIT_FAILURE_THRESHOLD consecutive failures (connection
+    errors and 5xx responses), so requests fail right away instead of each waiting for a timeout.
+    After CIRCUIT_RESET_SECONDS one trial call is let through; its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self.rejected = 0
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_seconds - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._trial_running:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} is unavailable after repeated failures; "
+                                       f"retry in {max(remaining, 0):.0f}s.")
+            self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold or self._trial_running:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self):
+        """
+        End a call that failed for reasons of our own (e.g. a cancelled request) without counting it.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_status(self, status_code: int):
+        if status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            if self._opened_at is None:
+                state = "closed"
+            elif self._trial_running or time.monotonic() - self._opened_at >= self.reset_seconds:
+                state = "half-open"
+            else:
+                state = "open"
+            return {"state": state, "consecutive_failures": self._failures, "rejected": self.rejected}
+
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """
+    Seconds to wait before retry `attempt` (0-based): the server's Retry-After when it sent one,
+    otherwise exponential backoff with jitter so parallel callers don't retry in lockstep.
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_MAX_SECONDS)
+        except ValueError:
+            pass
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+class AssemblyAIClient:
+    """
+    AssemblyAI REST calls over one pooled requests.Session (keep-alive, no TLS setup per call),
+    with timeouts, jittered retries and a circuit breaker.
+    """
+
+    def __init__(self, api_key: Optional[str], base_url: str = ASSEMBLYAI_BASE_URL,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip("/")
+        self.breaker = breaker or CircuitBreaker("AssemblyAI")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PROVIDER_MAX_CONNECTIONS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if api_key:
+            self.session.headers["authorization"] = api_key
+
+    def request(self, method: str, path: str, max_retries: int = PROVIDER_MAX_RETRIES, **kwargs) -> requests.Response:
+        """
+        Send a request to base_url + path and return the response of the last attempt.
+        GETs are retried on connection errors, timeouts and 429/5xx responses. Other methods are only
+        retried when the provider cannot have processed them (connect timeout, 429 or 503), so a 502
+        after AssemblyAI accepted a job does not submit it a second time.
+        A callable `data` is called for every attempt (e.g. a file reader).
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        kwargs.setdefault("timeout", (PROVIDER_CONNECT_TIMEOUT, PROVIDER_READ_TIMEOUT))
+        data = kwargs.pop("data", None)
+        idempotent = method.upper() == "GET"
+        retry_statuses = RETRYABLE_STATUS_CODES if idempotent else RETRYABLE_UNPROCESSED_STATUS_CODES
+        for attempt in range(max_retries + 1):
+            self.breaker.before_call()
+            retry_after = None
+            try:
+                response = self.session.request(method, url, data=data() if callable(data) else data, **kwargs)
+            except requests.ConnectTimeout:
+                self.breaker.record_failure()
+                if attempt == max_retries:
+                    raise
+            except (requests.ConnectionError, requests.Timeout):
+                self.breaker.record_failure()
+                if not idempotent or attempt == max_retries:
+                    raise
+            except BaseException:
+                # Not the provider's fault (e.g. a broken response body or a failing file reader),
+                # but a trial call must still end, or the circuit stays half-open for good
+                self.breaker.release()
+                raise
+            else:
+                self.breaker.record_status(response.status_code)
+                if response.status_code not in retry_statuses or attempt == max_retries:
+                    return response
+                retry_after = response.headers.get("retry-after")
+            time.sleep(retry_delay(attempt, retry_after))
+
+    def stats(self) -> Dict:
+        return {"base_url": self.base_url, "circuit": self.breaker.stats()}
+
+
+_lock = threading.Lock()
+_anthropic_breaker = CircuitBreaker("Anthropic")
+_anthropic_client = None
+_async_anthropic_client = None
+_assemblyai_client = None
+
+def _anthropic_timeout() -> anthropic.Timeout:
+    return anthropic.Timeout(PROVIDER_READ_TIMEOUT, connect=PROVIDER_CONNECT_TIMEOUT)
+
+@contextmanager
+def anthropic_call():
+    """
+    Wrap one Anthropic API call (including the SDK's own retries, or a whole stream) in the
+    Anthropic circuit breaker: raises CircuitOpenError while it is open, and counts connection
+    errors and 5xx responses as failures.
+    """
+    _anthropic_breaker.before_call()
+    try:
+        yield
+    except anthropic.APIStatusError as e:
+        _anthropic_breaker.record_status(e.status_code)
+        raise
+    except anthropic.APIConnectionError:
+        _anthropic_breaker.record_failure()
+        raise
+    except BaseException:
+        _anthropic_breaker.release()
+        raise
+    _anthropic_breaker.record_success()
+
+def get_anthropic_client(max_retries: Optional[int] = None) -> anthropic.Anthropic:
+    """
+    The shared synchronous Anthropic client. One client keeps one connection pool, so calls reuse
+    open connections; the SDK retries 429/5xx and connection errors with jittered backoff itself.
+    Callers that retry on their own pass max_retries=0 (a view on the same connection pool),
+    so attempts are not multiplied.
+    """
+    global _anthropic_client
+    with _lock:
+        if _anthropic_client is None:
+            _anthropic_client = anthropic.Anthropic(
+                api_key=os.environ.get("ANTHROPIC_API_KEY"),
+                base_url=ANTHROPIC_BASE_URL,
+                timeout=_anthropic_timeout(),
+                max_retries=PROVIDER_MAX_RETRIES
+            )
+        client = _anthropic_client
+    return client if max_retries is None else client.with_options(max_retries=max_retries)
+
+def get_async_anthropic_client() -> anthropic.AsyncAnthropic:
+    """
+    The shared asynchronous Anthropic client (for streaming).
+    """
+    global _async_anthropic_client
+    with _lock:
+        if _async_anthropic_client is None:
+            _async_anthropic_client = anthropic.AsyncAnthropic(
+                api_key=os.environ.get("ANTHROPIC_API_KEY"),
+                base_url=ANTHROPIC_BASE_URL,
+                timeout=_anthropic_timeout(),
+                max_retries=PROVIDER_MAX_RETRIES
+            )
+        return _async_anthropic_client
+
+def get_assemblyai_client() -> AssemblyAIClient:
+    global _assemblyai_client
+    with _lock:
+        if _assemblyai_client is None:
+            _assemblyai_client = AssemblyAIClient(os.environ.get("ASSEMBLYAI_API_KEY"), ASSEMBLYAI_BASE_URL)
+        return _assemblyai_client
+
+def reset_provider_clients():
+    """
+    Drop the shared clients, so the next call creates them again (e.g. after changing the base URLs).
+    """
+    global _anthropic_client, _async_anthropic_client, _assemblyai_client
+    with _lock:
+        if _assemblyai_client is not None:
+            _assemblyai_client.session.close()
+        _anthropic_client = _async_anthropic_client = _assemblyai_client = None
+
+def provider_stats() -> Dict:
+    return {
+        "anthropic": {"base_url": ANTHROPIC_BASE_URL or "default", "circuit": _anthropic_breaker.stats()},
+        "assemblyai": get_assemblyai_client().stats()
+    }
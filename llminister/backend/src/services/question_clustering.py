@@ -0,0 +1,93 @@
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from .answer_generation import get_knowledge_base
+from .storage_service import load_questions, update_question, question_session_id
+
+# Cosine similarity (TF-IDF) from which two questions count as the same question
+QUESTION_CLUSTER_THRESHOLD = float(os.environ.get("QUESTION_CLUSTER_THRESHOLD", "0.6"))
+
+
+def _question_vectors(texts: List[str]):
+    """
+    l2-normalised TF-IDF rows for the question texts: in the knowledge base's term space when
+    it has an index, otherwise from a vectorizer fitted on the questions themselves.
+    """
+    matrix = get_knowledge_base().vectorize(texts)
+    if matrix is not None:
+        return matrix
+    try:
+        return TfidfVectorizer().fit_transform(texts)
+    except ValueError:
+        # Only empty texts / no terms at all: nothing is similar to anything
+        return None
+
+def cluster_questions(questions: List[Dict], threshold: float = QUESTION_CLUSTER_THRESHOLD) -> Dict[str, str]:
+    """
+    Group paraphrased questions. Questions are visited in order; each one joins the most similar
+    earlier cluster whose first question (its leader) is at least `threshold` similar, or starts a new one.
+    Comparing against leaders only keeps clusters from chaining into loosely related questions.
+    Returns question id -> cluster id, where the cluster id is the leader's question id.
+    """
+    if not questions:
+        return {}
+    texts = [q.get("question_text") or q.get("text", "") for q in questions]
+    matrix = _question_vectors(texts)
+    if matrix is None:
+        return {q["id"]: q["id"] for q in questions}
+    similarities = (matrix @ matrix.T).toarray()
+
+    leaders: List[int] = []
+    clusters = {}
+    for i, question in enumerate(questions):
+        if leaders:
+            leader_scores = similarities[i, leaders]
+            best = int(np.argmax(leader_scores))
+            if leader_scores[best] >= threshold:
+                clusters[question["id"]] = questions[leaders[best]]["id"]
+                continue
+        leaders.append(i)
+        clusters[question["id"]] = question["id"]
+    return clusters
+
+def assign_clusters(session_id: Optional[str] = None, threshold: float = QUESTION_CLUSTER_THRESHOLD) -> Dict:
+    """
+    Cluster the questions of a session (default: the current one) and store `clusterId` on each
+    question whose cluster changed. Returns the number of questions and clusters.
+    """
+    questions = load_questions(session_id)
+    clusters = cluster_questions(questions, threshold)
+    for question in questions:
+        cluster_id = clusters[question["id"]]
+        if question.get("clusterId") != cluster_id:
+            def apply(q, cluster_id=cluster_id):
+                if q.get("clusterId") == cluster_id:
+                    return False
+                q["clusterId"] = cluster_id
+            # clusterId is derived data: edits made with the previous ETag stay valid
+            update_question(question["id"], apply, bump_version=False)
+    return {"questions": len(questions), "clusters": len(set(clusters.values()))}
+
+def recluster_question(question_id: str, threshold: float = QUESTION_CLUSTER_THRESHOLD) -> Optional[Dict]:
+    """
+    Cluster the session of a question again after its text was edited, so it only shares a draft
+    with questions its new wording is a paraphrase of. Returns None for an unknown question.
+    """
+    session_id = question_session_id(question_id)
+    if session_id is None:
+        return None
+    return assign_clusters(session_id, threshold)
+
+def group_by_cluster(questions: List[Dict], cluster: bool = True) -> List[List[Dict]]:
+    """
+    Group questions on `clusterId` (each question alone with cluster=False), in order of first appearance.
+    The first question of a group is the one its draft is generated for.
+    """
+    groups: Dict[str, List[Dict]] = {}
+    for question in questions:
+        cluster_id = (question.get("clusterId") or question["id"]) if cluster else question["id"]
+        groups.setdefault(cluster_id, []).append(question)
+    return list(groups.values())
@@ -1,47 +1,254 @@
 # /Users/debruinreinier/Repos/LLMinister/llminister/backend/src/services/question_extractor.py
 
 import os
+import re
 import json
 import uuid
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict
+from difflib import SequenceMatcher
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 
 import anthropic
 
+from .provider_clients import anthropic_call, get_anthropic_client, get_async_anthropic_client
+
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 
-def extract_questions_from_transcript(transcript: str, categories: List[str], list_of_speakers: str = "") -> List[Dict]:
+EXTRACTION_MODEL = "claude-3-7-sonnet-20250219"
+EXTRACTION_MAX_TOKENS = 4000
+
+# Long transcripts are extracted in windows of whole utterances, which run concurrently.
+# Consecutive windows share EXTRACTION_WINDOW_OVERLAP utterances, so a question on a boundary is seen whole.
+EXTRACTION_WINDOW_CHARS = int(os.environ.get("EXTRACTION_WINDOW_CHARS", "24000"))
+EXTRACTION_WINDOW_OVERLAP = int(os.environ.get("EXTRACTION_WINDOW_OVERLAP", "2"))
+EXTRACTION_CONCURRENCY = int(os.environ.get("EXTRACTION_CONCURRENCY", "4"))
+
+# Two extracted questions are the same when speaker matches, they are this close in time
+# and their texts are at least this similar
+DUPLICATE_MAX_SECONDS = 120
+DUPLICATE_MIN_SIMILARITY = 0.8
+
+UTTERANCE_PATTERN = re.compile(r"^\[(\d{1,2}:\d{2}:\d{2})\] [^:\n]+:", re.MULTILINE)
+
+def split_utterances(transcript: str) -> List[str]:
     """
-    Use Anthropic (Claude) to parse the transcript and identify questions
-    that are DIRECTLY asked to the minister or implicit questions requiring answers.
+    Split a "[HH:MM:SS] Speaker: text" transcript into utterances.
+    Text before the first timestamp (or a transcript without timestamps) is kept as one utterance.
     """
-    if not ANTHROPIC_API_KEY:
-        raise Exception("No ANTHROPIC_API_KEY found in environment variables.")
+    starts = [m.start() for m in UTTERANCE_PATTERN.finditer(transcript)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(transcript)]
+    utterances = [transcript[begin:end].strip() for begin, end in zip(bounds, bounds[1:])]
+    return [u for u in utterances if u]
 
-    if "Algemeen" not in categories:
-        categories.append("Algemeen")
+def split_transcript_windows(transcript: str, max_chars: int = EXTRACTION_WINDOW_CHARS,
+                             overlap: int = EXTRACTION_WINDOW_OVERLAP) -> List[str]:
+    """
+    Group utterances into windows of at most max_chars (a single longer utterance gets a window
+    of its own). Each window after the first starts with the last `overlap` utterances of the previous one.
+    """
+    utterances = split_utterances(transcript)
+    windows = []
+    current: List[str] = []
+    size = 0
+    fresh = 0  # utterances in `current` that are not overlap from the previous window
+    for utterance in utterances:
+        if fresh and size + len(utterance) > max_chars:
+            windows.append(current)
+            current = current[-overlap:] if overlap else []
+            size = sum(len(u) for u in current)
+            fresh = 0
+        current.append(utterance)
+        size += len(utterance)
+        fresh += 1
+    if fresh:
+        windows.append(current)
+    return ["\n\n".join(window) for window in windows]
 
-    categories_str = ", ".join(categories)
+def timestamp_seconds(timestamp: str) -> Optional[int]:
+    match = re.search(r"(\d{1,2}):(\d{2}):(\d{2})", timestamp or "")
+    if not match:
+        return None
+    h, m, s = (int(part) for part in match.groups())
+    return h * 3600 + m * 60 + s
 
-    # Read the list of speakers from CSV if not provided
-    if not list_of_speakers:
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", (text or "").lower()).strip()
+
+def is_duplicate_question(a: Dict, b: Dict) -> bool:
+    """
+    Same speaker, close in time (when both have a timestamp) and (nearly) the same text.
+    """
+    if _normalize(a.get("speaker")) != _normalize(b.get("speaker")):
+        return False
+    seconds_a, seconds_b = timestamp_seconds(a.get("timestamp")), timestamp_seconds(b.get("timestamp"))
+    if seconds_a is not None and seconds_b is not None and abs(seconds_a - seconds_b) > DUPLICATE_MAX_SECONDS:
+        return False
+    text_a, text_b = _normalize(a.get("question_text")), _normalize(b.get("question_text"))
+    if not text_a or not text_b:
+        return text_a == text_b
+    if text_a in text_b or text_b in text_a:
+        return True
+    return SequenceMatcher(None, text_a, text_b).ratio() >= DUPLICATE_MIN_SIMILARITY
+
+def merge_questions(question_lists: List[List[Dict]]) -> List[Dict]:
+    """
+    Merge the questions of overlapping windows in timestamp order, dropping duplicates;
+    of two duplicates the one with the longer text is kept.
+    """
+    ordered = sorted(
+        (q for questions in question_lists for q in questions),
+        key=lambda q: (timestamp_seconds(q.get("timestamp")) is None, timestamp_seconds(q.get("timestamp")) or 0)
+    )
+    merged: List[Dict] = []
+    for question in ordered:
+        for i, kept in enumerate(merged):
+            if is_duplicate_question(kept, question):
+                if len(question.get("question_text", "")) > len(kept.get("question_text", "")):
+                    merged[i] = question
+                break
+        else:
+            merged.append(question)
+    return merged
+
+def parse_question_array(raw: str) -> List[Dict]:
+    """
+    Parse the model's JSON array of questions. When the array is cut off (e.g. at max_tokens),
+    the complete objects before the cut are still returned.
+    """
+    json_str = raw
+    if "```json" in raw:
+        json_str = raw.split("```json")[1].split("```")[0]
+    elif "```" in raw:
+        json_str = raw.split("```")[1].split("```")[0]
+    try:
+        data = json.loads(json_str)
+        return data if isinstance(data, list) else []
+    except json.JSONDecodeError:
+        pass
+
+    start = raw.find("[")
+    if start < 0:
+        raise ValueError("No JSON array in the model response.")
+    decoder = json.JSONDecoder()
+    items = []
+    pos = start + 1
+    while True:
+        while pos < len(raw) and raw[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(raw) or raw[pos] != "{":
+            break
         try:
-            # Try to load the list_of_speakers from the default location
-            speakers_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))),
-                                       "data", "list_of_speakers", "list_of_speakers.csv")
-            if os.path.exists(speakers_path):
-                with open(speakers_path, 'r', encoding='utf-8') as f:
-                    # Skip header
-                    next(f)
-                    # Format as Name (Party)
-                    list_of_speakers = "\n".join([f"{line.split(',')[0]} ({line.split(',')[2].strip()})" for line in f if line.strip()])
-        except Exception as e:
-            print(f"Error loading list of speakers: {e}")
-            # Continue without the list of speakers
-            pass
+            item, pos = decoder.raw_decode(raw, pos)
+        except json.JSONDecodeError:
+            break
+        items.append(item)
+    return items
+
+class QuestionStreamParser:
+    """
+    Incremental parser for the model's JSON array of questions: feed() text chunks as they
+    arrive and get back each question object as soon as its closing brace has come in.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = 0
+        self._in_string = False
+        self._escape = False
 
+    def feed(self, text: str) -> List[Dict]:
+        self._buffer += text
+        items = []
+        while self._pos < len(self._buffer):
+            ch = self._buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"' and self._depth > 0:
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = self._pos
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        items.append(json.loads(self._buffer[self._start:self._pos + 1]))
+                    except json.JSONDecodeError as e:
+                        print(f"Skipping malformed question object: {e}")
+            self._pos += 1
+        # Text outside an object (brackets, commas, code fences) is not needed anymore
+        if self._depth == 0:
+            self._buffer = ""
+            self._pos = 0
+        return items
+
+def to_question_record(item: Dict, now_iso: Optional[str] = None) -> Dict:
+    """
+    Turn one extracted item into a stored question with a fresh id and the default workflow fields.
+    """
+    now_iso = now_iso or datetime.now().isoformat()
+    qtxt = (item.get("question_text") or "").strip()
+    return {
+        "id": str(uuid.uuid4()),
+        "question_text": qtxt,
+        "text": qtxt,
+        "timestamp": item.get("timestamp", ""),
+        "speaker": item.get("speaker", "Onbekend"),
+        "party": item.get("party", ""),
+        "category": item.get("category", "Algemeen"),
+        "status": "Draft",
+        "draftAnswer": "",
+        "nextAction": "",
+        "personResponsible": "",
+        "createdAt": now_iso,
+        "updatedAt": now_iso
+    }
+
+def load_default_speakers() -> str:
+    """
+    The list of speakers from data/list_of_speakers, formatted as "Name (Party)" lines.
+    """
+    list_of_speakers = ""
+    try:
+        # Try to load the list_of_speakers from the default location
+        speakers_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))),
+                                   "data", "list_of_speakers", "list_of_speakers.csv")
+        if os.path.exists(speakers_path):
+            with open(speakers_path, 'r', encoding='utf-8') as f:
+                # Skip header
+                next(f)
+                # Format as Name (Party)
+                list_of_speakers = "\n".join([f"{line.split(',')[0]} ({line.split(',')[2].strip()})" for line in f if line.strip()])
+    except Exception as e:
+        print(f"Error loading list of speakers: {e}")
+        # Continue without the list of speakers
+    return list_of_speakers
+
+def build_extraction_prompt(transcript: str, categories_str: str, list_of_speakers: str, context: str = "") -> str:
+    """
+    The extraction prompt. `context` is earlier transcript that is shown for understanding only,
+    e.g. the tail of what was already processed during live extraction.
+    """
+    context_section = ""
+    if context:
+        context_section = f"""Context from earlier in the debate (questions in it have already been extracted; use it only to understand the transcript below):
+{context}
+
+"""
     # User message with the detailed prompt
-    user_message = f"""
+    return f"""
 Extract all questions directed to the minister from the following parliamentary debate transcript.
 In parliamentary debates, questions can be explicit (direct questions with question marks) or implicit (statements that clearly expect a ministerial response).
 
@@ -70,60 +277,142 @@ Return the result as a JSON array of objects with the following fields:
 Here is the list of people in the transcript, ordered by their set time to speak for a few minutes:
 {list_of_speakers}
 
-Transcript:
+{context_section}Transcript:
 {transcript}
 """
 
-    # Anthropic API client
-    client = anthropic.Client(api_key=ANTHROPIC_API_KEY)
-
-    # Use the Messages API
-    response = client.messages.create(
-        model="claude-3-7-sonnet-20250219",
-        max_tokens=4000,
-        messages=[
-            {"role": "user", "content": user_message}
-        ],
-        temperature=0,
-    )
-
+def extract_questions_from_window(client: anthropic.Client, transcript: str, categories_str: str,
+                                  list_of_speakers: str, context: str = "") -> List[Dict]:
+    """
+    One model call over (part of) a transcript; returns the raw extracted items.
+    """
+    with anthropic_call():
+        response = client.messages.create(
+            model=EXTRACTION_MODEL,
+            max_tokens=EXTRACTION_MAX_TOKENS,
+            messages=[
+                {"role": "user", "content": build_extraction_prompt(transcript, categories_str, list_of_speakers, context)}
+            ],
+            temperature=0,
+        )
     raw = response.content[0].text
-
-    # Attempt to parse as JSON
     try:
-        # Strip any markdown formatting that might be present
-        json_str = raw
-        if "```json" in raw:
-            json_str = raw.split("```json")[1].split("```")[0]
-        elif "```" in raw:
-            json_str = raw.split("```")[1].split("```")[0]
-
-        data = json.loads(json_str)
-    except Exception as e:
-        print(f"JSON parsing error: {e}")
+        return parse_question_array(raw)
+    except ValueError:
         print(f"Raw response: {raw}")
-        # Fallback to empty array
-        data = []
+        raise
+
+def _extraction_settings(categories: List[str], list_of_speakers: str) -> Tuple[str, str]:
+    if not ANTHROPIC_API_KEY:
+        raise Exception("No ANTHROPIC_API_KEY found in environment variables.")
+
+    if "Algemeen" not in categories:
+        categories.append("Algemeen")
+
+    # Read the list of speakers from CSV if not provided
+    if not list_of_speakers:
+        list_of_speakers = load_default_speakers()
+
+    return ", ".join(categories), list_of_speakers
+
+def extract_questions_from_transcript(transcript: str, categories: List[str], list_of_speakers: str = "") -> List[Dict]:
+    """
+    Use Anthropic (Claude) to parse the transcript and identify questions
+    that are DIRECTLY asked to the minister or implicit questions requiring answers.
+    Long transcripts are split into overlapping windows that are extracted concurrently and merged;
+    a failed window is logged and skipped, and only when every window fails is an error raised.
+    """
+    categories_str, list_of_speakers = _extraction_settings(categories, list_of_speakers)
+
+    # Shared, pooled Anthropic client
+    client = get_anthropic_client()
+
+    windows = split_transcript_windows(transcript)
+    if not windows:
+        return []
+
+    errors: List[Exception] = []
+
+    def run_window(window: str) -> Optional[List[Dict]]:
+        try:
+            return extract_questions_from_window(client, window, categories_str, list_of_speakers)
+        except Exception as e:
+            print(f"Question extraction failed for a transcript window: {e}")
+            errors.append(e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(EXTRACTION_CONCURRENCY, len(windows)))) as pool:
+        results = list(pool.map(run_window, windows))
+
+    succeeded = [items for items in results if items is not None]
+    if not succeeded:
+        raise Exception(f"Question extraction failed for all {len(windows)} transcript window(s): {errors[0]}")
+    if errors:
+        print(f"Question extraction: {len(errors)} of {len(windows)} window(s) failed, keeping the others.")
 
     now_iso = datetime.now().isoformat()
-    output = []
-    for item in data:
-        qid = str(uuid.uuid4())
-        qtxt = item.get("question_text", "").strip()
-        output.append({
-            "id": qid,
-            "question_text": qtxt,
-            "text": qtxt,
-            "timestamp": item.get("timestamp", ""),
-            "speaker": item.get("speaker", "Onbekend"),
-            "party": item.get("party", ""),
-            "category": item.get("category", "Algemeen"),
-            "status": "Draft",
-            "draftAnswer": "",
-            "nextAction": "",
-            "personResponsible": "",
-            "createdAt": now_iso,
-            "updatedAt": now_iso
-        })
-
-    return output
\ No newline at end of file
+    return merge_questions([[to_question_record(item, now_iso) for item in items] for items in succeeded])
+
+async def stream_questions_from_transcript(transcript: str, categories: List[str],
+                                           list_of_speakers: str = "") -> AsyncIterator[Dict]:
+    """
+    Streaming variant of extract_questions_from_transcript. Yields events as dicts { 'event', 'data' }:
+    - question: a new question record (with id) as soon as the model has completed its JSON object
+    - warning:  { 'detail' } when a transcript window failed; the other windows carry on
+    Windows are streamed concurrently, so questions arrive roughly but not strictly in timestamp order;
+    a question already yielded from an overlapping window is not yielded again.
+    """
+    categories_str, list_of_speakers = _extraction_settings(categories, list_of_speakers)
+    windows = split_transcript_windows(transcript)
+    if not windows:
+        return
+
+    client = get_async_anthropic_client()
+    queue: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max(1, EXTRACTION_CONCURRENCY))
+
+    async def run_window(window: str):
+        try:
+            async with semaphore:
+                parser = QuestionStreamParser()
+                with anthropic_call():
+                    async with client.messages.stream(
+                        model=EXTRACTION_MODEL,
+                        max_tokens=EXTRACTION_MAX_TOKENS,
+                        messages=[
+                            {"role": "user", "content": build_extraction_prompt(window, categories_str, list_of_speakers)}
+                        ],
+                        temperature=0,
+                    ) as stream:
+                        async for text in stream.text_stream:
+                            for item in parser.feed(text):
+                                await queue.put(("item", item))
+        except Exception as e:
+            await queue.put(("error", e))
+        finally:
+            await queue.put(("done", None))
+
+    tasks = [asyncio.create_task(run_window(window)) for window in windows]
+    emitted: List[Dict] = []
+    errors: List[Exception] = []
+    finished = 0
+    try:
+        while finished < len(tasks):
+            kind, value = await queue.get()
+            if kind == "done":
+                finished += 1
+            elif kind == "error":
+                print(f"Question extraction failed for a transcript window: {value}")
+                errors.append(value)
+                yield {"event": "warning", "data": {"detail": f"Extraction of part of the transcript failed: {value}"}}
+            else:
+                question = to_question_record(value)
+                if question["question_text"] and not any(is_duplicate_question(q, question) for q in emitted):
+                    emitted.append(question)
+                    yield {"event": "question", "data": question}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if len(errors) == len(windows):
+        raise Exception(f"Question extraction failed for all {len(windows)} transcript window(s): {errors[0]}")
@@ -1,60 +1,483 @@
 import os
 import json
+import sqlite3
+import time
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 
 BASE_DIR = Path(__file__).parent.parent.parent.parent.parent
 DATA_DIR = BASE_DIR / "data"
 TRANSCRIPTS_DIR = DATA_DIR / "transcripts"
 QUESTIONS_DIR = DATA_DIR / "questions"
 ANSWERS_DIR = DATA_DIR / "answers"
+UPLOADS_DIR = DATA_DIR / "uploads"
+RAW_TRANSCRIPTS_DIR = TRANSCRIPTS_DIR / "raw"
+DB_PATH = Path(os.environ.get("LLMINISTER_DB_PATH", DATA_DIR / "llminister.db"))
 
 TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
 QUESTIONS_DIR.mkdir(parents=True, exist_ok=True)
 ANSWERS_DIR.mkdir(parents=True, exist_ok=True)
+UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+RAW_TRANSCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
+
+def atomic_write_text(path: Path, text: str):
+    """
+    Write to a temporary file in the same directory, fsync it and rename it over `path`,
+    so readers see either the old or the new contents, never a truncated file.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
 
 def save_transcript_file(transcript_text: str, original_filename: str) -> str:
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     base = os.path.splitext(original_filename)[0]
     out_filename = f"{base}_transcript_{timestamp}.txt"
     out_path = TRANSCRIPTS_DIR / out_filename
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(transcript_text)
+    atomic_write_text(out_path, transcript_text)
     return str(out_path)
 
-def load_most_recent_questions_json() -> List[Dict]:
-    files = sorted(QUESTIONS_DIR.glob("questions_*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
-    if not files:
+# ----------------------------------------------------------------------
+# SQLite question store
+# ----------------------------------------------------------------------
+#
+# Every extraction run is a "session" (what used to be one questions_*.json file).
+# The full question dict is stored as JSON; id, session, status and category are
+# also kept in indexed columns so lookups and single-question updates don't
+# need to read or rewrite the rest of the session.
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+# Serialises writers within this process; SQLite's own lock covers other processes
+_write_lock = threading.Lock()
+
+
+class VersionConflictError(Exception):
+    """
+    Raised when a question was changed by someone else since the version the caller read.
+    """
+
+    def __init__(self, question: Dict):
+        super().__init__(f"Question {question['id']} has been modified (current version {question.get('version')}).")
+        self.question = question
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    source TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    status TEXT,
+    category TEXT,
+    updated_at TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_questions_session ON questions(session_id, position);
+CREATE INDEX IF NOT EXISTS idx_questions_status ON questions(status);
+CREATE INDEX IF NOT EXISTS idx_questions_category ON questions(category);
+CREATE INDEX IF NOT EXISTS idx_sessions_created ON sessions(created_at);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    data TEXT NOT NULL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_kind_status ON jobs(kind, status);
+CREATE TABLE IF NOT EXISTS transcripts (
+    sha256 TEXT PRIMARY KEY,
+    filename TEXT,
+    transcript_path TEXT NOT NULL,
+    raw_path TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+"""
+
+# Job states after which a job is never picked up again
+FINISHED_JOB_STATES = ("completed", "error")
+
+def _connection() -> sqlite3.Connection:
+    """
+    One connection per thread, in WAL mode so readers never wait for a writer.
+    """
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        _local.conn = conn
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.executescript(SCHEMA)
+                _upgrade_schema(conn)
+                migrate_json_questions(conn)
+                _schema_ready = True
+    return conn
+
+def _upgrade_schema(conn: sqlite3.Connection):
+    """
+    Add columns introduced after a database was first created.
+    """
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(questions)")}
+    if "version" not in columns:
+        conn.execute("ALTER TABLE questions ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    job_columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+    if "owner" not in job_columns:
+        conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+
+@contextmanager
+def _transaction():
+    """
+    Write transaction; BEGIN IMMEDIATE takes the write lock up front,
+    so a read-modify-write of a question cannot interleave with another writer.
+    """
+    conn = _connection()
+    with _write_lock:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+def _question_row(question: Dict, session_id: str, position: int) -> tuple:
+    question["version"] = question.get("version") or 1
+    return (
+        question["id"],
+        session_id,
+        position,
+        question.get("status"),
+        question.get("category"),
+        question.get("updatedAt"),
+        question["version"],
+        json.dumps(question, ensure_ascii=False),
+    )
+
+def _insert_session(conn: sqlite3.Connection, session_id: str, questions: List[Dict], source: str, created_at: str):
+    conn.execute("INSERT INTO sessions (id, source, created_at) VALUES (?, ?, ?)", (session_id, source, created_at))
+    conn.executemany(
+        "INSERT OR REPLACE INTO questions (id, session_id, position, status, category, updated_at, version, data) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [_question_row(q, session_id, i) for i, q in enumerate(questions)]
+    )
+
+def migrate_json_questions(conn: Optional[sqlite3.Connection] = None, force: bool = False) -> int:
+    """
+    Import the legacy data/questions/questions_*.json files, oldest first, one session per file.
+    Runs once automatically when the store is first opened; returns the number of files imported.
+    """
+    conn = conn or _connection()
+    done = conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+    if done and not force:
+        return 0
+
+    files = sorted(QUESTIONS_DIR.glob("questions_*.json"), key=lambda p: p.stat().st_mtime)
+    imported = 0
+    _write_lock.acquire()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for path in files:
+            if conn.execute("SELECT 1 FROM sessions WHERE id = ?", (path.stem,)).fetchone():
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    questions = json.load(f)
+            except Exception as e:
+                print(f"Skipping unreadable questions file {path.name}: {e}")
+                continue
+            created_at = datetime.fromtimestamp(path.stat().st_mtime).isoformat()
+            _insert_session(conn, path.stem, questions, str(path), created_at)
+            imported += 1
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                      (datetime.now().isoformat(),))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        _write_lock.release()
+    if imported:
+        print(f"Migrated {imported} questions file(s) into {DB_PATH.name}.")
+    return imported
+
+def latest_session_id() -> Optional[str]:
+    row = _connection().execute(
+        "SELECT id FROM sessions ORDER BY created_at DESC, rowid DESC LIMIT 1"
+    ).fetchone()
+    return row["id"] if row else None
+
+def create_question_session(questions: List[Dict], source: str = "") -> str:
+    """
+    Store a new set of extracted questions as a new session, which becomes the current one.
+    """
+    created = datetime.now()
+    session_id = f"questions_{created.strftime('%Y%m%d_%H%M%S_%f')}"
+    with _transaction() as conn:
+        _insert_session(conn, session_id, questions, source, created.isoformat())
+    return session_id
+
+def append_questions(session_id: str, questions: List[Dict]):
+    """
+    Add questions to the end of an existing session (e.g. during live extraction).
+    """
+    with _transaction() as conn:
+        last = conn.execute(
+            "SELECT COALESCE(MAX(position), -1) AS last FROM questions WHERE session_id = ?", (session_id,)
+        ).fetchone()["last"]
+        conn.executemany(
+            "INSERT OR REPLACE INTO questions (id, session_id, position, status, category, updated_at, version, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [_question_row(q, session_id, last + 1 + i) for i, q in enumerate(questions)]
+        )
+
+def load_questions(session_id: Optional[str] = None, status: Optional[str] = None,
+                   category: Optional[str] = None) -> List[Dict]:
+    """
+    Questions of a session (default: the most recent one), in extraction order,
+    optionally filtered on status and/or category.
+    """
+    session_id = session_id or latest_session_id()
+    if session_id is None:
         return []
-    path = files[0]
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    query = "SELECT data, version FROM questions WHERE session_id = ?"
+    params = [session_id]
+    if status is not None:
+        query += " AND status = ?"
+        params.append(status)
+    if category is not None:
+        query += " AND category = ?"
+        params.append(category)
+    query += " ORDER BY position"
+    return [_row_question(row) for row in _connection().execute(query, params)]
 
-def save_questions_json(questions: List[Dict], override: bool = False) -> str:
-    if override:
-        files = sorted(QUESTIONS_DIR.glob("questions_*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
-        if files:
-            target = files[0]
-            with open(target, "w", encoding="utf-8") as f:
-                json.dump(questions, f, indent=2, ensure_ascii=False)
-            return str(target)
+def _row_question(row: sqlite3.Row) -> Dict:
+    question = json.loads(row["data"])
+    question["version"] = row["version"]
+    return question
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    out_filename = f"questions_{timestamp}.json"
-    out_path = QUESTIONS_DIR / out_filename
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(questions, f, indent=2, ensure_ascii=False)
-    return str(out_path)
+def get_question(question_id: str) -> Optional[Dict]:
+    row = _connection().execute("SELECT data, version FROM questions WHERE id = ?", (question_id,)).fetchone()
+    return _row_question(row) if row else None
+
+def question_session_id(question_id: str) -> Optional[str]:
+    row = _connection().execute("SELECT session_id FROM questions WHERE id = ?", (question_id,)).fetchone()
+    return row["session_id"] if row else None
+
+def question_etag(question: Dict) -> str:
+    """
+    Strong ETag of a question version, for HTTP caching and If-Match.
+    """
+    return f'"{question["id"]}-{question.get("version", 1)}"'
+
+def update_question(question_id: str, apply: Callable[[Dict], None],
+                    expected_version: Optional[int] = None, bump_version: bool = True) -> Optional[Dict]:
+    """
+    Read-modify-write of a single question: `apply` mutates the question dict,
+    which is then written back with its version incremented; if `apply` returns False
+    nothing is written. Returns the updated question, or None if it does not exist.
+    With expected_version, raises VersionConflictError when the stored version differs.
+    bump_version=False keeps the version (and ETag) for bookkeeping fields the server sets
+    itself, so clients holding the question don't get a conflict on their next edit.
+    """
+    with _transaction() as conn:
+        row = conn.execute("SELECT data, version FROM questions WHERE id = ?", (question_id,)).fetchone()
+        if row is None:
+            return None
+        question = _row_question(row)
+        if expected_version is not None and question["version"] != expected_version:
+            raise VersionConflictError(question)
+        if apply(question) is False:
+            return question
+        question["version"] = row["version"] + 1 if bump_version else row["version"]
+        conn.execute(
+            "UPDATE questions SET status = ?, category = ?, updated_at = ?, version = ?, data = ? WHERE id = ?",
+            (question.get("status"), question.get("category"), question.get("updatedAt"),
+             question["version"], json.dumps(question, ensure_ascii=False), question_id)
+        )
+    return question
+
+def delete_question(question_id: str) -> bool:
+    with _transaction() as conn:
+        cursor = conn.execute("DELETE FROM questions WHERE id = ?", (question_id,))
+    return cursor.rowcount > 0
+
+# ----------------------------------------------------------------------
+# Background jobs
+# ----------------------------------------------------------------------
+
+def _row_job(row: sqlite3.Row) -> Dict:
+    job = json.loads(row["data"])
+    job.update(id=row["id"], kind=row["kind"], status=row["status"],
+               created_at=row["created_at"], updated_at=row["updated_at"])
+    return job
+
+def create_job(job_id: str, kind: str, data: Dict, status: str = "queued") -> Dict:
+    now = datetime.now().isoformat()
+    with _transaction() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, kind, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, status, now, now, json.dumps(data, ensure_ascii=False))
+        )
+    return get_job(job_id)
+
+def get_job(job_id: str) -> Optional[Dict]:
+    row = _connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_job(row) if row else None
+
+def update_job(job_id: str, status: Optional[str] = None, **fields) -> Optional[Dict]:
+    """
+    Merge `fields` into the job's data and optionally move it to a new status.
+    """
+    with _transaction() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = _row_job(row)
+        data = json.loads(row["data"])
+        data.update(fields)
+        job.update(fields)
+        job["status"] = status or row["status"]
+        job["updated_at"] = datetime.now().isoformat()
+        conn.execute(
+            "UPDATE jobs SET status = ?, updated_at = ?, data = ? WHERE id = ?",
+            (job["status"], job["updated_at"], json.dumps(data, ensure_ascii=False), job_id)
+        )
+    return job
+
+def claim_job(job_id: str, owner: str, lease_seconds: float) -> bool:
+    """
+    Take (or renew) the lease on an unfinished job for `owner`, e.g. one worker process.
+    Succeeds when nobody holds the job, `owner` already does, or the holder's lease has expired,
+    so with several processes each job is run by one of them.
+    """
+    now = time.time()
+    with _transaction() as conn:
+        cursor = conn.execute(
+            f"UPDATE jobs SET owner = ?, lease_until = ? WHERE id = ? "
+            f"AND status NOT IN ({', '.join('?' for _ in FINISHED_JOB_STATES)}) "
+            f"AND (owner IS NULL OR owner = ? OR lease_until < ?)",
+            (owner, now + lease_seconds, job_id, *FINISHED_JOB_STATES, owner, now)
+        )
+    return cursor.rowcount > 0
+
+def release_job(job_id: str, owner: str):
+    """
+    Give up the lease on a job, so another process can resume it right away.
+    """
+    with _transaction() as conn:
+        conn.execute("UPDATE jobs SET owner = NULL, lease_until = NULL WHERE id = ? AND owner = ?", (job_id, owner))
+
+def list_unfinished_jobs(kind: str) -> List[Dict]:
+    """
+    Jobs of a kind that were queued or running, oldest first; used to resume them after a restart.
+    """
+    placeholders = ", ".join("?" for _ in FINISHED_JOB_STATES)
+    rows = _connection().execute(
+        f"SELECT * FROM jobs WHERE kind = ? AND status NOT IN ({placeholders}) ORDER BY created_at",
+        (kind, *FINISHED_JOB_STATES)
+    )
+    return [_row_job(row) for row in rows]
+
+# ----------------------------------------------------------------------
+# Transcript index, keyed by the SHA-256 of the uploaded video
+# ----------------------------------------------------------------------
+
+def index_transcript(sha256: str, transcript_path: str, raw_result: Dict, filename: str = "") -> Dict:
+    """
+    Remember the transcript of a video, plus the provider's raw utterance JSON,
+    so a repeat upload of the same file can reuse it.
+    """
+    raw = {key: raw_result.get(key) for key in ("id", "text", "utterances", "audio_duration")}
+    raw_path = RAW_TRANSCRIPTS_DIR / f"{sha256}.json"
+    atomic_write_text(raw_path, json.dumps(raw, ensure_ascii=False))
+    entry = {
+        "sha256": sha256,
+        "filename": filename,
+        "transcript_path": str(transcript_path),
+        "raw_path": str(raw_path),
+        "created_at": datetime.now().isoformat()
+    }
+    with _transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO transcripts (sha256, filename, transcript_path, raw_path, created_at) "
+            "VALUES (:sha256, :filename, :transcript_path, :raw_path, :created_at)",
+            entry
+        )
+    return entry
+
+def find_transcript(sha256: str) -> Optional[Dict]:
+    """
+    Index entry for a video hash, or None. Entries whose files are gone are dropped.
+    """
+    row = _connection().execute("SELECT * FROM transcripts WHERE sha256 = ?", (sha256,)).fetchone()
+    if row is None:
+        return None
+    entry = dict(row)
+    if not (os.path.exists(entry["transcript_path"]) and os.path.exists(entry["raw_path"])):
+        with _transaction() as conn:
+            conn.execute("DELETE FROM transcripts WHERE sha256 = ?", (sha256,))
+        return None
+    return entry
+
+def load_raw_transcript(entry: Dict) -> Dict:
+    with open(entry["raw_path"], "r", encoding="utf-8") as f:
+        return json.load(f)
 
 def reset_data():
     """
-    Delete all files from transcripts, questions, and answers directories.
+    Delete all files from transcripts, questions, answers and uploads directories,
+    and all sessions, questions and finished jobs from the database.
+    Uploads that a queued or running job still needs are kept.
     """
+    with _transaction() as conn:
+        conn.execute("DELETE FROM questions")
+        conn.execute("DELETE FROM sessions")
+        conn.execute("DELETE FROM transcripts")
+        conn.execute(
+            f"DELETE FROM jobs WHERE status IN ({', '.join('?' for _ in FINISHED_JOB_STATES)})",
+            FINISHED_JOB_STATES
+        )
+        in_use = {json.loads(row["data"]).get("upload_path") for row in conn.execute("SELECT data FROM jobs")}
     if TRANSCRIPTS_DIR.exists():
         for f in TRANSCRIPTS_DIR.iterdir():
             if f.is_file():
                 f.unlink()
+    if RAW_TRANSCRIPTS_DIR.exists():
+        for f in RAW_TRANSCRIPTS_DIR.iterdir():
+            if f.is_file():
+                f.unlink()
     if QUESTIONS_DIR.exists():
         for f in QUESTIONS_DIR.iterdir():
             if f.is_file():
@@ -63,6 +486,10 @@ def reset_data():
         for f in ANSWERS_DIR.iterdir():
             if f.is_file():
                 f.unlink()
+    if UPLOADS_DIR.exists():
+        for f in UPLOADS_DIR.iterdir():
+            if f.is_file() and str(f) not in in_use:
+                f.unlink()
 
 def load_most_recent_transcript_file() -> str:
     files = sorted(TRANSCRIPTS_DIR.glob("*_transcript_*.txt"), key=lambda p: p.stat().st_mtime, reverse=True)
@@ -0,0 +1,301 @@
+import os
+import time
+import hashlib
+import uuid
+import random
+import asyncio
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .storage_service import (
+    UPLOADS_DIR,
+    FINISHED_JOB_STATES,
+    create_job,
+    get_job,
+    update_job,
+    list_unfinished_jobs,
+    claim_job,
+    save_transcript_file,
+    index_transcript
+)
+from .transcription_service import upload_file_to_assemblyai, submit_transcription_job, fetch_transcript, format_utterances
+from .executors import run_network, run_io
+from .job_leases import JOB_LEASE_SECONDS, PROCESS_OWNER, claim, hold_lease
+
+JOB_KIND = "transcription"
+
+# Largest accepted upload in bytes (0 = no limit), and the piece size it is copied to disk in
+TRANSCRIBE_MAX_UPLOAD_BYTES = int(os.environ.get("TRANSCRIBE_MAX_UPLOAD_BYTES", str(10 * 1024 ** 3)))
+SPOOL_CHUNK_BYTES = 1024 * 1024
+PROGRESS_INTERVAL_SECONDS = 2.0
+
+# Number of uploads/transcriptions handled at the same time; further jobs wait in the queue
+TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", "2"))
+
+# Polling of AssemblyAI: starts at the initial interval and backs off to the maximum
+TRANSCRIBE_POLL_INITIAL_SECONDS = float(os.environ.get("TRANSCRIBE_POLL_INITIAL_SECONDS", "3"))
+TRANSCRIBE_POLL_MAX_SECONDS = float(os.environ.get("TRANSCRIBE_POLL_MAX_SECONDS", "30"))
+TRANSCRIBE_POLL_BACKOFF = 1.5
+TRANSCRIBE_TIMEOUT_SECONDS = float(os.environ.get("TRANSCRIBE_TIMEOUT_SECONDS", "3600"))
+
+# Files in the uploads directory that no unfinished job uses are removed on start() once they
+# are this old (younger ones may still be spooling in another worker process)
+ORPHANED_UPLOAD_AGE_SECONDS = 600
+
+# Optional webhook: public base URL of this backend, and a shared secret AssemblyAI sends back
+TRANSCRIBE_WEBHOOK_BASE_URL = os.environ.get("TRANSCRIBE_WEBHOOK_BASE_URL", "")
+TRANSCRIBE_WEBHOOK_SECRET = os.environ.get("TRANSCRIBE_WEBHOOK_SECRET", "")
+WEBHOOK_AUTH_HEADER = "X-LLMinister-Webhook-Secret"
+WEBHOOK_PATH = "/webhooks/assemblyai"
+
+
+class UploadTooLargeError(Exception):
+    """
+    Raised when an upload exceeds TRANSCRIBE_MAX_UPLOAD_BYTES.
+    """
+
+
+def new_upload_path(filename: str) -> Tuple[str, Path]:
+    """
+    A fresh job id and the path its upload is kept at until the job finishes.
+    """
+    job_id = uuid.uuid4().hex
+    return job_id, UPLOADS_DIR / f"{job_id}{Path(filename).suffix.lower()}"
+
+async def spool_upload(upload, path: Path, max_bytes: int = TRANSCRIBE_MAX_UPLOAD_BYTES) -> Dict:
+    """
+    Copy an incoming upload (anything with an async read(size), e.g. UploadFile) to `path`
+    one chunk at a time, so the video is never held in memory as a whole.
+    Returns the SHA-256 of the content, plus the byte count and throughput of the copy.
+    """
+    tmp_path = path.with_name(path.name + ".part")
+    digest = hashlib.sha256()
+    received = 0
+    started = time.monotonic()
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = await upload.read(SPOOL_CHUNK_BYTES)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if max_bytes and received > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds the maximum of {max_bytes / 1e6:.0f} MB.")
+                digest.update(chunk)
+                await run_io(f.write, chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    elapsed = max(time.monotonic() - started, 1e-6)
+    return {
+        "sha256": digest.hexdigest(),
+        "upload_bytes": received,
+        "spool_seconds": round(elapsed, 2),
+        "spool_mb_per_s": round(received / 1e6 / elapsed, 2)
+    }
+
+def _progress_reporter(job_id: str, total: int):
+    """
+    on_progress callback that records the bytes sent to the provider, at most every few seconds.
+    """
+    last_report = 0.0
+
+    def report(sent: int):
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report >= PROGRESS_INTERVAL_SECONDS or sent == total:
+            last_report = now
+            update_job(job_id, provider_upload_bytes=sent)
+
+    return report
+
+def remove_upload(job: Optional[Dict]):
+    """
+    Delete a job's spooled video; called once the job is completed or has failed.
+    """
+    if job and job.get("upload_path"):
+        Path(job["upload_path"]).unlink(missing_ok=True)
+
+def remove_orphaned_uploads(jobs: List[Dict]) -> int:
+    """
+    Delete spooled uploads (and leftover .part files) that none of the given unfinished jobs uses.
+    Returns the number of files removed.
+    """
+    in_use = {Path(job["upload_path"]).name for job in jobs if job.get("upload_path")}
+    cutoff = time.time() - ORPHANED_UPLOAD_AGE_SECONDS
+    removed = 0
+    for path in UPLOADS_DIR.iterdir():
+        if path.is_file() and path.name not in in_use and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+class TranscriptionJobQueue:
+    """
+    Runs transcription jobs in the background on a fixed number of asyncio workers.
+    Jobs are persisted in the jobs table, so unfinished ones are picked up again on start();
+    a job that was already submitted to AssemblyAI resumes polling instead of uploading again.
+    A job is only run by the process that holds its lease, so with several worker processes
+    (or during a rolling restart) it is uploaded and submitted once.
+    """
+
+    def __init__(self, workers: int = TRANSCRIBE_WORKERS):
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeups: Dict[str, asyncio.Event] = {}
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        jobs = await run_io(list_unfinished_jobs, JOB_KIND)
+        removed = await run_io(remove_orphaned_uploads, jobs)
+        if removed:
+            print(f"Removed {removed} orphaned upload(s).")
+        for job in jobs:
+            if not await claim(job["id"]):
+                continue  # another process is running it
+            print(f"Resuming transcription job {job['id']} ({job['status']}).")
+            self._queue.put_nowait(job["id"])
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id: str, upload_path: Path, filename: str, **details) -> Dict:
+        """
+        Persist a new job for an already saved upload and queue it.
+        `details` (e.g. the spool statistics) are stored with the job.
+        """
+        job = create_job(job_id, JOB_KIND, {"filename": filename, "upload_path": str(upload_path), **details})
+        claim_job(job_id, PROCESS_OWNER, JOB_LEASE_SECONDS)
+        self._queue.put_nowait(job_id)
+        return job
+
+    def complete_from_index(self, job_id: str, filename: str, entry: Dict, **details) -> Dict:
+        """
+        Record a job that is answered from the transcript index, without calling the provider.
+        """
+        return create_job(job_id, JOB_KIND, {
+            "filename": filename,
+            "transcriptPath": entry["transcript_path"],
+            "deduplicated": True,
+            **details
+        }, status="completed")
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def notify(self, transcript_id: str) -> bool:
+        """
+        Wake up the worker polling `transcript_id` (called from the webhook).
+        Returns False when no job is currently waiting for it.
+        """
+        wakeup = self._wakeups.get(transcript_id)
+        if wakeup is None:
+            return False
+        wakeup.set()
+        return True
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Transcription job {job_id} failed: {e}")
+                job = await run_io(update_job, job_id, "error", error=str(e))
+                await run_io(remove_upload, job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await run_io(get_job, job_id)
+        if job is None or job["status"] in FINISHED_JOB_STATES:
+            return
+        if not await claim(job_id):
+            print(f"Transcription job {job_id} is run by another process.")
+            return
+        async with hold_lease(job_id):
+            await self._transcribe(job_id, job)
+
+    async def _transcribe(self, job_id: str, job: Dict):
+        transcript_id = job.get("transcript_id")
+        if not transcript_id:
+            await run_io(update_job, job_id, "uploading")
+            upload_path = job["upload_path"]
+            size = os.path.getsize(upload_path)
+            started = time.monotonic()
+            upload_url = await run_network(
+                upload_file_to_assemblyai, upload_path, on_progress=_progress_reporter(job_id, size)
+            )
+            elapsed = max(time.monotonic() - started, 1e-6)
+            await run_io(update_job, job_id, provider_upload_seconds=round(elapsed, 2),
+                         provider_upload_mb_per_s=round(size / 1e6 / elapsed, 2))
+            webhook_url, webhook_auth = _webhook_options()
+            transcript_id = await run_network(submit_transcription_job, upload_url, webhook_url, webhook_auth)
+            await run_io(update_job, job_id, "transcribing", transcript_id=transcript_id)
+
+        result = await self._wait_for_transcript(job_id, transcript_id)
+        transcript_text = format_utterances(result)
+        transcript_path = await run_io(save_transcript_file, transcript_text, job["filename"])
+        if job.get("sha256"):
+            await run_io(index_transcript, job["sha256"], transcript_path, result, job["filename"])
+        await run_io(update_job, job_id, "completed", transcriptPath=transcript_path)
+        await run_io(remove_upload, job)
+
+    async def _wait_for_transcript(self, job_id: str, transcript_id: str) -> Dict:
+        """
+        Poll with jittered exponential backoff without blocking the event loop.
+        A webhook call for this transcript cuts the current wait short.
+        """
+        deadline = time.monotonic() + TRANSCRIBE_TIMEOUT_SECONDS
+        delay = TRANSCRIBE_POLL_INITIAL_SECONDS
+        wakeup = self._wakeups.setdefault(transcript_id, asyncio.Event())
+        try:
+            polls = 0
+            while True:
+                wakeup.clear()
+                result = await run_network(fetch_transcript, transcript_id)
+                polls += 1
+                status = result["status"]
+                if status == "completed":
+                    return result
+                if status == "error":
+                    raise Exception(f"Transcription error: {result.get('error')}")
+                await run_io(update_job, job_id, assemblyai_status=status, polls=polls)
+
+                if time.monotonic() + delay > deadline:
+                    raise Exception("Transcription timed out.")
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=delay * random.uniform(0.8, 1.2))
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * TRANSCRIBE_POLL_BACKOFF, TRANSCRIBE_POLL_MAX_SECONDS)
+        finally:
+            self._wakeups.pop(transcript_id, None)
+
+
+def _webhook_options() -> Tuple[Optional[str], Optional[Tuple[str, str]]]:
+    if not TRANSCRIBE_WEBHOOK_BASE_URL:
+        return None, None
+    webhook_url = TRANSCRIBE_WEBHOOK_BASE_URL.rstrip("/") + WEBHOOK_PATH
+    webhook_auth = (WEBHOOK_AUTH_HEADER, TRANSCRIBE_WEBHOOK_SECRET) if TRANSCRIBE_WEBHOOK_SECRET else None
+    return webhook_url, webhook_auth
+
+
+_job_queue = None
+
+def get_transcription_queue() -> TranscriptionJobQueue:
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = TranscriptionJobQueue()
+    return _job_queue
@@ -1,9 +1,14 @@
 import time
 import os
-import requests
+from typing import Callable, Iterator, Optional, Tuple
+
+from .provider_clients import get_assemblyai_client
 
 ASSEMBLYAI_API_KEY = os.environ.get("ASSEMBLYAI_API_KEY")  # set in .env / environment
 
+# Size of the pieces a video is streamed to AssemblyAI in
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_BYTES", str(4 * 1024 * 1024)))
+
 def transcribe_video_file(file_bytes: bytes, filename: str) -> str:
     """
     Upload video to AssemblyAI (or alternative),
@@ -29,44 +34,77 @@ def transcribe_video_file(file_bytes: bytes, filename: str) -> str:
 
 def upload_to_assemblyai(file_bytes: bytes) -> str:
     print("Uploading file to AssemblyAI...")
-    url = "https://api.assemblyai.com/v2/upload"
-    headers = {"authorization": ASSEMBLYAI_API_KEY}
-    resp = requests.post(url, headers=headers, data=file_bytes)
+    resp = get_assemblyai_client().request("POST", "/upload", data=file_bytes)
     if resp.status_code != 200:
         raise Exception(f"Error uploading to AssemblyAI: {resp.text}")
     return resp.json()["upload_url"]
 
-def submit_transcription_job(upload_url: str) -> str:
+def _iter_file(path: str, chunk_size: int, on_progress: Optional[Callable[[int], None]] = None) -> Iterator[bytes]:
+    sent = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            sent += len(chunk)
+            if on_progress:
+                on_progress(sent)
+            yield chunk
+
+def upload_file_to_assemblyai(path: str, chunk_size: int = UPLOAD_CHUNK_BYTES,
+                              on_progress: Optional[Callable[[int], None]] = None) -> str:
+    """
+    Stream a file to AssemblyAI as a chunked request body, so memory use stays at one chunk
+    regardless of the video size. on_progress receives the number of bytes sent so far.
+    """
+    size = os.path.getsize(path)
+    print(f"Uploading {size / 1e6:.1f} MB to AssemblyAI...")
+    started = time.monotonic()
+    # A new reader per attempt, so a retried upload starts from the beginning of the file
+    resp = get_assemblyai_client().request("POST", "/upload", data=lambda: _iter_file(path, chunk_size, on_progress))
+    if resp.status_code != 200:
+        raise Exception(f"Error uploading to AssemblyAI: {resp.text}")
+    elapsed = max(time.monotonic() - started, 1e-6)
+    print(f"Uploaded {size / 1e6:.1f} MB in {elapsed:.1f}s ({size / 1e6 / elapsed:.1f} MB/s).")
+    return resp.json()["upload_url"]
+
+def submit_transcription_job(upload_url: str, webhook_url: Optional[str] = None,
+                             webhook_auth: Optional[Tuple[str, str]] = None) -> str:
+    """
+    Start a transcription. With webhook_url AssemblyAI calls it when the job finishes;
+    webhook_auth is an optional (header name, value) pair it sends along.
+    """
     print("Submitting transcription job to AssemblyAI...")
-    endpoint = "https://api.assemblyai.com/v2/transcript"
-    headers = {
-        "authorization": ASSEMBLYAI_API_KEY,
-        "content-type": "application/json"
-    }
     data = {
         "audio_url": upload_url,
         "language_code": "nl",
         "speaker_labels": True
     }
-    r = requests.post(endpoint, json=data, headers=headers)
+    if webhook_url:
+        data["webhook_url"] = webhook_url
+        if webhook_auth:
+            data["webhook_auth_header_name"], data["webhook_auth_header_value"] = webhook_auth
+    r = get_assemblyai_client().request("POST", "/transcript", json=data)
     if r.status_code != 200:
         raise Exception(f"Failed to create transcript job: {r.text}")
     return r.json()["id"]
 
+def fetch_transcript(transcript_id: str) -> dict:
+    """
+    Fetch the current state of a transcription job once.
+    """
+    resp = get_assemblyai_client().request("GET", f"/transcript/{transcript_id}")
+    if resp.status_code != 200:
+        raise Exception(f"Error polling transcript job: {resp.text}")
+    return resp.json()
+
 def poll_transcription_job(transcript_id: str, max_tries=60):
     """
     Poll every 5 seconds until the transcript is completed or max tries.
+    Blocking; the API uses the background jobs in transcription_jobs instead.
     """
-    import time
-    endpoint = f"https://api.assemblyai.com/v2/transcript/{transcript_id}"
-    headers = {"authorization": ASSEMBLYAI_API_KEY}
-
     for attempt in range(max_tries):
-        resp = requests.get(endpoint, headers=headers)
-        if resp.status_code != 200:
-            raise Exception(f"Error polling transcript job: {resp.text}")
-
-        data = resp.json()
+        data = fetch_transcript(transcript_id)
         status = data["status"]
         if status == "completed":
             return data
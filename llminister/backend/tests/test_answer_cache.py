@@ -0,0 +1,33 @@
+import json
+import threading
+
+from src.services.answer_generation import AnswerCache
+
+
+def test_cache_survives_a_restart(tmp_path):
+    AnswerCache(tmp_path, max_entries=4).put("k", {"answer_text": "Ja."})
+
+    cache = AnswerCache(tmp_path, max_entries=4)
+    assert cache.get("k") == {"answer_text": "Ja."}
+    assert cache.get("other") is None
+    assert (cache.disk_hits, cache.misses) == (1, 1)
+
+
+def test_concurrent_puts_of_one_key(tmp_path, capsys):
+    cache = AnswerCache(tmp_path, max_entries=4)
+
+    def put(n):
+        for i in range(50):
+            cache.put("k", {"answer_text": f"writer {n}, write {i}", "padding": "x" * 10000})
+
+    threads = [threading.Thread(target=put, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # put() reports a failed write instead of raising
+    assert "Failed to write" not in capsys.readouterr().out
+    # One complete entry is left, and no temporary files
+    assert [p.name for p in tmp_path.iterdir()] == ["answer_k.json"]
+    assert json.loads((tmp_path / "answer_k.json").read_text(encoding="utf-8"))["answer_text"].startswith("writer")
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from src.services import answer_engine
+from src.services.answer_engine import AnswerJob, RateLimiter, generate_answers_concurrently
+
+
+class RateLimited(Exception):
+    status_code = 429
+    response = None
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RateLimiter(0, 0)  # no limits, but every acquired attempt is recorded
+    monkeypatch.setattr(answer_engine, "_rate_limiter", limiter)
+    monkeypatch.setattr(answer_engine, "BACKOFF_BASE_SECONDS", 0.001)
+    return limiter
+
+
+def test_engine_is_the_only_retry_layer(monkeypatch, limiter):
+    calls = []
+
+    def fake_generate(question_text, **kwargs):
+        calls.append(kwargs)
+        if len(calls) < 3:
+            raise RateLimited("rate limited")
+        return {"answer_text": f"Antwoord op {question_text}"}
+
+    monkeypatch.setattr(answer_engine, "generate_rag_answer", fake_generate)
+    results = asyncio.run(generate_answers_concurrently([AnswerJob("q1", "Vraag?")]))
+
+    assert results[0].draft == {"answer_text": "Antwoord op Vraag?"}
+    assert results[0].attempts == 3
+    # The SDK does not retry underneath, and every attempt went through the rate limiter
+    assert all(kwargs["max_retries"] == 0 for kwargs in calls)
+    assert len(limiter._events) == 3
+
+
+def test_non_retryable_errors_fail_the_job_only(monkeypatch, limiter):
+    def fake_generate(question_text, **kwargs):
+        if question_text == "kapot":
+            raise ValueError("invalid request")
+        return {"answer_text": "ok"}
+
+    monkeypatch.setattr(answer_engine, "generate_rag_answer", fake_generate)
+    results = asyncio.run(generate_answers_concurrently([AnswerJob("a", "kapot"), AnswerJob("b", "heel")]))
+
+    assert results[0].draft is None and results[0].attempts == 1 and "invalid request" in results[0].error
+    assert results[1].draft == {"answer_text": "ok"}
@@ -0,0 +1,166 @@
+import random
+import asyncio
+
+import pytest
+
+from src.services import answer_generation
+from src.services.answer_generation import AnswerCache, CitationStreamParser, pack_context, parse_answer
+
+SOURCES = [
+    {"id": "source-1", "title": "wet.pdf", "page": 1, "file_path": "wet.pdf"},
+    {"id": "source-2", "title": "begroting.pdf", "page": 12, "file_path": "begroting.pdf"}
+]
+
+ANSWER = (
+    "De wet wordt in 2025 geëvalueerd.[source-1] Het adviescollege kost 2,1 miljoen euro per jaar. "
+    "[source-2][source-1] Dat bedrag staat in de begroting![source-2]\n\n"
+    "Is een evaluatie eerder mogelijk? Nee, pas na drie jaar.[source-1]"
+)
+
+
+def _splits(text: str):
+    """
+    The same text cut into tokens in different ways, including cuts inside every citation.
+    """
+    yield [text]
+    yield list(text)
+    for size in (2, 3, 7):
+        yield [text[i:i + size] for i in range(0, len(text), size)]
+    rng = random.Random(0)
+    for _ in range(20):
+        cuts = sorted(rng.sample(range(1, len(text)), 12))
+        yield [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+def _parse_streamed(tokens):
+    parser = CitationStreamParser(SOURCES)
+    sentences = []
+    for token in tokens:
+        sentences.extend(parser.feed(token))
+    return sentences + parser.close()
+
+
+@pytest.mark.parametrize("tokens", list(_splits(ANSWER)))
+def test_stream_parser_matches_parse_answer(tokens):
+    assert _parse_streamed(tokens) == parse_answer(ANSWER, SOURCES)["sentences"]
+
+
+def test_sentence_is_held_back_while_another_citation_may_follow():
+    parser = CitationStreamParser(SOURCES)
+    assert parser.feed("Het kost 2 miljoen.[source-2]") == []
+    assert parser.feed("[source-") == []
+    # Text that can't be a citation closes the sentence
+    assert parser.feed("1] Verder") == [
+        {"text": "Het kost 2 miljoen.", "citations": [
+            {"source_id": "source-2", "title": "begroting.pdf", "page": 12},
+            {"source_id": "source-1", "title": "wet.pdf", "page": 1}
+        ]}
+    ]
+    assert parser.feed(" geen.[source-2]") == []
+    assert parser.close() == [
+        {"text": "Verder geen.", "citations": [{"source_id": "source-2", "title": "begroting.pdf", "page": 12}]}
+    ]
+
+
+class FakeStream:
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for token in self.tokens:
+            yield token
+
+
+class FakeAsyncClient:
+    def __init__(self, tokens):
+        self.messages = self
+        self.tokens = tokens
+
+    def stream(self, **kwargs):
+        return FakeStream(self.tokens)
+
+
+@pytest.mark.parametrize("tokens", [[ANSWER], list(ANSWER), list(_splits(ANSWER))[-1]])
+def test_streamed_sentences_match_the_final_answer(tokens, monkeypatch, tmp_path):
+    monkeypatch.setattr(answer_generation, "ANTHROPIC_API_KEY", "key")
+    monkeypatch.setattr(answer_generation, "get_async_anthropic_client", lambda: FakeAsyncClient(tokens))
+    monkeypatch.setattr(answer_generation, "_answer_cache", AnswerCache(tmp_path, max_entries=4))
+    docs = [
+        {"source": source["title"], "page": source["page"], "file_path": source["file_path"],
+         "similarity_score": 1.0 - i / 10, "content": f"Inhoud van {source['title']}."}
+        for i, source in enumerate(SOURCES)
+    ]
+
+    async def collect():
+        return [event async for event in answer_generation.stream_rag_answer(
+            "Wanneer wordt de wet geëvalueerd?", retrieved_docs=docs, use_cache=False)]
+
+    events = asyncio.run(collect())
+
+    tokens_seen = "".join(e["data"]["text"] for e in events if e["event"] == "token")
+    sentences = [e["data"] for e in events if e["event"] == "sentence"]
+    answer = events[-1]
+    assert tokens_seen == ANSWER
+    assert answer["event"] == "answer"
+    assert sentences == answer["data"]["sentences"] == parse_answer(ANSWER, answer["data"]["sources"])["sentences"]
+    assert [s["text"] for s in sentences][-1] == "Is een evaluatie eerder mogelijk? Nee, pas na drie jaar."
+
+
+def _doc(source: str, score: float, content: str):
+    return {"source": source, "page": 1, "file_path": source, "similarity_score": score, "content": content}
+
+
+FILLER = " ".join(f"Zin {i} gaat over iets anders dan de vraag." for i in range(40))
+
+
+def test_pack_context_respects_the_budget():
+    docs = [_doc(f"doc{i}.pdf", 0.5, FILLER.replace("Zin", f"Regel{i}")) for i in range(6)]
+    for budget in (50, 200, 1000):
+        packed = pack_context("Wanneer wordt de wet geëvalueerd?", docs, budget=budget)
+        assert packed and sum(doc["tokens"] for doc in packed) <= budget
+
+
+def test_pack_context_takes_higher_scoring_pages_first():
+    low = _doc("laag.pdf", 0.2, "De begroting is vorig jaar vastgesteld door de Kamer.")
+    high = _doc("hoog.pdf", 0.9, "De wet wordt in 2025 geëvalueerd door het ministerie.")
+    assert [d["source"] for d in pack_context("vraag", [low, high])] == ["hoog.pdf", "laag.pdf"]
+
+    # With room for one page only, the better one is kept (each sentence also reserves room for a separator)
+    budget = pack_context("vraag", [high])[0]["tokens"] + 5
+    assert [d["source"] for d in pack_context("vraag", [low, high], budget=budget)] == ["hoog.pdf"]
+
+
+def test_pack_context_trims_a_page_that_does_not_fit():
+    relevant = "De evaluatie van de wet volgt in 2025."
+    page = _doc("lang.pdf", 0.9, FILLER + " " + relevant + " " + FILLER)
+    packed = pack_context("Wanneer volgt de evaluatie van de wet?", [page], budget=60)
+
+    # The page is cut down to the sentences that match the question best instead of being dropped
+    assert len(packed) == 1 and packed[0]["tokens"] <= 60
+    assert relevant in packed[0]["content"]
+    assert len(packed[0]["content"]) < len(page["content"])
+
+
+def test_pack_context_skips_a_page_without_a_sentence_that_fits():
+    # A single sentence larger than what is left is skipped; a smaller, lower scoring page still gets in
+    huge = _doc("groot.pdf", 0.9, "woord " * 150)
+    small = _doc("klein.pdf", 0.1, "De wet wordt in 2025 geëvalueerd.")
+    packed = pack_context("vraag", [huge, small], budget=40)
+    assert [d["source"] for d in packed] == ["klein.pdf"]
+    assert packed[0]["content"] == small["content"]
+
+
+def test_pack_context_drops_repeated_sentences():
+    sentence = "De wet wordt in 2025 geëvalueerd."
+    first = _doc("a.pdf", 0.9, sentence + " Het college kost 2 miljoen.")
+    second = _doc("b.pdf", 0.5, sentence)
+    packed = pack_context("vraag", [first, second])
+    assert [d["source"] for d in packed] == ["a.pdf"]
+    assert packed[0]["content"] == first["content"]
@@ -0,0 +1,30 @@
+import os
+import asyncio
+
+import pytest
+
+from src.services.executors import InstrumentedPool
+
+
+def _fail():
+    raise ValueError("broken page")
+
+
+def test_process_pool_runs_calls_in_another_process():
+    pool = InstrumentedPool("test", max_workers=2, processes=True)
+
+    async def run():
+        pids = await asyncio.gather(*(pool.run(os.getpid) for _ in range(4)))
+        with pytest.raises(ValueError):
+            await pool.run(_fail)
+        return pids
+
+    try:
+        pids = asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+    assert os.getpid() not in pids
+    stats = pool.stats()
+    assert stats["completed"] == 5 and stats["failed"] == 1
+    assert stats["queued"] == 0 and stats["active"] == 0
@@ -0,0 +1,117 @@
+from src.services.knowledgebase import KnowledgeBase
+
+ZORG_PAGES = [
+    "De wachtlijsten in de jeugdzorg zijn te lang volgens de inspectie.",
+    "Gemeenten krijgen extra budget voor jeugdzorg en wijkteams."
+]
+ENERGIE_PAGES = [
+    "De kerncentrale in Borssele blijft langer open.",
+    "Windparken op zee leveren steeds meer stroom."
+]
+
+
+def _write_corpus(pdf_dir, make_pdf):
+    make_pdf(pdf_dir / "zorg.pdf", ZORG_PAGES)
+    make_pdf(pdf_dir / "energie.pdf", ENERGIE_PAGES)
+
+
+def test_build_and_search(tmp_path, make_pdf):
+    _write_corpus(tmp_path / "pdfs", make_pdf)
+    kb = KnowledgeBase(pdf_dir=str(tmp_path / "pdfs"), cache_dir=str(tmp_path / "cache"))
+
+    assert kb.is_ready
+    assert len(kb.documents) == 4
+
+    results = kb.search("kerncentrale Borssele", top_k=2)
+    assert (results[0]["source"], results[0]["page"]) == ("energie.pdf", 1)
+    assert "Borssele" in results[0]["content"]
+
+    passages = kb.search_passages("wachtlijsten jeugdzorg", top_k=2)
+    assert (passages[0]["source"], passages[0]["page"]) == ("zorg.pdf", 1)
+    assert passages[0]["passages"]
+
+
+def test_stop_words_are_not_indexed(tmp_path, make_pdf):
+    _write_corpus(tmp_path / "pdfs", make_pdf)
+    kb = KnowledgeBase(pdf_dir=str(tmp_path / "pdfs"), cache_dir=str(tmp_path / "cache"))
+
+    vocabulary = kb._vectorizer.vocabulary_
+    assert "jeugdzorg" in vocabulary
+    assert "de" not in vocabulary and "het" not in vocabulary
+
+
+def test_index_cache_is_reused(tmp_path, make_pdf):
+    _write_corpus(tmp_path / "pdfs", make_pdf)
+    built = KnowledgeBase(pdf_dir=str(tmp_path / "pdfs"), cache_dir=str(tmp_path / "cache"))
+    cached = KnowledgeBase(pdf_dir=str(tmp_path / "pdfs"), cache_dir=str(tmp_path / "cache"))
+
+    assert not built.loaded_from_cache
+    assert cached.loaded_from_cache
+    assert [d["content"] for d in cached.documents] == [d["content"] for d in built.documents]
+    query = "extra budget voor wijkteams"
+    assert [(r["source"], r["page"], round(r["similarity_score"], 6)) for r in cached.search(query)] == \
+        [(r["source"], r["page"], round(r["similarity_score"], 6)) for r in built.search(query)]
+
+
+def test_index_cache_is_rebuilt_when_a_pdf_changes(tmp_path, make_pdf):
+    _write_corpus(tmp_path / "pdfs", make_pdf)
+    KnowledgeBase(pdf_dir=str(tmp_path / "pdfs"), cache_dir=str(tmp_path / "cache"))
+
+    make_pdf(tmp_path / "pdfs" / "energie.pdf", ["Zonnepanelen op daken van scholen."])
+    kb = KnowledgeBase(pdf_dir=str(tmp_path / "pdfs"), cache_dir=str(tmp_path / "cache"))
+
+    assert not kb.loaded_from_cache
+    assert kb.search("zonnepanelen scholen", top_k=1)[0]["source"] == "energie.pdf"
+    assert len(kb.documents) == 3
+
+
+def _scores(kb, query):
+    return [(r["source"], r["page"], round(r["similarity_score"], 6)) for r in kb.search(query, top_k=4)]
+
+
+def _assert_same_index(kb, rebuilt):
+    # Terms of removed pages stay in the vocabulary with no documents, so they never score
+    vocabulary, df = kb._vectorizer.vocabulary_, kb._snapshot.df
+    assert set(rebuilt._vectorizer.vocabulary_) == {term for term, i in vocabulary.items() if df[i] > 0}
+    idf = {term: kb._vectorizer.idf_[i] for term, i in kb._vectorizer.vocabulary_.items()}
+    for term, i in rebuilt._vectorizer.vocabulary_.items():
+        assert abs(idf[term] - rebuilt._vectorizer.idf_[i]) < 1e-9
+    for query in ("jeugdzorg budget", "kerncentrale stroom", "zonnepanelen scholen"):
+        assert _scores(kb, query) == _scores(rebuilt, query)
+
+
+def test_incremental_add_matches_a_full_rebuild(tmp_path, make_pdf):
+    _write_corpus(tmp_path / "pdfs", make_pdf)
+    kb = KnowledgeBase(pdf_dir=str(tmp_path / "pdfs"), cache_dir=str(tmp_path / "cache"))
+
+    new_pdf = make_pdf(tmp_path / "upload" / "zon.pdf", ["Zonnepanelen op daken van scholen en budget."])
+    kb.add_pdf(str(new_pdf))
+    rebuilt = KnowledgeBase(pdf_dir=str(tmp_path / "pdfs"), cache_dir=str(tmp_path / "rebuilt-cache"))
+
+    assert len(kb.documents) == len(rebuilt.documents) == 5
+    _assert_same_index(kb, rebuilt)
+
+
+def test_incremental_remove_matches_a_full_rebuild(tmp_path, make_pdf):
+    _write_corpus(tmp_path / "pdfs", make_pdf)
+    make_pdf(tmp_path / "pdfs" / "zon.pdf", ["Zonnepanelen op daken van scholen en budget."])
+    kb = KnowledgeBase(pdf_dir=str(tmp_path / "pdfs"), cache_dir=str(tmp_path / "cache"))
+
+    kb.remove_source("energie.pdf", delete_file=True)
+    rebuilt = KnowledgeBase(pdf_dir=str(tmp_path / "pdfs"), cache_dir=str(tmp_path / "rebuilt-cache"))
+
+    assert kb._snapshot.df[kb._vectorizer.vocabulary_["kerncentrale"]] == 0
+    assert len(kb.documents) == len(rebuilt.documents) == 3
+    _assert_same_index(kb, rebuilt)
+
+
+def test_sync_ignores_unfinished_uploads(tmp_path, make_pdf):
+    _write_corpus(tmp_path / "pdfs", make_pdf)
+    kb = KnowledgeBase(pdf_dir=str(tmp_path / "pdfs"), cache_dir=str(tmp_path / "cache"))
+
+    # What /admin/knowledge writes before moving the file into place
+    (tmp_path / "pdfs" / ".zon.pdf.0123.upload").write_bytes(b"%PDF-1.4 half")
+    result = kb.sync()
+
+    assert result["added"] == [] and result["failed"] == []
+    assert len(kb.documents) == 4
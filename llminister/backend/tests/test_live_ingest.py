@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from src.services import live_ingest
+from src.services.live_ingest import LiveSession
+from src.services.storage_service import create_question_session, load_questions
+
+UTTERANCES = "\n\n".join([
+    "[00:01:00] Jansen: Wanneer komt de evaluatie van de wet?",
+    "[00:02:00] De Vries: Hoeveel kost het adviescollege per jaar?"
+])
+
+
+class ProviderError(Exception):
+    pass
+
+
+@pytest.fixture
+def extraction(monkeypatch):
+    """
+    Fake model that fails the first `failures` calls and then returns a question for every utterance.
+    """
+    state = {"failures": 0, "calls": 0}
+
+    def extract(client, new_text, categories_str, list_of_speakers, context):
+        state["calls"] += 1
+        if state["calls"] <= state["failures"]:
+            raise ProviderError("529 overloaded")
+        return [{"timestamp": u[1:9], "speaker": u[11:u.index(":", 11)], "question_text": u[u.index(": ") + 2:]}
+                for u in live_ingest.split_utterances(new_text)]
+
+    monkeypatch.setattr(live_ingest, "extract_questions_from_window", extract)
+    monkeypatch.setattr(live_ingest, "get_anthropic_client", lambda: None)
+    monkeypatch.setattr(live_ingest, "retrieve_context_many", lambda texts: [[] for _ in texts])
+    monkeypatch.setattr(live_ingest, "assign_clusters", lambda session_id: None)
+    monkeypatch.setattr(live_ingest, "retry_delay", lambda attempt: 0)
+    return state
+
+
+def _run_session(text: str) -> LiveSession:
+    async def run():
+        session = LiveSession(create_question_session([], source="test"), ["Algemeen"], list_of_speakers="-")
+        session.ingest(text, flush=True)
+        await session.finish()
+        return session
+    return asyncio.run(run())
+
+
+def test_failed_extraction_is_retried(extraction):
+    extraction["failures"] = live_ingest.LIVE_MAX_ATTEMPTS - 1
+    session = _run_session(UTTERANCES)
+
+    status = session.status()
+    assert [q["speaker"] for q in load_questions(session.session_id)] == ["Jansen", "De Vries"]
+    assert status["processedUtterances"] == 2 and status["failedRanges"] == []
+    assert len(status["errors"]) == live_ingest.LIVE_MAX_ATTEMPTS - 1
+
+
+def test_utterances_are_given_up_after_the_last_attempt(extraction):
+    extraction["failures"] = live_ingest.LIVE_MAX_ATTEMPTS
+    session = _run_session(UTTERANCES)
+
+    status = session.status()
+    assert load_questions(session.session_id) == []
+    assert extraction["calls"] == live_ingest.LIVE_MAX_ATTEMPTS
+    # The lost utterances show up in the status; the next utterances start with fresh attempts
+    assert status["failedRanges"] == [[0, 2]] and status["processedUtterances"] == 2
+    assert status["failedAttempts"] == 0
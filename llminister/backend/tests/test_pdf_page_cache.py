@@ -0,0 +1,75 @@
+import os
+import time
+import asyncio
+
+import pytest
+
+from src.services import pdf_page_cache
+from src.services.pdf_page_cache import PdfPageCache, PageOutOfRangeError, page_etag, _split_page
+
+
+def test_pages_are_generated_once(tmp_path, make_pdf):
+    pdf = make_pdf(tmp_path / "doc.pdf", ["Pagina een.", "Pagina twee."])
+    cache = PdfPageCache(tmp_path / "cache", max_bytes=10 ** 6)
+
+    async def fetch():
+        # Concurrent requests for the same page share one computation
+        first = await asyncio.gather(*(cache.get(str(pdf), 2) for _ in range(4)))
+        hits = cache.hits
+        again = await cache.get(str(pdf), 2)
+        return first, again, cache.hits - hits
+
+    first, again, new_hits = asyncio.run(fetch())
+
+    assert len(set(first)) == 1 and first[0] == again and again.exists()
+    assert cache.misses == 1 and new_hits == 1
+    with pytest.raises(PageOutOfRangeError):
+        asyncio.run(cache.get(str(pdf), 3))
+
+
+def test_eviction_skips_pages_in_flight(tmp_path, make_pdf):
+    pdf = make_pdf(tmp_path / "doc.pdf", ["Een.", "Twee.", "Drie."])
+    cache = PdfPageCache(tmp_path / "cache", max_bytes=1)
+
+    def cached_file(page: int, age: int):
+        path = cache.cache_dir / (page_etag(str(pdf), page).strip('"') + ".pdf")
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (age, age))
+        cache._total_bytes += 100
+        return path
+
+    in_flight, idle = cached_file(1, age=1000), cached_file(2, age=2000)
+    # Page 1 was written by its generator but its requests have not been answered yet
+    cache._in_flight[page_etag(str(pdf), 1)] = object()
+
+    new_file = cached_file(3, age=3000)
+    cache._total_bytes -= 100  # _account adds the new file itself
+    cache._account(new_file)
+
+    assert in_flight.exists() and new_file.exists()
+    assert not idle.exists()
+
+
+def _slow_split_page(pdf_path, page, out_path):
+    time.sleep(0.2)
+    _split_page(pdf_path, page, out_path)
+
+
+def test_cancelled_requester_does_not_abort_the_others(tmp_path, make_pdf, monkeypatch):
+    monkeypatch.setattr(pdf_page_cache, "_split_page", _slow_split_page)
+    pdf = make_pdf(tmp_path / "doc.pdf", ["Pagina een."])
+    cache = PdfPageCache(tmp_path / "cache", max_bytes=10 ** 6)
+
+    async def fetch():
+        first = asyncio.create_task(cache.get(str(pdf), 1))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(cache.get(str(pdf), 1))
+        await asyncio.sleep(0.05)
+        # The client that started the generation disconnects
+        first.cancel()
+        return await second, first
+
+    path, first = asyncio.run(fetch())
+
+    assert first.cancelled()
+    assert path.exists() and cache.misses == 1
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from src.services import answer_engine, pipeline
+from src.services.answer_engine import RateLimiter
+from src.services.pipeline import PipelineRunner
+from src.services.storage_service import create_question_session, get_job, load_questions, claim_job, update_job
+
+QUESTIONS = [
+    {"id": f"q{i}", "timestamp": f"00:0{i}:00", "speaker": f"Spreker {i}", "question_text": f"Vraag nummer {i}?"}
+    for i in range(5)
+]
+
+
+@pytest.fixture
+def stages(monkeypatch, tmp_path):
+    """
+    Fake extraction, retrieval and answer model; records the order in which the stages saw questions.
+    """
+    log = {"events": [], "answered": [], "extract_delay": 0.0, "fail_retrieval": False}
+
+    async def stream_questions(transcript_text, categories):
+        for question in QUESTIONS:
+            await asyncio.sleep(log["extract_delay"])
+            log["events"].append(("extracted", question["id"]))
+            yield {"event": "question", "data": dict(question)}
+
+    def retrieve(questions):
+        if log["fail_retrieval"]:
+            raise RuntimeError("index broken")
+        log["events"].extend(("retrieved", q["id"]) for q in questions)
+        return [[{"source": "wet.pdf", "page": 1, "similarity_score": 0.5, "content": "...", "file_path": "wet.pdf"}] for _ in questions]
+
+    def generate(question_text, **kwargs):
+        log["answered"].append(question_text)
+        log["events"].append(("answered", question_text))
+        return {"answer_text": f"Antwoord op {question_text}"}
+
+    transcript = tmp_path / "debat.txt"
+    transcript.write_text("[00:00:00] Voorzitter: Welkom.", encoding="utf-8")
+    log["transcript"] = str(transcript)
+
+    monkeypatch.setattr(pipeline, "stream_questions_from_transcript", stream_questions)
+    monkeypatch.setattr(pipeline, "retrieve_for_questions", retrieve)
+    monkeypatch.setattr(pipeline, "knowledge_base_status", lambda: {"ready": True, "loading": False})
+    monkeypatch.setattr(pipeline, "assign_clusters", lambda session_id: {"clusters": len(QUESTIONS)})
+    monkeypatch.setattr(answer_engine, "generate_rag_answer", generate)
+    monkeypatch.setattr(answer_engine, "get_cached_answer", lambda *args: None)
+    monkeypatch.setattr(answer_engine, "_rate_limiter", RateLimiter(0, 0))
+    return log
+
+
+async def _run(runner: PipelineRunner, **submit):
+    job = runner.submit(["Algemeen"], **submit)
+    await asyncio.gather(*list(runner._tasks.values()))
+    return get_job(job["id"])
+
+
+def test_run_drafts_every_question(stages):
+    stages["extract_delay"] = 0.01
+    run = asyncio.run(_run(PipelineRunner(), transcript_path=stages["transcript"]))
+
+    assert run["status"] == "completed"
+    assert {name: stage["status"] for name, stage in run["stages"].items()} == {
+        "transcribe": "skipped", "extract": "completed", "retrieve": "completed", "generate": "completed"
+    }
+    assert run["stages"]["generate"]["done"] == len(QUESTIONS)
+    questions = load_questions(run["sessionId"])
+    assert [q["draftAnswer"]["answer_text"] for q in questions] == [f"Antwoord op {q['question_text']}" for q in QUESTIONS]
+    assert all(q["retrieval"][0]["source"] == "wet.pdf" for q in questions)
+
+    # The stages overlap: the first answer is drafted before extraction has finished
+    events = stages["events"]
+    assert events.index(("answered", QUESTIONS[0]["question_text"])) < events.index(("extracted", QUESTIONS[-1]["id"]))
+
+
+def test_resumed_run_skips_finished_work(stages):
+    answered = {**QUESTIONS[0], "draftAnswer": {"answer_text": "Al beantwoord"}}
+    session_id = create_question_session([answered], source="test")
+    runner = PipelineRunner()
+
+    async def resume():
+        job = pipeline.create_job("resumed-run", pipeline.JOB_KIND, {
+            "categories": [], "transcriptPath": stages["transcript"], "sessionId": session_id,
+            "stages": {stage: {"status": "pending"} for stage in pipeline.STAGES}
+        }, status="running")
+        await runner.start()
+        await asyncio.gather(*list(runner._tasks.values()))
+        return get_job(job["id"])
+
+    run = asyncio.run(resume())
+
+    assert run["status"] == "completed"
+    questions = load_questions(session_id)
+    # The question found again by extraction is not duplicated, and its draft is not replaced
+    assert len(questions) == len(QUESTIONS)
+    assert questions[0]["draftAnswer"] == {"answer_text": "Al beantwoord"}
+    assert QUESTIONS[0]["question_text"] not in stages["answered"]
+    assert len(stages["answered"]) == len(QUESTIONS) - 1
+
+
+def test_failing_stage_fails_the_run(stages):
+    stages["fail_retrieval"] = True
+    run = asyncio.run(asyncio.wait_for(_run(PipelineRunner(), transcript_path=stages["transcript"]), timeout=10))
+
+    assert run["status"] == "error" and "index broken" in run["error"]
+    assert run["stages"]["retrieve"]["status"] == "error"
+
+
+def test_run_leased_by_another_process_is_not_resumed(stages):
+    job = pipeline.create_job("leased-run", pipeline.JOB_KIND, {
+        "categories": [], "transcriptPath": stages["transcript"], "sessionId": None,
+        "stages": {stage: {"status": "pending"} for stage in pipeline.STAGES}
+    }, status="running")
+    assert claim_job(job["id"], "other-process", 60)
+    runner = PipelineRunner()
+
+    async def start_and_resume():
+        await runner.start()
+        runner.resume(job["id"])
+        return runner.is_active(job["id"])
+
+    assert not asyncio.run(start_and_resume())
+    assert get_job(job["id"])["status"] == "running" and stages["events"] == []
+    update_job(job["id"], "error")  # don't leave the run for other tests to resume
+
+
+def test_failed_run_can_be_resumed(stages):
+    stages["fail_retrieval"] = True
+    runner = PipelineRunner()
+    failed = asyncio.run(_run(runner, transcript_path=stages["transcript"]))
+    assert failed["status"] == "error"
+
+    stages["fail_retrieval"] = False
+
+    async def resume():
+        runner.resume(failed["id"])
+        await asyncio.gather(*list(runner._tasks.values()))
+        return get_job(failed["id"])
+
+    assert asyncio.run(resume())["status"] == "completed"
@@ -0,0 +1,113 @@
+import time
+
+import pytest
+import requests
+
+from src.services import provider_clients
+from src.services.provider_clients import AssemblyAIClient, CircuitBreaker, CircuitOpenError
+
+
+class FakeSession:
+    """
+    Stands in for requests.Session: every request takes the next outcome (a status code or an exception).
+    """
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+        self.headers = {}
+
+    def request(self, method, url, data=None, **kwargs):
+        self.calls.append((method, url))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        return response
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(provider_clients, "retry_delay", lambda attempt, retry_after=None: 0)
+
+
+def _client(outcomes, breaker=None) -> AssemblyAIClient:
+    client = AssemblyAIClient("key", "https://assemblyai.test", breaker=breaker)
+    client.session = FakeSession(outcomes)
+    return client
+
+
+def _open_breaker(reset_seconds: float = 60) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=reset_seconds)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "closed"
+
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_half_open_trial_closes_or_reopens_the_circuit():
+    breaker = _open_breaker(reset_seconds=0.01)
+    time.sleep(0.02)
+    assert breaker.stats()["state"] == "half-open"
+
+    # One trial at a time; a failed trial opens the circuit again right away
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "open"
+
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "rejected": 1}
+
+
+def test_trial_ending_in_an_unexpected_error_is_released():
+    breaker = _open_breaker(reset_seconds=0.01)
+    time.sleep(0.02)
+    client = _client([requests.exceptions.ChunkedEncodingError("broken body"), 200], breaker)
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        client.request("GET", "/transcript/1")
+
+    # The trial is over, so the next call is let through instead of being rejected forever
+    assert client.request("GET", "/transcript/1").status_code == 200
+    assert breaker.stats()["state"] == "closed"
+
+
+def test_get_is_retried_on_server_errors():
+    client = _client([502, requests.ConnectionError("reset"), 200])
+    assert client.request("GET", "/transcript/1").status_code == 200
+    assert len(client.session.calls) == 3
+
+
+def test_submission_is_not_repeated_after_it_may_have_been_processed():
+    client = _client([502, 200])
+    assert client.request("POST", "/transcript", json={}).status_code == 502
+    assert len(client.session.calls) == 1
+
+    client = _client([requests.ReadTimeout("slow"), 200])
+    with pytest.raises(requests.ReadTimeout):
+        client.request("POST", "/transcript", json={})
+    assert len(client.session.calls) == 1
+
+
+def test_submission_is_retried_when_it_was_refused():
+    client = _client([429, 503, requests.ConnectTimeout("no connection"), 200])
+    assert client.request("POST", "/transcript", json={}).status_code == 200
+    assert len(client.session.calls) == 4
@@ -0,0 +1,75 @@
+import uuid
+
+from src.services.question_clustering import cluster_questions, assign_clusters, recluster_question, group_by_cluster
+from src.services.storage_service import create_question_session, load_questions, get_question, question_etag, update_question
+
+
+def _question(text: str) -> dict:
+    return {"id": uuid.uuid4().hex, "question_text": text, "text": text, "status": "Nieuw"}
+
+
+def test_paraphrases_share_a_cluster():
+    questions = [
+        _question("Wat doet de minister aan de lange wachtlijsten in de jeugdzorg?"),
+        _question("Hoeveel kost de nieuwe kerncentrale in Borssele?"),
+        _question("Wat gaat de minister doen aan de lange wachtlijsten in de jeugdzorg?"),
+    ]
+    clusters = cluster_questions(questions, threshold=0.5)
+
+    assert clusters[questions[0]["id"]] == questions[0]["id"]
+    assert clusters[questions[2]["id"]] == questions[0]["id"]
+    assert clusters[questions[1]["id"]] == questions[1]["id"]
+
+
+def test_unrelated_questions_stay_apart():
+    questions = [_question("Stikstofregels voor boeren"), _question("Budget voor defensie")]
+    clusters = cluster_questions(questions)
+    assert len(set(clusters.values())) == 2
+
+
+def test_assign_clusters_keeps_the_etag():
+    questions = [_question("Wanneer komt het rapport over de toeslagenaffaire?"),
+                 _question("Wanneer komt het rapport over de toeslagenaffaire uit?")]
+    session_id = create_question_session(questions, source="test")
+    etags = {q["id"]: question_etag(get_question(q["id"])) for q in questions}
+
+    summary = assign_clusters(session_id, threshold=0.5)
+
+    assert summary == {"questions": 2, "clusters": 1}
+    for question in load_questions(session_id):
+        assert question["clusterId"] == questions[0]["id"]
+        # A client holding the question from before clustering can still edit it
+        assert question_etag(question) == etags[question["id"]]
+
+
+def _edit_text(question_id: str, text: str):
+    # What PATCH /questions/{id} does with a new question_text
+    def apply(q):
+        q.pop("retrieval", None)
+        q.pop("clusterId", None)
+        q["question_text"] = q["text"] = text
+    update_question(question_id, apply)
+    recluster_question(question_id, threshold=0.5)
+
+
+def test_edited_question_gets_its_own_answer():
+    questions = [_question("Wanneer komt het rapport over de toeslagenaffaire?"),
+                 _question("Wanneer komt het rapport over de toeslagenaffaire uit?"),
+                 _question("Komt het rapport over de toeslagenaffaire binnenkort?")]
+    session_id = create_question_session(questions, source="test")
+    assign_clusters(session_id, threshold=0.5)
+    assert len(group_by_cluster(load_questions(session_id))) == 1
+
+    # The cluster's leader now asks something else; its former members stay together without it
+    _edit_text(questions[0]["id"], "Hoeveel windmolens komen er op de Noordzee?")
+
+    groups = group_by_cluster(load_questions(session_id))
+    assert [[q["id"] for q in group] for group in groups] == [
+        [questions[0]["id"]], [questions[1]["id"], questions[2]["id"]]
+    ]
+
+
+def test_group_by_cluster_without_clustering():
+    questions = [{**_question("a"), "clusterId": "x"}, {**_question("b"), "clusterId": "x"}]
+    assert len(group_by_cluster(questions)) == 1
+    assert len(group_by_cluster(questions, cluster=False)) == 2
@@ -0,0 +1,79 @@
+import json
+
+from src.services.question_extractor import (
+    split_transcript_windows,
+    merge_questions,
+    parse_question_array,
+    QuestionStreamParser
+)
+
+QUESTIONS = [
+    {"timestamp": "00:01:10", "speaker": "Jansen", "party": "VVD", "question_text": "Wanneer komt de evaluatie?"},
+    {"timestamp": "00:04:30", "speaker": "De Vries", "party": "GL-PvdA",
+     "question_text": "Hoe wordt de regeldruk \"gemeten\" {per sector}?"}
+]
+
+
+def test_windows_split_on_utterances_with_overlap():
+    transcript = "\n\n".join(f"[00:0{i}:00] Spreker {i}: " + "woord " * 20 for i in range(6))
+    windows = split_transcript_windows(transcript, max_chars=300, overlap=1)
+
+    assert len(windows) > 1
+    for previous, window in zip(windows, windows[1:]):
+        # Every window starts on an utterance, with the last utterance of the previous one
+        assert window.startswith("[")
+        assert window.split("\n\n")[0] == previous.split("\n\n")[-1]
+    assert all(f"Spreker {i}:" in "".join(windows) for i in range(6))
+
+
+def test_merge_drops_duplicates_from_overlapping_windows():
+    first = {"timestamp": "00:01:10", "speaker": "Jansen", "question_text": "Wanneer komt de evaluatie"}
+    longer = {"timestamp": "00:01:12", "speaker": "Jansen", "question_text": "Wanneer komt de evaluatie van de wet?"}
+    other = {"timestamp": "00:00:30", "speaker": "Bakker", "question_text": "Wat kost het adviescollege?"}
+
+    merged = merge_questions([[first], [longer, other]])
+
+    assert merged == [other, longer]
+
+
+def test_parse_question_array_from_a_code_fence():
+    raw = "Hier zijn de vragen:\n```json\n" + json.dumps(QUESTIONS) + "\n```"
+    assert parse_question_array(raw) == QUESTIONS
+
+
+def test_parse_question_array_keeps_complete_objects_of_a_cut_off_array():
+    raw = json.dumps(QUESTIONS)
+    cut = raw[:raw.index("De Vries") + 4]
+    assert parse_question_array(cut) == QUESTIONS[:1]
+
+
+def _stream(raw: str, size: int):
+    # The items returned by feed() for every chunk of `size` characters
+    parser = QuestionStreamParser()
+    return [parser.feed(raw[i:i + size]) for i in range(0, len(raw), size)]
+
+
+def test_stream_parser_emits_each_object_once_it_is_complete():
+    raw = "```json\n" + json.dumps(QUESTIONS, indent=2) + "\n```"
+    first_end = raw.index("}") + 1
+
+    for size in (1, 3, 17, len(raw)):
+        emitted = _stream(raw, size)
+        assert [item for items in emitted for item in items] == QUESTIONS
+        # The first question arrives with the chunk holding its closing brace, not at the end
+        if size < len(raw):
+            assert emitted[(first_end - 1) // size] == [QUESTIONS[0]]
+
+
+def test_stream_parser_handles_braces_and_escapes_in_strings():
+    parser = QuestionStreamParser()
+    raw = json.dumps(QUESTIONS[1])
+    split = raw.index("{per") + 2
+    assert parser.feed("[" + raw[:split]) == []
+    assert parser.feed(raw[split:] + "]") == [QUESTIONS[1]]
+
+
+def test_stream_parser_skips_a_malformed_object():
+    parser = QuestionStreamParser()
+    items = parser.feed('[{"speaker": "Jansen", "question_text": }, ' + json.dumps(QUESTIONS[0]) + "]")
+    assert items == [QUESTIONS[0]]
@@ -0,0 +1,79 @@
+import uuid
+
+import pytest
+
+from src.services import storage_service
+from src.services.storage_service import (
+    create_job,
+    create_question_session,
+    get_question,
+    question_etag,
+    reset_data,
+    update_question,
+    VersionConflictError
+)
+
+
+def _stored_question() -> dict:
+    question = {"id": uuid.uuid4().hex, "question_text": "Wanneer komt de evaluatie?", "status": "Nieuw"}
+    create_question_session([question], source="test")
+    return get_question(question["id"])
+
+
+def _set_draft(text: str):
+    def apply(q):
+        q["draftAnswer"] = text
+    return apply
+
+
+def test_update_bumps_version_and_etag():
+    question = _stored_question()
+
+    updated = update_question(question["id"], _set_draft("Eerste versie"), expected_version=question["version"])
+
+    assert updated["version"] == question["version"] + 1
+    assert question_etag(updated) != question_etag(question)
+    assert get_question(question["id"])["draftAnswer"] == "Eerste versie"
+
+
+def test_stale_version_is_rejected():
+    question = _stored_question()
+    update_question(question["id"], _set_draft("Van collega"), expected_version=question["version"])
+
+    with pytest.raises(VersionConflictError) as conflict:
+        update_question(question["id"], _set_draft("Van mij"), expected_version=question["version"])
+
+    # The conflict carries the current row, and the other edit is kept
+    assert conflict.value.question["draftAnswer"] == "Van collega"
+    assert get_question(question["id"])["draftAnswer"] == "Van collega"
+
+
+def test_declined_update_writes_nothing():
+    question = _stored_question()
+
+    result = update_question(question["id"], lambda q: False)
+
+    assert result["version"] == question["version"]
+    assert get_question(question["id"]) == question
+
+
+def test_unknown_question():
+    assert update_question("does-not-exist", _set_draft("x")) is None
+
+
+def test_reset_removes_uploads_except_those_of_unfinished_jobs(monkeypatch, tmp_path):
+    for name in ("TRANSCRIPTS_DIR", "RAW_TRANSCRIPTS_DIR", "QUESTIONS_DIR", "ANSWERS_DIR", "UPLOADS_DIR"):
+        monkeypatch.setattr(storage_service, name, tmp_path / name.lower())
+        (tmp_path / name.lower()).mkdir()
+    uploads = tmp_path / "uploads_dir"
+    finished, queued = uploads / "finished.mp4", uploads / "queued.mp4"
+    for path in (finished, queued, uploads / "orphan.mp4.part"):
+        path.write_bytes(b"video")
+    create_job(uuid.uuid4().hex, "transcription", {"upload_path": str(finished)}, status="completed")
+    queued_id = uuid.uuid4().hex
+    create_job(queued_id, "transcription", {"upload_path": str(queued)})
+
+    reset_data()
+
+    assert [p.name for p in uploads.iterdir()] == ["queued.mp4"]
+    storage_service.update_job(queued_id, "error")  # don't leave the job for other tests to resume
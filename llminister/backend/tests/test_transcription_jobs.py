@@ -0,0 +1,199 @@
+import os
+import time
+import asyncio
+
+import pytest
+
+from src.services import transcription_jobs
+from src.services import storage_service
+from src.services.storage_service import get_job, update_job, claim_job, release_job, find_transcript
+from src.services.transcription_jobs import TranscriptionJobQueue, new_upload_path, spool_upload
+
+
+@pytest.fixture
+def provider(monkeypatch, tmp_path):
+    """
+    Fake AssemblyAI, with the uploads and transcripts kept in tmp_path.
+    """
+    calls = {"upload": 0, "submit": 0, "fetch": 0, "fail": False}
+    uploads_dir = tmp_path / "uploads"
+    uploads_dir.mkdir()
+
+    def upload(path, on_progress=None):
+        calls["upload"] += 1
+        return "https://upload/" + os.path.basename(path)
+
+    def submit(upload_url, webhook_url=None, webhook_auth=None):
+        calls["submit"] += 1
+        return "transcript-1"
+
+    def fetch(transcript_id):
+        calls["fetch"] += 1
+        if calls["fail"]:
+            return {"status": "error", "error": "audio unreadable"}
+        return {"status": "completed", "utterances": [{"speaker": "A", "start": 0, "text": "Goedemorgen."}]}
+
+    def save(text, filename):
+        path = tmp_path / f"{filename}.txt"
+        path.write_text(text, encoding="utf-8")
+        return str(path)
+
+    monkeypatch.setattr(transcription_jobs, "UPLOADS_DIR", uploads_dir)
+    monkeypatch.setattr(transcription_jobs, "upload_file_to_assemblyai", upload)
+    monkeypatch.setattr(transcription_jobs, "submit_transcription_job", submit)
+    monkeypatch.setattr(transcription_jobs, "fetch_transcript", fetch)
+    monkeypatch.setattr(transcription_jobs, "save_transcript_file", save)
+    return calls
+
+
+def _saved_upload(filename: str = "debat.mp4"):
+    job_id, path = new_upload_path(filename)
+    path.write_bytes(b"video")
+    return job_id, path
+
+
+async def _run_queue(queue: TranscriptionJobQueue, submit=None):
+    await queue.start()
+    try:
+        if submit:
+            submit(queue)
+        await queue._queue.join()
+    finally:
+        await queue.stop()
+
+
+def test_job_completes_and_removes_its_upload(provider):
+    job_id, path = _saved_upload()
+    asyncio.run(_run_queue(TranscriptionJobQueue(workers=1), lambda q: q.submit(job_id, path, "debat.mp4")))
+
+    job = get_job(job_id)
+    assert job["status"] == "completed"
+    assert "Goedemorgen." in open(job["transcriptPath"], encoding="utf-8").read()
+    assert not path.exists()
+
+
+def test_failed_job_removes_its_upload(provider):
+    provider["fail"] = True
+    job_id, path = _saved_upload()
+    asyncio.run(_run_queue(TranscriptionJobQueue(workers=1), lambda q: q.submit(job_id, path, "debat.mp4")))
+
+    job = get_job(job_id)
+    assert job["status"] == "error" and "audio unreadable" in job["error"]
+    assert not path.exists()
+
+
+def test_resume_polls_a_submitted_job_without_uploading_again(provider):
+    job_id, path = _saved_upload()
+    transcription_jobs.create_job(job_id, transcription_jobs.JOB_KIND,
+                                  {"filename": "debat.mp4", "upload_path": str(path)})
+    update_job(job_id, "transcribing", transcript_id="transcript-1")
+
+    asyncio.run(_run_queue(TranscriptionJobQueue(workers=1)))
+
+    assert get_job(job_id)["status"] == "completed"
+    assert provider["upload"] == 0 and provider["submit"] == 0 and provider["fetch"] == 1
+
+
+def test_start_removes_orphaned_uploads(provider):
+    # An interrupted job keeps its upload; a file without a job is removed once it is old enough
+    job_id, kept = _saved_upload()
+    transcription_jobs.create_job(job_id, transcription_jobs.JOB_KIND,
+                                  {"filename": "debat.mp4", "upload_path": str(kept)})
+    _, orphan = _saved_upload()
+    _, recent = _saved_upload()
+    old = time.time() - transcription_jobs.ORPHANED_UPLOAD_AGE_SECONDS - 60
+    for path in (kept, orphan):
+        os.utime(path, (old, old))
+
+    async def start_only():
+        queue = TranscriptionJobQueue(workers=1)
+        await queue.start()
+        await queue.stop()
+
+    asyncio.run(start_only())
+
+    assert kept.exists() and recent.exists()
+    assert not orphan.exists()
+    update_job(job_id, "error")  # don't leave the job for other tests to resume
+
+
+def test_job_leased_by_another_process_is_left_alone(provider):
+    job_id, path = _saved_upload()
+    transcription_jobs.create_job(job_id, transcription_jobs.JOB_KIND,
+                                  {"filename": "debat.mp4", "upload_path": str(path)})
+    assert claim_job(job_id, "other-process", 60)
+
+    queue = TranscriptionJobQueue(workers=1)
+    asyncio.run(_run_queue(queue))
+    asyncio.run(queue._run(job_id))
+
+    assert get_job(job_id)["status"] == "queued"
+    assert provider["upload"] == 0 and path.exists()
+    release_job(job_id, "other-process")
+    update_job(job_id, "error")  # don't leave the job for other tests to resume
+
+
+def test_expired_lease_is_taken_over(provider):
+    job_id, path = _saved_upload()
+    transcription_jobs.create_job(job_id, transcription_jobs.JOB_KIND,
+                                  {"filename": "debat.mp4", "upload_path": str(path)})
+    # The process that held the job crashed without releasing it
+    assert claim_job(job_id, "crashed-process", -1)
+
+    asyncio.run(_run_queue(TranscriptionJobQueue(workers=1)))
+
+    assert get_job(job_id)["status"] == "completed"
+    assert provider["upload"] == 1
+
+
+def test_finished_job_cannot_be_claimed():
+    transcription_jobs.create_job("finished-job", transcription_jobs.JOB_KIND, {}, status="completed")
+    assert not claim_job("finished-job", "any-process", 60)
+
+
+class FakeUpload:
+    """
+    Stands in for an UploadFile: async read() of the given bytes.
+    """
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    async def read(self, size: int) -> bytes:
+        chunk, self.content = self.content[:size], self.content[size:]
+        return chunk
+
+
+def test_repeat_upload_is_answered_from_the_transcript_index(provider, monkeypatch, tmp_path):
+    monkeypatch.setattr(storage_service, "RAW_TRANSCRIPTS_DIR", tmp_path)
+    queue = TranscriptionJobQueue(workers=1)
+
+    async def upload(content: bytes):
+        # What POST /transcribe does with an upload
+        job_id, path = new_upload_path("debat.mp4")
+        stats = await spool_upload(FakeUpload(content), path)
+        entry = await transcription_jobs.run_io(find_transcript, stats["sha256"])
+        if entry is not None:
+            path.unlink()
+            return queue.complete_from_index(job_id, "debat.mp4", entry, **stats), entry
+        return queue.submit(job_id, path, "debat.mp4", **stats), None
+
+    async def run():
+        await queue.start()
+        try:
+            first, _ = await upload(b"video")
+            await queue._queue.join()
+            return get_job(first["id"]), await upload(b"video")
+        finally:
+            await queue.stop()
+
+    first, (second, entry) = asyncio.run(run())
+
+    assert first["status"] == "completed"
+    assert entry is not None and entry["sha256"] == first["sha256"]
+    assert second["status"] == "completed" and second["deduplicated"]
+    assert second["transcriptPath"] == first["transcriptPath"]
+    # The second upload did not reach the provider
+    assert (provider["upload"], provider["submit"], provider["fetch"]) == (1, 1, 1)
+    assert "Goedemorgen." in open(entry["raw_path"], encoding="utf-8").read()
+    assert find_transcript("0" * 64) is None